@@ -3,37 +3,22 @@
 Módulo de classificação usando OpenAI
 """
 
-import asyncio
 import time
 import logging
 from typing import Dict, Any, List
-import openai
-from config import OPENAI_API_KEY, OPENAI_MODEL, CLASSIFICATION_PROMPT, CLASSIFICATION_CATEGORIES
+from config import OPENAI_MODEL, CLASSIFICATION_PROMPT, CLASSIFICATION_TAGS
+from llm_gateway import LLMGateway, get_gateway
+from conversa import format_messages
+from tag_based_classifier import parse_classification_response
 
 class AIClassifier:
-    def __init__(self):
-        self.client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, gateway: LLMGateway = None):
+        self.gateway = gateway or get_gateway()
         self.logger = logging.getLogger(__name__)
     
     def format_messages_for_analysis(self, messages: List[Dict[str, Any]]) -> str:
         """Formata mensagens para análise"""
-        if not messages:
-            return "Nenhuma mensagem encontrada."
-        
-        formatted = []
-        for msg in messages:
-            # Tratar timestamp que pode ser string ou datetime
-            timestamp = msg["timestamp"]
-            if hasattr(timestamp, 'strftime'):
-                timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                timestamp_str = str(timestamp)
-            
-            role = msg.get("role", "user")
-            message = msg["message"]
-            formatted.append(f"[{timestamp_str}] {role}: {message}")
-        
-        return "\n".join(formatted)
+        return format_messages(messages)
     
     async def classify_conversation(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Classifica uma conversa usando OpenAI"""
@@ -53,11 +38,12 @@ class AIClassifier:
                 }
             
             # Preparar prompt
-            categories_text = "\n".join(CLASSIFICATION_CATEGORIES)
-            prompt = CLASSIFICATION_PROMPT.format(categories_text, formatted_messages)
+            tags_text = "\n".join([f"- {tag}" for tag in CLASSIFICATION_TAGS])
+            prompt = CLASSIFICATION_PROMPT.format(tags_text, formatted_messages)
             
-            # Fazer chamada para OpenAI
-            response = await self.client.chat.completions.create(
+            # Fazer chamada pelo gateway (cache, retentativas e contabilidade de uso)
+            response = await self.gateway.complete(
+                etapa="llm_classificacao",
                 model=OPENAI_MODEL,
                 messages=[
                     {"role": "system", "content": "Você é um classificador especializado em conversas de atendimento ao cliente."},
@@ -70,24 +56,15 @@ class AIClassifier:
             # Calcular tempo de processamento
             processing_time = int((time.time() - start_time) * 1000)
             
-            # Processar resposta
-            content = response.choices[0].message.content.strip()
-            tokens_used = response.usage.total_tokens
-            
-            # Separar classificação e contexto
-            if "|" in content:
-                classification, context = content.split("|", 1)
-                classification = classification.strip()
-                context = context.strip()
-            else:
-                classification = content
-                context = "Classificação automática"
+            # Separar classificação, contexto e classificação específica
+            classification, context, classificacao_especifica = parse_classification_response(response.content.strip())
             
             return {
                 "classification": classification,
                 "confidence": 0.9,  # Confiança padrão
                 "context": context,
-                "tokens_used": tokens_used,
+                "classificacao_especifica": classificacao_especifica,
+                "tokens_used": response.usage.total_tokens,
                 "processing_time": processing_time
             }
             
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Artefatos pré-compilados do classificador (lista de tags, buscador de palavras-chave e template do prompt),
+gravados em JSON e invalidados pelo hash do conteúdo do config.py, do taxonomia.py e deste módulo
+
+Uso:
+    python classificador.py compilar            # recompila se o config mudou e mostra o artefato
+    python classificador.py compilar --forcar
+"""
+
+import os
+import json
+import time
+import hashlib
+from typing import Dict, Any, List, Tuple
+
+# Incrementar ao mudar o formato gravado
+ARTIFACT_FORMAT = 1
+
+# O conteúdo destes arquivos define o artefato (taxonomia.py calcula a versão da taxonomia gravada nele)
+SOURCES = ("config.py", "taxonomia.py", "artefatos.py")
+
+# Marca o lugar da conversa ao dividir o CLASSIFICATION_PROMPT em prefixo e sufixo
+_CONVERSATION_SLOT = "\x00CONVERSA\x00"
+
+
+def source_hash() -> str:
+    """Hash dos fontes do artefato: não depende de importar o config"""
+    digest = hashlib.sha256(str(ARTIFACT_FORMAT).encode())
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in SOURCES:
+        with open(os.path.join(base, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class ClassifierArtifacts:
+    """Estruturas derivadas do config prontas para o caminho quente"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.hash: str = data["hash"]
+        self.taxonomy_version: str = data["versao_taxonomia"]
+        self.keyword_tags: List[str] = data["tags_palavras_chave"]
+        # (palavra-chave em minúsculas, índices em keyword_tags): uma busca por palavra distinta
+        self.keyword_matcher: List[Tuple[str, Tuple[int, ...]]] = [
+            (keyword, tuple(indexes)) for keyword, indexes in data["palavras_chave"]
+        ]
+        self.prompt_prefix: str = data["prompt_prefixo"]
+        self.prompt_suffix: str = data["prompt_sufixo"]
+        self.compiled_at: str = data["compilado_em"]
+
+    def keyword_hits(self, lowered_text: str) -> Dict[str, int]:
+        """Palavras-chave encontradas por tag, na ordem do TAG_KEYWORDS (desempate do classify_by_keywords)"""
+        counts = [0] * len(self.keyword_tags)
+        for keyword, indexes in self.keyword_matcher:
+            if keyword in lowered_text:
+                for index in indexes:
+                    counts[index] += 1
+        return {tag: count for tag, count in zip(self.keyword_tags, counts) if count}
+
+    def classification_prompt(self, formatted_messages: str) -> str:
+        return self.prompt_prefix + formatted_messages + self.prompt_suffix
+
+
+def compile_artifacts(content_hash: str = None) -> Dict[str, Any]:
+    """Monta o artefato a partir do config (o caminho lento que o cache evita)"""
+    from config import CLASSIFICATION_TAGS, TAG_KEYWORDS, CLASSIFICATION_PROMPT
+    from taxonomia import taxonomy_version
+
+    keyword_tags = list(TAG_KEYWORDS)
+    keywords: Dict[str, List[int]] = {}
+    for tag_index, tag_keywords in enumerate(TAG_KEYWORDS.values()):
+        for keyword in tag_keywords:
+            # Repetidas na mesma tag contam de novo, como no laço original
+            keywords.setdefault(keyword.lower(), []).append(tag_index)
+
+    tags_text = "\n".join([f"- {tag}" for tag in CLASSIFICATION_TAGS])
+    prefix, suffix = CLASSIFICATION_PROMPT.format(tags_text, _CONVERSATION_SLOT).split(_CONVERSATION_SLOT)
+
+    return {
+        "hash": content_hash or source_hash(),
+        "formato": ARTIFACT_FORMAT,
+        "versao_taxonomia": taxonomy_version(),
+        "tags_palavras_chave": keyword_tags,
+        "palavras_chave": [[keyword, indexes] for keyword, indexes in keywords.items()],
+        "prompt_prefixo": prefix,
+        "prompt_sufixo": suffix,
+        "compilado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def load_artifacts(path: str = None, force: bool = False) -> Tuple[ClassifierArtifacts, bool]:
+    """(artefatos, recompilado): usa o arquivo se o hash bater, senão compila e grava"""
+    if path is None:
+        from config import ARTIFACTS_FILE
+        path = ARTIFACTS_FILE
+    content_hash = source_hash()
+
+    if not force:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("hash") == content_hash and data.get("formato") == ARTIFACT_FORMAT:
+                return ClassifierArtifacts(data), False
+        except (OSError, ValueError, KeyError):
+            pass
+
+    data = compile_artifacts(content_hash)
+    try:
+        # Grava em arquivo temporário e troca: processos em paralelo nunca leem um JSON pela metade
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError:
+        pass  # diretório só de leitura: segue com o artefato em memória
+    return ClassifierArtifacts(data), True
+
+
+_artifacts = None
+
+
+def get_artifacts() -> ClassifierArtifacts:
+    """Artefatos do processo (carregados ou compilados uma vez)"""
+    global _artifacts
+    if _artifacts is None:
+        _artifacts, _ = load_artifacts()
+    return _artifacts
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Suíte de benchmarks dos caminhos quentes do classificador e do banco, com saída em JSON
+e modo de comparação para detectar regressões
+
+Uso:
+    python benchmark_suite.py --saida bench_atual.json
+    python benchmark_suite.py --grupos cpu,e2e --repeticoes 7
+    python benchmark_suite.py --comparar bench_base.json bench_atual.json --limite 0.10
+    python benchmark_suite.py --grupos e2e --cassete carga.sqlite   # pipeline com respostas gravadas (determinístico)
+"""
+
+import gc
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Registro: nome -> (grupo, função assíncrona(contexto, medição))
+BENCHMARKS = {}
+
+
+def benchmark(name: str, group: str):
+    """Registra uma função de benchmark em um grupo (cpu, db ou e2e)"""
+    def decorator(fn):
+        BENCHMARKS[name] = (group, fn)
+        return fn
+    return decorator
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Pico de memória residente do processo (KB), quando disponível"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reporta em bytes, Linux em KB
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class Measurement:
+    """Amostras de latência por etapa e unidades processadas em uma rodada"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.units = 0
+        self.extra: Dict[str, Any] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.samples[name].append((time.perf_counter_ns() - start) / 1e6)
+
+    def add(self, name: str, milliseconds: float):
+        self.samples[name].append(milliseconds)
+
+
+class BenchmarkContext:
+    """Entradas fixas (semente constante) compartilhadas pelos benchmarks"""
+
+    def __init__(self, seed: int, conversations: int, e2e_users: int, db_users: int, cassette: str = None):
+        self.seed = seed
+        self.cassette = cassette
+        self.e2e_users = e2e_users
+        self.db_users = db_users
+        self._conversations = conversations
+        self._corpus = None
+        self._responses = None
+        self._classifier = None
+
+    @property
+    def classifier(self):
+        if self._classifier is None:
+            from tag_based_classifier import TagBasedClassifier
+            self._classifier = TagBasedClassifier(use_ai=False)
+        return self._classifier
+
+    @property
+    def corpus(self) -> List[List[Dict[str, Any]]]:
+        """Conversas no formato de get_last_25_messages (USR/AIR, mais recente primeiro)"""
+        if self._corpus is None:
+            from gerar_corpus_sintetico import CorpusGenerator
+            generator = CorpusGenerator(seed=self.seed, mean_messages=12.0, aio_share=0.0)
+            self._corpus = []
+            for customer_id in range(self._conversations):
+                rows = list(generator.conversation(customer_id, generator.rng.choice(generator.tags)))[-25:]
+                messages = [{"message": text, "timestamp": date, "role": role} for _, text, date, role in rows]
+                messages.reverse()
+                if messages:
+                    self._corpus.append(messages)
+        return self._corpus
+
+    @property
+    def responses(self) -> List[str]:
+        """Respostas da IA variadas: tag exata, com hífen, parcial, sem pipe e desconhecida"""
+        if self._responses is None:
+            from config import CLASSIFICATION_TAGS
+            rng = random.Random(self.seed)
+            shapes = [
+                "{tag}|Cliente perguntou sobre o tema|perguntou sobre o tema",
+                "- {tag}|Justificativa da classificação|específica",
+                "{partial}|Cliente relatou o problema",
+                "A conversa se encaixa em {tag}",
+                "Categoria inexistente|Sem relação|nada",
+            ]
+            self._responses = []
+            for _ in range(2000):
+                tag = rng.choice(CLASSIFICATION_TAGS)
+                shape = rng.choice(shapes)
+                self._responses.append(shape.format(tag=tag, partial=tag.split(":")[-1].strip()))
+        return self._responses
+
+
+# ----------------------------------------------------------------------------
+# Benchmarks de CPU (classificador)
+# ----------------------------------------------------------------------------
+
+@benchmark("classify_by_keywords", "cpu")
+async def bench_keywords(ctx: BenchmarkContext, m: Measurement):
+    classify = ctx.classifier.classify_by_keywords
+    for messages in ctx.corpus:
+        with m.stage("classificar"):
+            classify(messages)
+        m.units += 1
+
+
+@benchmark("classify_by_keywords_vetorizado", "cpu")
+async def bench_keywords_vectorized(ctx: BenchmarkContext, m: Measurement):
+    from classificacao_vetorizada import VectorizedKeywordTagger, conversation_texts
+    tagger = VectorizedKeywordTagger()
+    with m.stage("montar_textos"):
+        texts = conversation_texts(ctx.corpus)
+    with m.stage("classificar_lote"):
+        tagger.classify(texts)
+    m.units += len(texts)
+
+
+@benchmark("format_messages_for_analysis", "cpu")
+async def bench_format(ctx: BenchmarkContext, m: Measurement):
+    format_messages = ctx.classifier.format_messages_for_analysis
+    for messages in ctx.corpus:
+        with m.stage("formatar"):
+            format_messages(messages)
+        m.units += 1
+
+
+@benchmark("conversa_compacta", "cpu")
+async def bench_compact_conversation(ctx: BenchmarkContext, m: Measurement):
+    """Trabalho por usuário com a Conversa: palavras-chave e os dois prompts da IA reaproveitam os derivados"""
+    from conversa import Conversa
+    classifier = ctx.classifier
+    for messages in ctx.corpus:
+        with m.stage("montar_conversa"):
+            conversation = Conversa.from_records(messages)
+        with m.stage("palavras_chave_e_prompts"):
+            classifier.classify_by_keywords(conversation)
+            classifier.format_messages_for_analysis(conversation)
+            classifier.format_messages_for_analysis(conversation)
+        m.units += 1
+
+
+@benchmark("build_classification_prompt", "cpu")
+async def bench_prompt(ctx: BenchmarkContext, m: Measurement):
+    classifier = ctx.classifier
+    formatted = [classifier.format_messages_for_analysis(messages) for messages in ctx.corpus]
+    for text in formatted:
+        with m.stage("montar_prompt"):
+            classifier.build_classification_prompt(text)
+        m.units += 1
+
+
+@benchmark("parse_classification_response", "cpu")
+async def bench_tag_resolution(ctx: BenchmarkContext, m: Measurement):
+    parse = ctx.classifier.parse_classification_response
+    for content in ctx.responses:
+        with m.stage("resolver_tag"):
+            parse(content)
+        m.units += 1
+
+
+# ----------------------------------------------------------------------------
+# Benchmarks de banco (Postgres local, ex.: gerado por gerar_corpus_sintetico.py)
+# ----------------------------------------------------------------------------
+
+@benchmark("get_unclassified_users", "db")
+async def bench_unclassified(ctx: BenchmarkContext, m: Measurement):
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        with m.stage("descoberta"):
+            users = await db.get_unclassified_users()
+        m.units += 1
+        m.extra["pendentes"] = len(users)
+    finally:
+        await db.close()
+
+
+@benchmark("fetch_save_por_usuario", "db")
+async def bench_fetch_save(ctx: BenchmarkContext, m: Measurement):
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        customers = (await db.get_customers_from_csv())[:ctx.db_users]
+
+        try:
+            for customer_id in customers:
+                with m.stage("buscar_mensagens"):
+                    await db.get_last_25_messages(customer_id)
+                with m.stage("buscar_wa_id"):
+                    wa_id = await db.get_wa_id_by_customer_id(customer_id)
+                with m.stage("salvar"):
+                    await db.save_classification(
+                        user_id=f"bench_{customer_id}", classification="Outros", confidence=0.5,
+                        context="benchmark", tokens_used=0, processing_time=0, wa_id=wa_id,
+                        classificacao_especifica="benchmark", sugestao_melhoria=""
+                    )
+                m.units += 1
+        finally:
+            conn = await db.get_connection()
+            try:
+                await conn.execute("DELETE FROM classificacoes WHERE user_id LIKE 'bench\\_%'")
+            finally:
+                await conn.close()
+    finally:
+        await db.close()
+
+
+# ----------------------------------------------------------------------------
+# Ponta a ponta contra o servidor fake da OpenAI
+# ----------------------------------------------------------------------------
+
+@benchmark("pipeline_run_fake_llm", "e2e")
+async def bench_pipeline(ctx: BenchmarkContext, m: Measurement):
+    from carga_pipeline import build_parser, run_load
+    args = build_parser().parse_args([
+        "--usuarios", str(ctx.e2e_users), "--latency-ms", "50", "--latency-sigma", "0.3",
+        "--db-latency-ms", "1", "--seed", str(ctx.seed), "--log-level", "ERROR",
+        *(["--cassete", ctx.cassette, "--cassete-modo", "completar", "--cassete-latencia", "gravada"] if ctx.cassette else [])
+    ])
+    started = time.perf_counter()
+    result = await run_load(args)
+    m.add("run_total", (time.perf_counter() - started) * 1000)
+    m.units += result["salvos"]
+    m.extra["concorrencia"] = result["concorrencia"]
+    m.extra["respostas_servidor"] = result["respostas_servidor"]
+    m.extra["gateway"] = result["gateway"]
+    m.extra["etapas_pipeline"] = result["etapas"]
+
+
+# ----------------------------------------------------------------------------
+# Execução, relatório e comparação
+# ----------------------------------------------------------------------------
+
+async def database_available() -> bool:
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        conn = await asyncio.wait_for(db.get_connection(), timeout=5)
+        await conn.close()
+        return True
+    except Exception:
+        return False
+    finally:
+        await db.close()
+
+
+async def run_benchmark(name: str, fn, ctx: BenchmarkContext, group: str, repetitions: int) -> Dict[str, Any]:
+    rounds = []
+    if group == "cpu":
+        await fn(ctx, Measurement())  # aquecimento
+
+    for _ in range(repetitions):
+        gc.collect()
+        if group == "cpu":
+            gc.disable()
+        measurement = Measurement()
+        started = time.perf_counter()
+        try:
+            await fn(ctx, measurement)
+        finally:
+            gc.enable()
+        rounds.append((time.perf_counter() - started, measurement))
+
+    throughputs = [m.units / elapsed for elapsed, m in rounds if elapsed > 0]
+    stages = defaultdict(list)
+    for _, measurement in rounds:
+        for stage, samples in measurement.samples.items():
+            stages[stage].extend(samples)
+
+    return {
+        "grupo": group,
+        "repeticoes": repetitions,
+        "unidades_por_rodada": rounds[-1][1].units,
+        "ops_por_segundo": round(statistics.median(throughputs), 2) if throughputs else 0.0,
+        "etapas": {
+            stage: {
+                "n": len(samples),
+                "p50_ms": round(percentile(samples, 0.50), 4),
+                "p95_ms": round(percentile(samples, 0.95), 4),
+                "p99_ms": round(percentile(samples, 0.99), 4),
+            }
+            for stage, samples in stages.items()
+        },
+        "rss_pico_kb": peak_rss_kb(),
+        "extra": rounds[-1][1].extra,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+async def run_suite(args) -> Dict[str, Any]:
+    groups = set(args.grupos.split(","))
+    ctx = BenchmarkContext(seed=args.seed, conversations=args.conversas, e2e_users=args.usuarios_e2e,
+                           db_users=args.usuarios_db, cassette=args.cassete)
+
+    if "db" in groups and not await database_available():
+        print("⚠️ Banco indisponível: benchmarks do grupo 'db' ignorados")
+        groups.discard("db")
+
+    results = {}
+    for name, (group, fn) in BENCHMARKS.items():
+        if group not in groups or (args.filtro and args.filtro not in name):
+            continue
+        print(f"⏱️ {name} ({group})...")
+        results[name] = await run_benchmark(name, fn, ctx, group, args.repeticoes)
+        stages = ", ".join(f"{stage} p50={info['p50_ms']}ms p95={info['p95_ms']}ms" for stage, info in results[name]["etapas"].items())
+        print(f"   {results[name]['ops_por_segundo']:,.1f} ops/s | {stages}")
+
+    return {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "semente": args.seed,
+        },
+        "benchmarks": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], limit: float) -> List[str]:
+    """Lista as regressões acima do limite (queda de throughput ou aumento de p50/p95)"""
+    regressions = []
+    print(f"{'Benchmark':<32} {'Métrica':<28} {'Base':>12} {'Atual':>12} {'Variação':>9}")
+    print("-" * 97)
+
+    for name, new in current["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            continue
+
+        rows = [("ops_por_segundo", old["ops_por_segundo"], new["ops_por_segundo"], True)]
+        for stage, info in new["etapas"].items():
+            previous = old["etapas"].get(stage)
+            if previous:
+                rows.append((f"{stage} p50_ms", previous["p50_ms"], info["p50_ms"], False))
+                rows.append((f"{stage} p95_ms", previous["p95_ms"], info["p95_ms"], False))
+
+        for metric, before, after, higher_is_better in rows:
+            if not before:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            flag = "❌" if worse > limit else "  "
+            print(f"{name:<32} {metric:<28} {before:>12.4f} {after:>12.4f} {change:>+8.1%} {flag}")
+            if worse > limit:
+                regressions.append(f"{name}: {metric} {change:+.1%}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do classificador de conversas")
+    parser.add_argument("--grupos", default="cpu,db,e2e", help="Grupos a executar (cpu, db, e2e)")
+    parser.add_argument("--filtro", help="Executa apenas benchmarks cujo nome contém este texto")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--conversas", type=int, default=2000, help="Conversas do corpus dos benchmarks de CPU")
+    parser.add_argument("--usuarios-e2e", type=int, default=300)
+    parser.add_argument("--usuarios-db", type=int, default=200)
+    parser.add_argument("--cassete", help="Cassete SQLite com as respostas da IA do benchmark e2e (gravado na primeira execução)")
+    parser.add_argument("--saida", default="benchmark_resultados.json")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "ATUAL"), help="Compara dois resultados JSON")
+    parser.add_argument("--limite", type=float, default=0.10, help="Variação máxima tolerada (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    if args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.comparar[1], encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.limite)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressões acima de {args.limite:.0%}:")
+            for item in regressions:
+                print(f"   - {item}")
+            return 1
+        print(f"\n✅ Nenhuma regressão acima de {args.limite:.0%}")
+        return 0
+
+    result = asyncio.run(run_suite(args))
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+    print(f"\n✅ Resultados salvos em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Canonicalização da classificacao_especifica na gravação (substitui os UPDATEs do padronizar_tags.sql)
+e backfill em lotes paginados por chave para aplicar novos mapeamentos às linhas antigas
+
+Uso:
+    python canonicalizacao.py --testar "Sem dinheiro agora"
+    python canonicalizacao.py --backfill --lote 1000
+"""
+
+import time
+import asyncio
+import difflib
+import logging
+import argparse
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+from triage import normalize_text
+from config import CANONICALIZATION_FILE
+
+
+class TagCanonicalizer:
+    """Mapeia textos livres para a forma canônica: lookup exato normalizado, depois fuzzy com cache"""
+
+    def __init__(self, path: str = CANONICALIZATION_FILE, config: Dict[str, Any] = None,
+                 cache_size: int = 50000):
+        self.logger = logging.getLogger(__name__)
+        if config is None:
+            import yaml
+            with open(path, encoding="utf-8") as f:
+                config = yaml.safe_load(f) or {}
+
+        self.version = int(config.get("versao", 0))
+        self.fuzzy_cutoff = float(config.get("limiar_fuzzy", 0.9))
+        self.fuzzy_min_length = int(config.get("tamanho_minimo_fuzzy", 8))
+        self.cache_size = cache_size
+
+        # Tabela pré-compilada: forma normalizada -> canônica (a primeira ocorrência vence)
+        self.lookup: Dict[str, str] = {}
+        for canonical, variants in (config.get("mapeamentos") or {}).items():
+            for text in [canonical] + list(variants or []):
+                key = normalize_text(text)
+                if key in self.lookup and self.lookup[key] != canonical:
+                    self.logger.warning(f"Variação '{text}' já mapeada para '{self.lookup[key]}', ignorando '{canonical}'")
+                    continue
+                self.lookup[key] = canonical
+        self._keys = list(self.lookup)
+
+        # Decisões do fuzzy já tomadas (inclusive "sem correspondência"), por forma normalizada
+        self.decisions: Dict[str, Optional[str]] = {}
+        self.stats = Counter()
+
+    def _fuzzy(self, key: str) -> Optional[str]:
+        if key in self.decisions:
+            self.stats["cache"] += 1
+            return self.decisions[key]
+
+        match = None
+        if len(key) >= self.fuzzy_min_length:
+            close = difflib.get_close_matches(key, self._keys, n=1, cutoff=self.fuzzy_cutoff)
+            if close:
+                match = self.lookup[close[0]]
+
+        if len(self.decisions) >= self.cache_size:
+            self.decisions.clear()
+        self.decisions[key] = match
+        self.stats["fuzzy" if match else "sem_mapeamento"] += 1
+        return match
+
+    def canonicalize(self, raw: Optional[str]) -> Optional[str]:
+        """Forma canônica do texto, ou o próprio texto (sem espaços nas pontas) se não houver mapeamento"""
+        if not raw or not raw.strip():
+            return raw
+        key = normalize_text(raw)
+        canonical = self.lookup.get(key)
+        if canonical is not None:
+            self.stats["exato"] += 1
+            return canonical
+        return self._fuzzy(key) or raw.strip()
+
+
+# ----------------------------------------------------------------------------
+# Backfill: aplica os mapeamentos atuais às classificações já gravadas
+# ----------------------------------------------------------------------------
+
+BACKFILL_SELECT = """
+    SELECT id, classificacao, confianca, data_classificacao,
+           classificacao_especifica, classificacao_especifica_original
+    FROM classificacoes
+    WHERE id > $1
+    ORDER BY id
+    LIMIT $2
+"""
+
+BACKFILL_UPDATE = """
+    UPDATE classificacoes c
+    SET classificacao_especifica = v.nova,
+        classificacao_especifica_original = COALESCE(c.classificacao_especifica_original, c.classificacao_especifica),
+        versao_canonicalizacao = $3
+    FROM unnest($1::int[], $2::text[]) AS v(id, nova)
+    WHERE c.id = v.id
+"""
+
+# Ajusta o resumo diário: -1 na tag específica antiga e +1 na nova
+SUMMARY_DELTA = """
+    INSERT INTO classificacoes_resumo_diario (dia, classificacao, classificacao_especifica, faixa_confianca, quantidade)
+    SELECT * FROM unnest($1::date[], $2::text[], $3::text[], $4::smallint[], $5::bigint[])
+    ON CONFLICT (dia, classificacao, classificacao_especifica, faixa_confianca)
+    DO UPDATE SET quantidade = classificacoes_resumo_diario.quantidade + EXCLUDED.quantidade
+"""
+
+
+def summary_deltas(changes: List[Tuple[Any, str]]) -> Dict[Tuple, int]:
+    from database import confidence_band
+    deltas = Counter()
+    for row, new_value in changes:
+        day, band = row["data_classificacao"].date(), confidence_band(row["confianca"])
+        deltas[(day, row["classificacao"], row["classificacao_especifica"] or "", band)] -= 1
+        deltas[(day, row["classificacao"], new_value or "", band)] += 1
+    return {key: value for key, value in deltas.items() if value}
+
+
+async def backfill(canonicalizer: TagCanonicalizer, batch_size: int = 1000, pause: float = 0.0):
+    """Percorre a classificacoes por id (paginação por chave) e regrava só as linhas cuja forma canônica mudou"""
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        await db.ensure_schema()
+
+        last_id, scanned, changed = 0, 0, 0
+        started = time.perf_counter()
+        conn = await db.get_connection()
+        try:
+            while True:
+                rows = await conn.fetch(BACKFILL_SELECT, last_id, batch_size)
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+                scanned += len(rows)
+
+                # Só as linhas cuja forma canônica mudou são regravadas (sem reescrever a tabela inteira)
+                modified = []
+                for row in rows:
+                    raw = row["classificacao_especifica_original"] or row["classificacao_especifica"]
+                    new_value = canonicalizer.canonicalize(raw)
+                    if new_value != row["classificacao_especifica"]:
+                        modified.append((row, new_value))
+
+                if modified:
+                    deltas = summary_deltas(modified)
+                    keys = list(deltas)
+                    async with conn.transaction():
+                        await conn.execute(BACKFILL_UPDATE, [row["id"] for row, _ in modified],
+                                           [value for _, value in modified], canonicalizer.version)
+                        if keys:
+                            await conn.execute(SUMMARY_DELTA, [k[0] for k in keys], [k[1] for k in keys],
+                                               [k[2] for k in keys], [k[3] for k in keys], [deltas[k] for k in keys])
+                    changed += len(modified)
+
+                print(f"📈 Até id {last_id}: {scanned:,} linhas lidas, {changed:,} canonicalizadas "
+                      f"({scanned / (time.perf_counter() - started):,.0f} linhas/s)")
+                if pause:
+                    await asyncio.sleep(pause)
+
+            await conn.execute("DELETE FROM classificacoes_resumo_diario WHERE quantidade = 0")
+        finally:
+            await conn.close()
+
+        print(f"✅ Backfill da versão {canonicalizer.version} concluído: {scanned:,} linhas verificadas, {changed:,} alteradas")
+        print(f"   Decisões: {dict(canonicalizer.stats)}")
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Canonicalização da classificacao_especifica")
+    parser.add_argument("--config", default=CANONICALIZATION_FILE)
+    parser.add_argument("--testar", nargs="+", help="Mostra a forma canônica dos textos informados")
+    parser.add_argument("--backfill", action="store_true", help="Aplica os mapeamentos às linhas já gravadas")
+    parser.add_argument("--lote", type=int, default=1000, help="Linhas por transação no backfill")
+    parser.add_argument("--pausa", type=float, default=0.0, help="Segundos de pausa entre lotes")
+    args = parser.parse_args()
+
+    canonicalizer = TagCanonicalizer(args.config)
+    if args.testar:
+        for text in args.testar:
+            print(f"  '{text}' → '{canonicalizer.canonicalize(text)}'")
+    elif args.backfill:
+        asyncio.run(backfill(canonicalizer, args.lote, args.pausa))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Harness de carga: mede o ConversationClassifier.run de ponta a ponta sem rede,
+com o servidor fake da OpenAI e um banco em memória
+
+Uso:
+    python carga_pipeline.py --usuarios 500 --latency-ms 600 --rate-429 0.02
+    python carga_pipeline.py --usuarios 500 --backend regras   # outro backend do gateway no lugar do servidor fake
+    python carga_pipeline.py --usuarios 500 --seed 1 --cassete carga.sqlite --cassete-modo reproduzir
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, Any, List
+from fake_openai_server import add_server_arguments, server_from_args
+from llm_gateway import BACKENDS, LLMGateway, OpenAIBackend, create_backend
+from conversa import Conversa
+
+BOT_TEMPLATES = [
+    "Olá! Seja bem-vindo ao minicurso. Como posso te ajudar hoje?",
+    "Sua próxima aula já está disponível na área do aluno.",
+    "Posso te enviar o link de pagamento com as condições especiais?",
+    "Obrigado pela mensagem! Em breve um especialista vai te responder.",
+]
+
+CUSTOMER_FILLERS = [
+    "oi", "bom dia", "tudo bem?", "entendi", "obrigado", "vou ver aqui", "pode me explicar melhor?",
+    "ainda estou com dúvida", "ok", "legal",
+]
+
+
+def synthetic_conversation(rng: random.Random, tag_keywords: Dict[str, List[str]],
+                           now: datetime) -> List[Dict[str, Any]]:
+    """Conversa sintética no formato de get_last_25_messages (mais recente primeiro)"""
+    size = min(25, max(1, int(rng.paretovariate(1.2) * 3)))
+    keywords = rng.choice(list(tag_keywords.values()))
+    moment = now - timedelta(days=rng.uniform(0, 60))
+
+    messages = []
+    for _ in range(size):
+        if rng.random() < 0.45:
+            role, text = "AIR", rng.choice(BOT_TEMPLATES)
+        elif rng.random() < 0.5:
+            role, text = "USR", f"{rng.choice(CUSTOMER_FILLERS)}, {rng.choice(keywords)}"
+        else:
+            role, text = "USR", rng.choice(CUSTOMER_FILLERS)
+        messages.append({"message": text, "timestamp": moment, "role": role})
+        moment -= timedelta(minutes=rng.uniform(1, 240))
+    return messages
+
+
+class MemoryDatabase:
+    """Implementa em memória a interface do DatabaseManager usada pelo ConversationClassifier"""
+
+    def __init__(self, conversations: Dict[str, List[Dict[str, Any]]], latency_ms: float = 0.0):
+        self.conversations = conversations
+        self.latency = latency_ms / 1000
+        self.saved: Dict[str, Dict[str, Any]] = {}
+
+    async def _wait(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def ensure_schema(self):
+        pass
+
+    async def get_customers_from_csv(self) -> List[str]:
+        return list(self.conversations)
+
+    async def get_unclassified_users(self) -> List[str]:
+        await self._wait()
+        return [user_id for user_id in self.conversations if user_id not in self.saved]
+
+    async def get_priority_signals(self, customer_ids, payment_keywords, chunk_size=5000):
+        await self._wait()
+        signals = {}
+        for user_id in customer_ids:
+            if user_id in self.saved:
+                continue
+            messages = self.conversations.get(user_id, [])
+            usr = [m for m in messages if m["role"] == "USR"]
+            signals[user_id] = {
+                "customer_id": user_id,
+                "ultima_msg_usr": max((m["timestamp"] for m in usr), default=None),
+                "total_mensagens": len(messages),
+                "mensagens_usr": len(usr),
+                "menciona_pagamento": any(k in m["message"].lower() for m in usr for k in payment_keywords),
+            }
+        return signals
+
+    async def is_user_classified(self, user_id: str) -> bool:
+        await self._wait()
+        return user_id in self.saved
+
+    async def get_last_25_messages(self, user_id: str) -> Conversa:
+        await self._wait()
+        return Conversa.from_records(self.conversations.get(user_id, [])[:25])
+
+    async def get_wa_id_by_customer_id(self, customer_id: str) -> str:
+        await self._wait()
+        return f"55119{int(customer_id):08d}"
+
+    async def save_classification(self, user_id: str, **kwargs) -> int:
+        await self._wait()
+        self.saved[user_id] = kwargs
+        return len(self.saved)
+
+
+async def run_load(args) -> Dict[str, Any]:
+    """Executa o pipeline completo contra o servidor fake e retorna as métricas da carga"""
+    server = server_from_args(args)
+    base_url = server.start()
+
+    from config import TAG_KEYWORDS
+    from main import ConversationClassifier
+    from run_journal import RunJournal
+    from instrumentacao import stage_timings
+    from tag_based_classifier import TagBasedClassifier
+
+    logging.getLogger().setLevel(getattr(logging, args.log_level))
+
+    rng = random.Random(args.seed)
+    now = datetime.now()
+    conversations = {str(100000 + i): synthetic_conversation(rng, TAG_KEYWORDS, now) for i in range(args.usuarios)}
+    db = MemoryDatabase(conversations, latency_ms=args.db_latency_ms)
+    stage_timings.reset()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Cliente apontado para o servidor fake (ou outro backend local), nunca para a chave real
+        backend = create_backend(args.backend) if args.backend else OpenAIBackend(api_key="fake-key", base_url=base_url)
+        if args.cassete:
+            from cassete import CassetteBackend
+            backend = CassetteBackend(args.cassete, mode=args.cassete_modo, latency=args.cassete_latencia,
+                                      inner=backend)
+        ai = TagBasedClassifier(use_ai=True, gateway=LLMGateway(backend))
+        classifier = ConversationClassifier(db=db, journal=RunJournal(os.path.join(tmp, "journal.jsonl")), ai=ai,
+                                            metrics_port=args.metrics_port)
+        started = time.perf_counter()
+        try:
+            await classifier.run()
+        finally:
+            # O run() já fecha o gateway
+            server.stop()
+        elapsed = time.perf_counter() - started
+
+    return {
+        "usuarios": args.usuarios,
+        "salvos": len(db.saved),
+        "segundos": round(elapsed, 3),
+        "usuarios_por_segundo": round(len(db.saved) / elapsed, 2) if elapsed else 0.0,
+        "respostas_servidor": dict(server.stats),
+        "gateway": ai.gateway.stats(),
+        "concorrencia": classifier.concurrency.snapshot(),
+        "triagem": classifier.triage.summary(),
+        "custo_usd": round(classifier.costs.total_cost, 6),
+        "tokens": sum(saved["tokens_used"] for saved in db.saved.values()),
+        "etapas": stage_timings.summary(),
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Teste de carga do pipeline de classificação sem rede")
+    parser.add_argument("--usuarios", type=int, default=200, help="Número de usuários sintéticos")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0, help="Latência simulada por consulta ao banco")
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--json", help="Arquivo para gravar o resultado em JSON")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Porta do /metrics durante a carga (0 desativa)")
+    parser.add_argument("--backend", choices=sorted(name for name in BACKENDS if name != "openai"),
+                        help="Backend do gateway de IA no lugar do servidor fake configurado abaixo")
+    parser.add_argument("--cassete", help="Arquivo de cassete que grava/reproduz as respostas do backend (use com --seed)")
+    parser.add_argument("--cassete-modo", default="completar", choices=["gravar", "reproduzir", "completar"])
+    parser.add_argument("--cassete-latencia", default="instantanea", choices=["instantanea", "gravada"])
+    add_server_arguments(parser)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    result = asyncio.run(run_load(args))
+
+    print("📊 RESULTADO DO TESTE DE CARGA")
+    print("=" * 50)
+    for key, value in result.items():
+        print(f"  {key}: {value}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"✅ Resultado salvo em {args.json}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
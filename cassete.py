@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Backend "cassete" do gateway de IA: grava pares requisição/resposta (com uso de tokens e latência) em um
+arquivo SQLite indexado pelo hash normalizado da requisição e os reproduz sem rede e sem custo
+
+Modos (LLM_CASSETTE_MODE):
+    gravar       chama o backend real (LLM_CASSETTE_INNER) e grava/sobrescreve cada resposta
+    reproduzir   só responde o que está gravado; requisição desconhecida é erro
+    completar    reproduz o que está gravado e grava o que faltar
+
+Uso:
+    LLM_BACKEND=cassete LLM_CASSETTE_MODE=gravar python main.py
+    LLM_BACKEND=cassete LLM_CASSETTE_MODE=reproduzir LLM_CASSETTE_LATENCY=gravada python main.py
+    python carga_pipeline.py --usuarios 200 --seed 1 --cassete carga.sqlite --cassete-modo gravar
+    python carga_pipeline.py --usuarios 200 --seed 1 --cassete carga.sqlite --cassete-modo reproduzir
+    python cassete.py --resumo carga.sqlite
+"""
+
+import re
+import json
+import time
+import zlib
+import asyncio
+import hashlib
+import sqlite3
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from config import LLM_CASSETTE_FILE, LLM_CASSETTE_MODE, LLM_CASSETTE_LATENCY, LLM_CASSETTE_INNER
+from llm_gateway import LLMResponse, make_usage, create_backend
+from custos import estimate_cost
+
+RECORD = "gravar"
+REPLAY = "reproduzir"
+COMPLETE = "completar"
+MODES = (RECORD, REPLAY, COMPLETE)
+
+INSTANT = "instantanea"
+RECORDED = "gravada"
+
+# Datas das mensagens mudam a cada geração do corpus sintético e não alteram a resposta esperada
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d+)?")
+_SPACES = re.compile(r"[ \t]+")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS gravacoes (
+        chave TEXT PRIMARY KEY,
+        modelo TEXT NOT NULL,
+        conteudo TEXT NOT NULL,
+        tokens_prompt INTEGER NOT NULL,
+        tokens_completion INTEGER NOT NULL,
+        tokens_cache INTEGER NOT NULL,
+        latencia_ms REAL NOT NULL,
+        requisicao BLOB NOT NULL,
+        gravado_em TEXT NOT NULL
+    ) WITHOUT ROWID
+"""
+
+
+class CassetteMiss(LookupError):
+    """Requisição sem gravação no modo reproduzir"""
+
+
+def normalize_text(text: str) -> str:
+    text = _TIMESTAMP.sub("<data>", text)
+    return "\n".join(_SPACES.sub(" ", line).strip() for line in text.strip().splitlines())
+
+
+def request_key(messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float) -> str:
+    """Hash da requisição normalizada (espaços e datas das mensagens não contam)"""
+    normalized = [[m.get("role", ""), normalize_text(m.get("content", ""))] for m in messages]
+    payload = json.dumps([model, max_tokens, round(float(temperature), 2), normalized], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CassetteBackend:
+    """Grava e reproduz respostas de outro backend a partir de um arquivo SQLite"""
+
+    nome = "cassete"
+
+    def __init__(self, path: str = LLM_CASSETTE_FILE, mode: str = LLM_CASSETTE_MODE,
+                 latency: str = LLM_CASSETTE_LATENCY, inner=None):
+        if mode not in MODES:
+            raise ValueError(f"Modo de cassete desconhecido: {mode} (use {', '.join(MODES)})")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.inner = inner if inner is not None or mode == REPLAY else create_backend(LLM_CASSETTE_INNER)
+        self.counters = Counter()
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    @property
+    def available(self) -> bool:
+        return self.mode == REPLAY or bool(getattr(self.inner, "available", False))
+
+    def lookup(self, key: str) -> Optional[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT modelo, conteudo, tokens_prompt, tokens_completion, tokens_cache, latencia_ms "
+            "FROM gravacoes WHERE chave = ?", (key,)
+        ).fetchone()
+
+    def store(self, key: str, messages: List[Dict[str, str]], response: LLMResponse, latency_ms: float):
+        usage = response.usage
+        details = getattr(usage, "prompt_tokens_details", None)
+        request = zlib.compress(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO gravacoes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, response.model, response.content, getattr(usage, "prompt_tokens", 0) or 0,
+             getattr(usage, "completion_tokens", 0) or 0, getattr(details, "cached_tokens", 0) or 0,
+             round(latency_ms, 1), request, datetime.now().isoformat(timespec="seconds"))
+        )
+        self.conn.commit()
+
+    async def complete(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                       temperature: float) -> LLMResponse:
+        key = request_key(messages, model, max_tokens, temperature)
+        if self.mode != RECORD:
+            row = self.lookup(key)
+            if row is not None:
+                self.counters["reproduzidas"] += 1
+                recorded_model, content, prompt_tokens, completion_tokens, cached_tokens, latency_ms = row
+                if self.latency == RECORDED:
+                    await asyncio.sleep(latency_ms / 1000)
+                # Uso gravado: o ledger e os relatórios de custo continuam comparáveis com a execução original
+                return LLMResponse(content, recorded_model, make_usage(prompt_tokens, completion_tokens, cached_tokens),
+                                   self.nome)
+            if self.mode == REPLAY:
+                self.counters["ausentes"] += 1
+                raise CassetteMiss(f"Requisição {key[:12]} não gravada no cassete {self.path}")
+
+        start = time.perf_counter()
+        response = await self.inner.complete(messages, model, max_tokens, temperature)
+        self.store(key, messages, response, (time.perf_counter() - start) * 1000)
+        self.counters["gravadas"] += 1
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {"modo": self.mode, **dict(self.counters)}
+
+    async def aclose(self):
+        if self.inner is not None:
+            await self.inner.aclose()
+        self.conn.close()
+
+
+def print_summary(path: str):
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT modelo, COUNT(*), SUM(tokens_prompt), SUM(tokens_completion), SUM(tokens_cache), "
+            "AVG(latencia_ms), MIN(gravado_em), MAX(gravado_em) FROM gravacoes GROUP BY modelo"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    if not rows:
+        print(f"❌ Cassete vazio: {path}")
+        return
+    print(f"📼 Cassete {path}")
+    for model, count, prompt_tokens, completion_tokens, cached_tokens, latency, first, last in rows:
+        cost = estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        print(f"  {model}: {count:,} respostas, {prompt_tokens + completion_tokens:,} tokens "
+              f"(US$ {cost:.4f} por reprodução), latência média {latency:.0f}ms, gravadas entre {first} e {last}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cassete de gravação/reprodução das chamadas à IA")
+    parser.add_argument("--resumo", metavar="ARQUIVO", help="Respostas, tokens e latência gravados no cassete")
+    args = parser.parse_args()
+    if args.resumo:
+        print_summary(args.resumo)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
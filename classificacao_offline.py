@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Classificação offline sobre exportações da chat_history (CSV, Parquet ou COPY binário), sem tocar
+no banco de produção: leitura em streaming, agrupamento por cliente com memória limitada e
+classificação por palavras-chave + triagem num pool de processos
+
+Exportação (a ordem das colunas do COPY binário deve ser a de --colunas e o tipo do cliente o de --tipo-cliente):
+    \\copy (SELECT customer_id, message, message_date, message_type FROM chat_history
+           ORDER BY customer_id) TO 'chat_history.bin' WITH (FORMAT binary)
+
+Uso:
+    python classificacao_offline.py chat_history.csv --saida offline.csv
+    python classificacao_offline.py chat_history.bin --ordenado --processos 8 --saida offline.parquet
+    python classificacao_offline.py --carregar offline.csv      # grava na classificacoes
+"""
+
+import os
+import csv
+import time
+import heapq
+import struct
+import pickle
+import asyncio
+import argparse
+import tempfile
+import itertools
+import multiprocessing
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Tuple, Iterator, Iterable, Optional
+from config import CHAT_HISTORY_USER_ID_COLUMN, CHAT_HISTORY_MESSAGE_COLUMN, CHAT_HISTORY_TIMESTAMP_COLUMN
+from conversa import Conversa, Mensagem
+
+# Mesma janela do LAST_MESSAGES_QUERY do database.py
+MESSAGE_TYPES = ("USR", "AIR")
+WINDOW_SIZE = 25
+
+DEFAULT_INPUT_COLUMNS = [CHAT_HISTORY_USER_ID_COLUMN, CHAT_HISTORY_MESSAGE_COLUMN,
+                         CHAT_HISTORY_TIMESTAMP_COLUMN, "message_type"]
+
+OUTPUT_COLUMNS = [
+    "user_id", "classificacao", "classificacao_especifica", "confianca", "contexto", "sugestao_melhoria",
+    "tokens_utilizados", "tempo_processamento_ms", "modelo_utilizado", "status",
+    "quantidade_mensagens", "ultima_mensagem", "mensagens",
+]
+
+OFFLINE_MODEL = "palavras-chave"
+
+Row = Tuple[str, str, datetime, str]  # (customer_id, mensagem, data, tipo)
+
+
+# ----------------------------------------------------------------------------
+# Leitores em streaming
+# ----------------------------------------------------------------------------
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).strip().replace(" ", "T", 1))
+
+
+def read_csv(path: str, columns: List[str]) -> Iterator[Row]:
+    customer, message, stamp, kind = columns
+    with open(path, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            yield record[customer], record[message], _parse_timestamp(record[stamp]), record[kind]
+
+
+def read_parquet(path: str, columns: List[str], batch_size: int = 65536) -> Iterator[Row]:
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+        customers, messages, stamps, kinds = (batch.column(name).to_pylist() for name in columns)
+        for customer, message, stamp, kind in zip(customers, messages, stamps, kinds):
+            yield str(customer), message, _parse_timestamp(stamp), kind
+
+
+PGCOPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+POSTGRES_EPOCH = datetime(2000, 1, 1)
+
+# Formato binário do campo do cliente pelo tipo da coluna exportada (o COPY binário não traz os tipos)
+CUSTOMER_FORMATS = {"bigint": ">q", "integer": ">i", "smallint": ">h", "text": None}
+DEFAULT_CUSTOMER_TYPE = "bigint"
+
+
+def _customer_decoder(customer_type: str):
+    if customer_type not in CUSTOMER_FORMATS:
+        raise ValueError(f"Tipo de cliente desconhecido: {customer_type} (use {', '.join(CUSTOMER_FORMATS)})")
+    fmt = CUSTOMER_FORMATS[customer_type]
+    if fmt is None:
+        return lambda raw: raw.decode("utf-8")
+    size = struct.calcsize(fmt)
+
+    def decode(raw: bytes) -> str:
+        if len(raw) != size:
+            raise ValueError(f"Cliente com {len(raw)} bytes não é {customer_type}: confira --tipo-cliente")
+        return str(struct.unpack(fmt, raw)[0])
+    return decode
+
+
+def read_pgcopy(path: str, columns: List[str], customer_type: str = DEFAULT_CUSTOMER_TYPE) -> Iterator[Row]:
+    """Lê o formato binário do COPY (cliente do tipo informado, textos e timestamp sem fuso, na ordem de --colunas)"""
+    customer_index, message_index, stamp_index, kind_index = range(4)
+    decode_customer = _customer_decoder(customer_type)
+    with open(path, "rb") as f:
+        if f.read(len(PGCOPY_SIGNATURE)) != PGCOPY_SIGNATURE:
+            raise ValueError(f"{path} não é um arquivo COPY binário do PostgreSQL")
+        f.read(4)  # flags
+        f.read(struct.unpack(">I", f.read(4))[0])  # extensão do cabeçalho
+
+        while True:
+            (field_count,) = struct.unpack(">h", f.read(2))
+            if field_count == -1:
+                return
+            fields = []
+            for _ in range(field_count):
+                (length,) = struct.unpack(">i", f.read(4))
+                fields.append(None if length == -1 else f.read(length))
+
+            raw_customer = fields[customer_index]
+            if raw_customer is None:
+                continue  # mensagem sem cliente não entra em nenhuma conversa
+            stamp = fields[stamp_index]
+            yield (
+                decode_customer(raw_customer),
+                fields[message_index].decode("utf-8") if fields[message_index] is not None else "",
+                POSTGRES_EPOCH + timedelta(microseconds=struct.unpack(">q", stamp)[0]) if stamp else None,
+                fields[kind_index].decode("utf-8") if fields[kind_index] is not None else "",
+            )
+
+
+def open_reader(path: str, columns: List[str], customer_type: str = DEFAULT_CUSTOMER_TYPE) -> Iterator[Row]:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        return read_parquet(path, columns)
+    if extension in (".bin", ".copy", ".pgcopy"):
+        return read_pgcopy(path, columns, customer_type)
+    return read_csv(path, columns)
+
+
+# ----------------------------------------------------------------------------
+# Agrupamento por cliente
+# ----------------------------------------------------------------------------
+
+class MessageWindow:
+    """Guarda só as WINDOW_SIZE mensagens mais recentes de um cliente (heap de tamanho fixo)"""
+    __slots__ = ("heap", "seq")
+
+    def __init__(self):
+        self.heap = []
+        self.seq = 0
+
+    def add(self, message: str, stamp: datetime, kind: str):
+        self.seq += 1
+        item = (stamp or datetime.min, self.seq, message, kind)
+        if len(self.heap) < WINDOW_SIZE:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+
+    def messages(self) -> Conversa:
+        """Mais recentes primeiro, no mesmo formato de get_last_25_messages"""
+        return Conversa(Mensagem(message, stamp if stamp != datetime.min else None, kind)
+                        for stamp, _, message, kind in sorted(self.heap, reverse=True))
+
+
+def group_sorted(rows: Iterable[Row]) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Entrada já ordenada por cliente: um grupo em memória por vez"""
+    for customer, customer_rows in itertools.groupby(rows, key=lambda row: row[0]):
+        window = MessageWindow()
+        for _, message, stamp, kind in customer_rows:
+            if kind in MESSAGE_TYPES:
+                window.add(message, stamp, kind)
+        if window.heap:
+            yield customer, window.messages()
+
+
+def group_partitioned(rows: Iterable[Row], partitions: int,
+                      workdir: str = None) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Entrada sem ordem: espalha por hash do cliente em arquivos temporários e agrupa uma partição por vez"""
+    with tempfile.TemporaryDirectory(prefix="offline_", dir=workdir) as tmp:
+        files = [open(os.path.join(tmp, f"{index:04d}.pkl"), "wb") for index in range(partitions)]
+        try:
+            for row in rows:
+                if row[3] in MESSAGE_TYPES:
+                    pickle.dump(row, files[hash(row[0]) % partitions], protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            for f in files:
+                f.close()
+
+        for index in range(partitions):
+            windows: Dict[str, MessageWindow] = {}
+            path = os.path.join(tmp, f"{index:04d}.pkl")
+            with open(path, "rb") as f:
+                while True:
+                    try:
+                        customer, message, stamp, kind = pickle.load(f)
+                    except EOFError:
+                        break
+                    window = windows.get(customer)
+                    if window is None:
+                        window = windows[customer] = MessageWindow()
+                    window.add(message, stamp, kind)
+            os.remove(path)
+            for customer, window in windows.items():
+                yield customer, window.messages()
+
+
+def batched(groups: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(groups)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ----------------------------------------------------------------------------
+# Classificação no pool de processos
+# ----------------------------------------------------------------------------
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker():
+    from tag_based_classifier import TagBasedClassifier
+    from triage import ConversationTriage
+    _worker["classifier"] = TagBasedClassifier(use_ai=False)
+    _worker["triage"] = ConversationTriage()
+
+
+def classify_batch(batch: List[Tuple[str, List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """Triagem e palavras-chave para um lote de conversas (executado em cada processo do pool)"""
+    from database import encode_snapshot
+    classifier, triage = _worker["classifier"], _worker["triage"]
+    results = []
+    for customer, messages in batch:
+        start = time.perf_counter()
+        result = triage.evaluate(messages)
+        if result is None:
+            classification, confidence, context = classifier.classify_by_keywords(messages)
+            result = {"classification": classification, "confidence": confidence, "context": context,
+                      "classificacao_especifica": "", "sugestao_melhoria": ""}
+        stamps = [msg["timestamp"] for msg in messages if msg["timestamp"]]
+        results.append({
+            "user_id": customer,
+            "classificacao": result["classification"],
+            "classificacao_especifica": result.get("classificacao_especifica", ""),
+            "confianca": round(float(result["confidence"]), 4),
+            "contexto": result["context"],
+            "sugestao_melhoria": result.get("sugestao_melhoria", ""),
+            "tokens_utilizados": 0,
+            "tempo_processamento_ms": int((time.perf_counter() - start) * 1000),
+            "modelo_utilizado": OFFLINE_MODEL,
+            "status": "concluido",
+            "quantidade_mensagens": len(messages),
+            "ultima_mensagem": max(stamps).isoformat() if stamps else None,
+            "mensagens": encode_snapshot(messages),
+        })
+    return results
+
+
+# ----------------------------------------------------------------------------
+# Saída
+# ----------------------------------------------------------------------------
+
+class ResultWriter:
+    """Grava os resultados em CSV (pronto para COPY) ou Parquet, em lotes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = path.lower().endswith(".parquet")
+        self.rows = 0
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._pa = pa
+            types = {"confianca": pa.float64(), "tokens_utilizados": pa.int64(),
+                     "tempo_processamento_ms": pa.int64(), "quantidade_mensagens": pa.int64()}
+            self.schema = pa.schema([(name, types.get(name, pa.string())) for name in OUTPUT_COLUMNS])
+            self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_COLUMNS)
+            self._writer.writeheader()
+
+    def write(self, results: List[Dict[str, Any]]):
+        if not results:
+            return
+        if self.parquet:
+            self._writer.write_table(self._pa.Table.from_pylist(results, schema=self.schema))
+        else:
+            self._writer.writerows(results)
+        self.rows += len(results)
+
+    def close(self):
+        if self.parquet:
+            self._writer.close()
+        else:
+            self._file.close()
+
+
+def classify_file(path: str, output: str, columns: List[str] = None, processes: int = None,
+                  batch_size: int = 500, partitions: int = 64, sorted_input: bool = False,
+                  customer_type: str = DEFAULT_CUSTOMER_TYPE) -> Dict[str, Any]:
+    columns = columns or DEFAULT_INPUT_COLUMNS
+    rows = open_reader(path, columns, customer_type)
+    groups = group_sorted(rows) if sorted_input else group_partitioned(rows, partitions)
+
+    started = time.perf_counter()
+    writer = ResultWriter(output)
+    tags = {}
+    next_report = batch_size * 20
+    try:
+        with multiprocessing.Pool(processes or os.cpu_count(), initializer=_init_worker) as pool:
+            for results in pool.imap_unordered(classify_batch, batched(groups, batch_size)):
+                writer.write(results)
+                for result in results:
+                    tags[result["classificacao"]] = tags.get(result["classificacao"], 0) + 1
+                if writer.rows >= next_report:
+                    next_report += batch_size * 20
+                    print(f"📈 {writer.rows:,} conversas classificadas "
+                          f"({writer.rows / (time.perf_counter() - started):,.0f}/s)")
+    finally:
+        writer.close()
+
+    return {"conversas": writer.rows, "segundos": round(time.perf_counter() - started, 2), "tags": tags}
+
+
+# ----------------------------------------------------------------------------
+# Carga na classificacoes
+# ----------------------------------------------------------------------------
+
+STAGING_TABLE = "classificacoes_offline_carga"
+
+LOAD_FROM_STAGING = f"""
+    WITH novos AS (
+        INSERT INTO classificacoes (
+            user_id, classificacao, classificacao_especifica, confianca, contexto, sugestao_melhoria,
+            tokens_utilizados, tempo_processamento_ms, modelo_utilizado, status
+        )
+        SELECT s.user_id, s.classificacao, s.classificacao_especifica, s.confianca, s.contexto, s.sugestao_melhoria,
+               s.tokens_utilizados, s.tempo_processamento_ms, s.modelo_utilizado, s.status
+        FROM {STAGING_TABLE} s
+        WHERE NOT EXISTS (SELECT 1 FROM classificacoes c WHERE c.user_id = s.user_id)
+        RETURNING id, user_id
+    )
+    INSERT INTO conversas_snapshot (classificacao_id, user_id, customer_id, quantidade_mensagens, ultima_mensagem, mensagens)
+    SELECT n.id, n.user_id,
+           CASE WHEN n.user_id ~ '^[0-9]+$' THEN n.user_id::bigint END,
+           s.quantidade_mensagens, s.ultima_mensagem, s.mensagens::jsonb
+    FROM novos n
+    JOIN {STAGING_TABLE} s ON s.user_id = n.user_id
+    WHERE s.mensagens IS NOT NULL
+"""
+
+
+async def load_results(path: str):
+    """COPY do CSV para uma tabela temporária e INSERT dos usuários ainda não classificados"""
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        await db.ensure_schema()
+
+        conn = await db.get_connection()
+        try:
+            async with conn.transaction():
+                await conn.execute(f"""
+                    CREATE TEMP TABLE {STAGING_TABLE} (
+                        user_id VARCHAR(255), classificacao TEXT, classificacao_especifica TEXT, confianca DECIMAL(5,4),
+                        contexto TEXT, sugestao_melhoria TEXT, tokens_utilizados INTEGER, tempo_processamento_ms INTEGER,
+                        modelo_utilizado VARCHAR(100), status VARCHAR(50), quantidade_mensagens SMALLINT,
+                        ultima_mensagem TIMESTAMP, mensagens TEXT
+                    ) ON COMMIT DROP
+                """)
+                await conn.copy_to_table(STAGING_TABLE, source=path, columns=OUTPUT_COLUMNS, format="csv", header=True)
+                staged = await conn.fetchval(f"SELECT COUNT(*) FROM {STAGING_TABLE}")
+                status = await conn.execute(LOAD_FROM_STAGING)
+        finally:
+            await conn.close()
+
+        # A carga em massa não passa pelo UPSERT incremental do resumo diário
+        rows = await db.rebuild_daily_summary()
+        print(f"✅ {int(status.split()[-1]):,} de {staged:,} classificações carregadas "
+              f"(usuários já classificados ignorados); resumo diário com {rows} linhas")
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classificação offline de exportações da chat_history")
+    parser.add_argument("entrada", nargs="?", help="Arquivo .csv, .parquet ou COPY binário (.bin/.copy)")
+    parser.add_argument("--saida", default="classificacoes_offline.csv", help="Resultado (.csv ou .parquet)")
+    parser.add_argument("--colunas", default=",".join(DEFAULT_INPUT_COLUMNS),
+                        help="Colunas de cliente, mensagem, data e tipo, nessa ordem")
+    parser.add_argument("--tipo-cliente", choices=sorted(CUSTOMER_FORMATS), default=DEFAULT_CUSTOMER_TYPE,
+                        help="Tipo da coluna do cliente no COPY binário")
+    parser.add_argument("--processos", type=int, default=None, help="Processos do pool (padrão: núcleos)")
+    parser.add_argument("--lote", type=int, default=500, help="Conversas por tarefa enviada ao pool")
+    parser.add_argument("--particoes", type=int, default=64, help="Arquivos temporários do agrupamento externo")
+    parser.add_argument("--ordenado", action="store_true",
+                        help="Entrada já ordenada por cliente: agrupa em uma passada sem arquivos temporários")
+    parser.add_argument("--carregar", metavar="CSV", help="Carrega um resultado CSV na classificacoes")
+    args = parser.parse_args()
+
+    if args.carregar:
+        asyncio.run(load_results(args.carregar))
+        return
+    if not args.entrada:
+        parser.error("informe o arquivo de entrada ou --carregar")
+
+    columns = [name.strip() for name in args.colunas.split(",")]
+    if len(columns) != 4:
+        parser.error("--colunas precisa de 4 nomes: cliente, mensagem, data, tipo")
+
+    print(f"🔄 Classificando {args.entrada} → {args.saida}")
+    summary = classify_file(args.entrada, args.saida, columns, args.processos, args.lote,
+                            args.particoes, args.ordenado, args.tipo_cliente)
+    print(f"✅ {summary['conversas']:,} conversas em {summary['segundos']}s")
+    for tag, count in sorted(summary["tags"].items(), key=lambda item: item[1], reverse=True):
+        print(f"  {tag}: {count:,}")
+
+
+if __name__ == "__main__":
+    main()
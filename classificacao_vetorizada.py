@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Classificação por palavras-chave em lote: matriz conversas x tags calculada com operações
+vetorizadas (pyarrow/NumPy), mesmas regras do TagBasedClassifier.classify_by_keywords
+
+Uso:
+    python classificacao_vetorizada.py --snapshots                 # compara com as tags gravadas
+    python classificacao_vetorizada.py --entrada chat_history.csv  # exportação da chat_history
+"""
+
+import time
+import asyncio
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Dict, Any, List, Iterable, Union
+from config import TAG_KEYWORDS
+
+DEFAULT_TAG = "Outros"
+MAX_CONFIDENCE = 0.9
+HITS_FOR_MAX_CONFIDENCE = 3.0
+
+Texts = Union[pd.Series, pa.Array, pa.ChunkedArray, List[str]]
+
+
+class TokenIndex:
+    """Índice invertido de um bloco de textos: token (separado por espaços) -> linhas em que aparece"""
+
+    def __init__(self, lowered: pa.Array):
+        self.size = len(lowered)
+        tokens = pc.utf8_split_whitespace(lowered)
+        parents = pc.list_parent_indices(tokens).to_numpy()
+        flat = pc.list_flatten(tokens)
+        encoded = pc.dictionary_encode(flat).combine_chunks() if isinstance(flat, pa.ChunkedArray) \
+            else pc.dictionary_encode(flat)
+        self.vocabulary = encoded.dictionary
+        token_ids = encoded.indices.to_numpy(zero_copy_only=False)
+
+        # Linhas agrupadas por token (CSR): rows[offsets[t]:offsets[t + 1]]
+        order = np.argsort(token_ids, kind="stable")
+        self.rows = parents[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(token_ids, minlength=len(self.vocabulary)))))
+
+    def rows_with_piece(self, piece: str) -> np.ndarray:
+        """Máscara das linhas com algum token que contém o trecho (um trecho sem espaços sempre cabe num token)"""
+        mask = np.zeros(self.size, dtype=bool)
+        token_ids = np.flatnonzero(pc.match_substring(self.vocabulary, piece).to_numpy(zero_copy_only=False))
+        for token_id in token_ids:
+            mask[self.rows[self.offsets[token_id]:self.offsets[token_id + 1]]] = True
+        return mask
+
+
+class VectorizedKeywordTagger:
+    """Pontua muitas conversas de uma vez: cada palavra-chave é buscada uma vez no corpus inteiro"""
+
+    def __init__(self, tag_keywords: Dict[str, List[str]] = None, chunk_size: int = 50000):
+        tag_keywords = tag_keywords if tag_keywords is not None else TAG_KEYWORDS
+        self.tags = list(tag_keywords)
+        self.chunk_size = chunk_size
+
+        # Palavras-chave únicas e a incidência palavra x tag (repetidas na mesma tag contam de novo, como no laço)
+        self.keywords: List[str] = []
+        index: Dict[str, int] = {}
+        pairs = []
+        for tag_index, keywords in enumerate(tag_keywords.values()):
+            for keyword in keywords:
+                key = keyword.lower()
+                if key not in index:
+                    index[key] = len(self.keywords)
+                    self.keywords.append(key)
+                pairs.append((index[key], tag_index))
+        # float32 para o produto matricial usar BLAS; as contagens são inteiros pequenos (exatos)
+        self.incidence = np.zeros((len(self.keywords), len(self.tags)), dtype=np.float32)
+        for keyword_index, tag_index in pairs:
+            self.incidence[keyword_index, tag_index] += 1
+
+    @staticmethod
+    def _as_arrow(texts: Texts) -> Union[pa.Array, pa.ChunkedArray]:
+        if isinstance(texts, pd.Series):
+            return pa.array(texts.astype(object).where(texts.notna(), None), type=pa.string())
+        if isinstance(texts, (pa.Array, pa.ChunkedArray)):
+            return texts
+        return pa.array(texts, type=pa.string())
+
+    def keyword_hits(self, texts: Texts) -> np.ndarray:
+        """Matriz booleana conversas x palavras-chave (substring, sem diferenciar maiúsculas)
+
+        Em vez de procurar cada palavra-chave em todos os textos, os candidatos saem de um índice
+        de tokens; só as linhas candidatas de frases passam pela busca exata de substring.
+        """
+        lowered = pc.utf8_lower(self._as_arrow(texts))
+        if isinstance(lowered, pa.ChunkedArray):
+            lowered = lowered.combine_chunks()
+        hits = np.zeros((len(lowered), len(self.keywords)), dtype=bool)
+        index = TokenIndex(lowered)
+        piece_rows: Dict[str, np.ndarray] = {}
+
+        for column, keyword in enumerate(self.keywords):
+            pieces = keyword.split()
+            if not pieces:
+                found = pc.fill_null(pc.match_substring(lowered, keyword), False)
+                hits[:, column] = found.to_numpy(zero_copy_only=False)
+                continue
+
+            for piece in pieces:
+                if piece not in piece_rows:
+                    piece_rows[piece] = index.rows_with_piece(piece)
+            candidates = np.flatnonzero(np.logical_and.reduce([piece_rows[piece] for piece in pieces]))
+
+            if pieces == [keyword]:
+                # Palavra-chave sem espaços: estar dentro de um token equivale a ser substring do texto
+                hits[candidates, column] = True
+            elif len(candidates):
+                found = pc.match_substring(lowered.take(pa.array(candidates)), keyword)
+                hits[candidates, column] = pc.fill_null(found, False).to_numpy(zero_copy_only=False)
+        return hits
+
+    def hit_matrix(self, texts: Texts) -> np.ndarray:
+        """Contagem de palavras-chave encontradas por conversa x tag, processada em blocos"""
+        texts = self._as_arrow(texts)
+        total = len(texts)
+        scores = np.zeros((total, len(self.tags)), dtype=np.int32)
+        for start in range(0, total, self.chunk_size):
+            chunk = texts.slice(start, self.chunk_size)
+            scores[start:start + len(chunk)] = self.keyword_hits(chunk).astype(np.float32) @ self.incidence
+        return scores
+
+    def classify(self, texts: Texts) -> pd.DataFrame:
+        """Melhor tag, confiança e margem para cada conversa (texto nulo = conversa sem mensagens)"""
+        texts = self._as_arrow(texts)
+        scores = self.hit_matrix(texts)
+        best_index = scores.argmax(axis=1)
+        best = scores.max(axis=1)
+        second = np.partition(scores, -2, axis=1)[:, -2] if len(self.tags) > 1 else np.zeros_like(best)
+        matched = best > 0
+
+        empty = texts.is_null().to_numpy(zero_copy_only=False)
+        tags = np.array(self.tags, dtype=object)
+
+        return pd.DataFrame({
+            "classificacao": np.where(matched, tags[best_index], DEFAULT_TAG),
+            "confianca": np.where(matched, np.minimum(best / HITS_FOR_MAX_CONFIDENCE, MAX_CONFIDENCE),
+                                  np.where(empty, 0.0, 0.5)),
+            "acertos": best,
+            "margem": best - second,
+        })
+
+
+def conversation_texts(conversations: Iterable[List[Dict[str, Any]]]) -> List[str]:
+    """Texto único por conversa, como o classify_by_keywords monta (mensagens separadas por espaço)"""
+    return [" ".join(msg["message"] for msg in messages) if messages else None for messages in conversations]
+
+
+# ----------------------------------------------------------------------------
+# Fontes do corpus
+# ----------------------------------------------------------------------------
+
+SNAPSHOT_TEXTS_QUERY = """
+    SELECT s.user_id,
+           c.classificacao AS classificacao_gravada,
+           (SELECT string_agg(m.item->>2, ' ' ORDER BY m.pos)
+            FROM jsonb_array_elements(s.mensagens) WITH ORDINALITY AS m(item, pos)) AS texto
+    FROM conversas_snapshot s
+    JOIN classificacoes c ON c.id = s.classificacao_id
+"""
+
+
+async def load_snapshot_texts() -> pd.DataFrame:
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        conn = await db.get_connection()
+        try:
+            rows = await conn.fetch(SNAPSHOT_TEXTS_QUERY)
+        finally:
+            await conn.close()
+        return pd.DataFrame([dict(row) for row in rows], columns=["user_id", "classificacao_gravada", "texto"])
+    finally:
+        await db.close()
+
+
+def load_export_texts(path: str, sorted_input: bool = False) -> pd.DataFrame:
+    from classificacao_offline import open_reader, group_sorted, group_partitioned, DEFAULT_INPUT_COLUMNS
+    rows = open_reader(path, DEFAULT_INPUT_COLUMNS)
+    groups = group_sorted(rows) if sorted_input else group_partitioned(rows, 64)
+    user_ids, conversations = [], []
+    for customer, messages in groups:
+        user_ids.append(customer)
+        conversations.append(messages)
+    return pd.DataFrame({"user_id": user_ids, "texto": conversation_texts(conversations)})
+
+
+def print_distribution(corpus: pd.DataFrame, result: pd.DataFrame, seconds: float):
+    total = len(result)
+    print(f"⚡ {total:,} conversas pontuadas em {seconds:.2f}s ({total / seconds if seconds else 0:,.0f}/s)")
+    counts = result["classificacao"].value_counts()
+
+    if "classificacao_gravada" in corpus:
+        stored = corpus["classificacao_gravada"].value_counts()
+        table = pd.DataFrame({"gravada": stored, "palavras_chave": counts}).fillna(0).astype(int)
+        table["diferenca"] = table["palavras_chave"] - table["gravada"]
+        table = table.sort_values("palavras_chave", ascending=False)
+        print(f"\n{'Tag':<60} {'Gravada':>9} {'Palavras-chave':>15} {'Diferença':>10}")
+        print("-" * 97)
+        for tag, row in table.iterrows():
+            print(f"{str(tag)[:60]:<60} {row['gravada']:>9,} {row['palavras_chave']:>15,} {row['diferenca']:>+10,}")
+        agreement = (corpus["classificacao_gravada"].to_numpy() == result["classificacao"].to_numpy()).mean()
+        print(f"\n🎯 Concordância com a tag gravada: {agreement:.1%}")
+    else:
+        print()
+        for tag, count in counts.items():
+            print(f"  {tag}: {count:,} ({count / total:.1%})")
+
+    ambiguous = int(((result["margem"] == 0) & (result["acertos"] > 0)).sum())
+    print(f"⚖️ Empates entre tags (margem 0): {ambiguous:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribuição das tags por palavras-chave sobre o corpus inteiro")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--snapshots", action="store_true", help="Usa as conversas gravadas em conversas_snapshot")
+    source.add_argument("--entrada", help="Exportação da chat_history (.csv, .parquet ou COPY binário)")
+    parser.add_argument("--ordenado", action="store_true", help="Exportação já ordenada por cliente")
+    args = parser.parse_args()
+
+    corpus = asyncio.run(load_snapshot_texts()) if args.snapshots else load_export_texts(args.entrada, args.ordenado)
+    tagger = VectorizedKeywordTagger()
+    started = time.perf_counter()
+    result = tagger.classify(corpus["texto"])
+    print_distribution(corpus, result, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Ponto de entrada único do classificador: cada subcomando importa só o que usa
+(o progresso pelo /metrics não carrega asyncpg, NumPy nem o cliente da IA)
+
+Uso:
+    python classificador.py executar --incremental       # (run) python main.py
+    python classificador.py exportar --saida c.parquet   # (export) python exportar_resultados.py
+    python classificador.py progresso                    # (progress) python monitor_progresso.py
+    python classificador.py verificar                    # (verify) python verificar_classificacoes.py
+    python classificador.py migrar --apenas-verificar    # (migrate) python migrar_schema.py
+    python classificador.py compilar [--forcar]          # artefatos de tags, palavras-chave e prompt
+"""
+
+import sys
+import time
+import argparse
+import importlib
+
+
+def _run_async(module: str, function: str):
+    def run():
+        import asyncio
+        asyncio.run(getattr(importlib.import_module(module), function)())
+    return run
+
+
+def _call(module: str, function: str):
+    return lambda: getattr(importlib.import_module(module), function)()
+
+
+def compile_command():
+    parser = argparse.ArgumentParser(prog="classificador.py compilar",
+                                     description="Compila os artefatos do classificador (se o config mudou)")
+    parser.add_argument("--forcar", action="store_true", help="Recompila mesmo com o hash igual")
+    args = parser.parse_args()
+
+    from artefatos import load_artifacts
+    from config import ARTIFACTS_FILE
+    started = time.perf_counter()
+    artifacts, compiled = load_artifacts(ARTIFACTS_FILE, force=args.forcar)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"{'🔨 Compilado' if compiled else '✅ Em cache'}: {ARTIFACTS_FILE} em {elapsed_ms:.1f}ms")
+    print(f"   Hash: {artifacts.hash} | Taxonomia: {artifacts.taxonomy_version} | Compilado em {artifacts.compiled_at}")
+    print(f"   {len(artifacts.keyword_tags)} tags com palavras-chave, {len(artifacts.keyword_matcher)} palavras-chave distintas")
+
+
+# subcomando -> (apelidos, descrição, função que executa com o sys.argv já ajustado)
+COMMANDS = {
+    "executar": (["run"], "Classifica os usuários pendentes (main.py)", _call("main", "cli")),
+    "exportar": (["export"], "Exporta as classificações para CSV/Parquet", _call("exportar_resultados", "main")),
+    "progresso": (["progress"], "Progresso da execução ativa ou do banco", _run_async("monitor_progresso", "check_progress")),
+    "verificar": (["verify"], "Resumo das classificações gravadas",
+                  _run_async("verificar_classificacoes", "verificar_classificacoes")),
+    "migrar": (["migrate"], "Migrações do schema e verificação dos planos", _call("migrar_schema", "main")),
+    "compilar": (["compile"], "Compila os artefatos de tags, palavras-chave e prompt", compile_command),
+}
+
+
+ALIASES = {alias: name for name, (aliases, _, _) in COMMANDS.items() for alias in (name, *aliases)}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    commands = "\n".join(f"  {name:<10} {description} ({', '.join(aliases)})"
+                         for name, (aliases, description, _) in COMMANDS.items())
+    parser = argparse.ArgumentParser(description="Classificador de conversas", epilog=f"subcomandos:\n{commands}",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("comando", choices=sorted(ALIASES), metavar="comando")
+    # Argumentos do subcomando seguem para o script correspondente (inclusive --help)
+    parser.add_argument("argumentos", nargs=argparse.REMAINDER)
+    return parser
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    name = ALIASES[args.comando]
+    sys.argv = [f"classificador.py {name}", *args.argumentos]
+    COMMANDS[name][2]()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
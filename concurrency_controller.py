@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Controle adaptativo de concorrência (AIMD) para as tarefas de classificação
+"""
+
+import asyncio
+import math
+import time
+import logging
+from collections import deque
+from typing import Dict, Any, Optional
+from config import (
+    CONCURRENCY_INITIAL, CONCURRENCY_MIN, CONCURRENCY_MAX,
+    CONCURRENCY_ADDITIVE_INCREASE, CONCURRENCY_DECREASE_FACTOR,
+    CONCURRENCY_TARGET_P95_MS, CONCURRENCY_MAX_ERROR_RATE,
+    CONCURRENCY_WINDOW, CONCURRENCY_DECREASE_COOLDOWN
+)
+
+# Erros que indicam sobrecarga e reduzem a concorrência imediatamente
+OVERLOAD_ERRORS = {"rate_limit", "timeout"}
+
+
+def classify_llm_error(error: BaseException) -> str:
+    """Classifica uma exceção da chamada à IA em rate_limit, timeout, server ou other"""
+    name = type(error).__name__
+    status = getattr(error, "status_code", None)
+
+    if status == 429 or name == "RateLimitError":
+        return "rate_limit"
+    if isinstance(error, asyncio.TimeoutError) or "Timeout" in name:
+        return "timeout"
+    if status is not None and status >= 500:
+        return "server"
+    return "other"
+
+
+def percentile(values, fraction: float) -> float:
+    """Percentil simples (nearest-rank) de uma sequência"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+class AIMDConcurrencyController:
+    """
+    Limita o número de process_user em voo e ajusta o limite em tempo de execução:
+    aumenta de forma aditiva enquanto a latência p95 e a taxa de erro da IA
+    estão saudáveis e reduz de forma multiplicativa em 429s e timeouts.
+    """
+
+    def __init__(self, initial: int = CONCURRENCY_INITIAL, minimum: int = CONCURRENCY_MIN,
+                 maximum: int = CONCURRENCY_MAX, increase: float = CONCURRENCY_ADDITIVE_INCREASE,
+                 decrease_factor: float = CONCURRENCY_DECREASE_FACTOR,
+                 target_p95_ms: float = CONCURRENCY_TARGET_P95_MS,
+                 max_error_rate: float = CONCURRENCY_MAX_ERROR_RATE,
+                 window: int = CONCURRENCY_WINDOW,
+                 decrease_cooldown: float = CONCURRENCY_DECREASE_COOLDOWN):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.target_p95_ms = target_p95_ms
+        self.max_error_rate = max_error_rate
+        self.decrease_cooldown = decrease_cooldown
+        self.logger = logging.getLogger(__name__)
+
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+
+        self._latencies = deque(maxlen=window)
+        self._errors = deque(maxlen=window)
+        self._samples_since_decision = 0
+        self._last_decrease = 0.0
+        self._changed = asyncio.Event()
+
+        self.increases = 0
+        self.decreases = 0
+        self.decisions = deque(maxlen=200)
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    async def acquire(self):
+        """Aguarda até haver vaga dentro do limite atual"""
+        while self.in_flight >= self.current_limit:
+            self._changed.clear()
+            await self._changed.wait()
+        self.in_flight += 1
+
+    def release(self):
+        """Libera a vaga de uma tarefa concluída"""
+        self.in_flight -= 1
+        self._changed.set()
+
+    def record(self, latency_ms: float, error: Optional[str] = None):
+        """Registra o resultado de uma chamada à IA e decide se ajusta o limite"""
+        self._latencies.append(latency_ms)
+        self._errors.append(error is not None)
+        self._samples_since_decision += 1
+
+        if error in OVERLOAD_ERRORS:
+            self._decrease(f"erro {error}")
+            return
+
+        # Avalia a janela a cada "rodada" de chamadas do tamanho do limite atual
+        if self._samples_since_decision < self.current_limit:
+            return
+
+        p95 = percentile(self._latencies, 0.95)
+        error_rate = sum(self._errors) / len(self._errors)
+
+        if p95 > self.target_p95_ms:
+            self._decrease(f"p95 {p95:.0f}ms acima da meta de {self.target_p95_ms:.0f}ms")
+        elif error_rate > self.max_error_rate:
+            self._decrease(f"taxa de erro {error_rate:.1%} acima de {self.max_error_rate:.1%}")
+        else:
+            self._increase(p95, error_rate)
+
+    def _increase(self, p95: float, error_rate: float):
+        self._samples_since_decision = 0
+        if self.limit >= self.maximum:
+            return
+
+        previous = self.current_limit
+        self.limit = min(self.maximum, self.limit + self.increase)
+        if self.current_limit != previous:
+            self.increases += 1
+            self._log_decision("aumento", previous, f"p95 {p95:.0f}ms, erros {error_rate:.1%}")
+            self._changed.set()
+
+    def _decrease(self, reason: str):
+        self._samples_since_decision = 0
+        now = time.monotonic()
+
+        # Evita cortes em cascata pelas respostas de tarefas que já estavam em voo
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+
+        previous = self.current_limit
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        self._last_decrease = now
+        if self.current_limit != previous:
+            self.decreases += 1
+            self._log_decision("reducao", previous, reason)
+
+    def _log_decision(self, kind: str, previous: int, reason: str):
+        self.decisions.append({
+            "ts": time.time(),
+            "decisao": kind,
+            "de": previous,
+            "para": self.current_limit,
+            "motivo": reason
+        })
+        symbol = "⬆️" if kind == "aumento" else "⬇️"
+        self.logger.info(f"{symbol} Concorrência {previous} → {self.current_limit} ({reason})")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado atual do controlador para métricas e resumo da execução"""
+        return {
+            "limite": self.current_limit,
+            "em_voo": self.in_flight,
+            "p95_ms": round(percentile(self._latencies, 0.95), 1),
+            "taxa_erro": round(sum(self._errors) / len(self._errors), 4) if self._errors else 0.0,
+            "aumentos": self.increases,
+            "reducoes": self.decreases
+        }
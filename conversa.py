@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Representação compacta da conversa de um usuário: mensagens com __slots__ e papéis internados, mais
+o prompt formatado, o texto em minúsculas e a contagem por papel calculados uma vez e reaproveitados
+pela triagem, pelas palavras-chave, pelos prompts da IA e pela chave do cache do gateway
+
+As mensagens continuam aceitando msg["message"] e msg.get("role"): quem recebe uma lista de dicts
+(journal, corpus sintético, classificação offline) funciona igual com uma Conversa.
+"""
+
+import sys
+from collections import Counter
+from collections.abc import Sequence
+from typing import Dict, Any, Iterable, List, Union
+
+
+class Mensagem:
+    """Uma mensagem (texto, data e papel USR/AIR) sem o dict por mensagem"""
+
+    __slots__ = ("message", "timestamp", "role")
+
+    def __init__(self, message: str, timestamp, role: str):
+        self.message = message
+        self.timestamp = timestamp
+        self.role = sys.intern(role) if isinstance(role, str) else role
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Mensagem, dict)):
+            return all(self.get(key) == other.get(key) for key in self.__slots__)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Mensagem({self.role}, {self.timestamp}, {self.message!r})"
+
+
+class Conversa(Sequence):
+    """Mensagens de um usuário (mais recente primeiro) com os derivados calculados sob demanda e guardados"""
+
+    __slots__ = ("mensagens", "_prompt", "_texto_minusculo", "_papeis")
+
+    def __init__(self, mensagens: Iterable = ()):
+        self.mensagens = list(mensagens)
+        self._prompt = None
+        self._texto_minusculo = None
+        self._papeis = None
+
+    @classmethod
+    def from_records(cls, records, message_column: str = "message", timestamp_column: str = "timestamp",
+                     role_column: str = "role") -> "Conversa":
+        """A partir das linhas do asyncpg (ou de dicts) com os nomes de coluna informados"""
+        return cls(Mensagem(record[message_column], record[timestamp_column], record[role_column])
+                   for record in records)
+
+    def __len__(self) -> int:
+        return len(self.mensagens)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Conversa(self.mensagens[index])
+        return self.mensagens[index]
+
+    def __iter__(self):
+        return iter(self.mensagens)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Conversa, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Conversa({len(self)} mensagens)"
+
+    @property
+    def prompt_text(self) -> str:
+        """Mensagens formatadas para os prompts da IA (uma vez por conversa)"""
+        if self._prompt is None:
+            self._prompt = _render(self.mensagens)
+        return self._prompt
+
+    @property
+    def lower_text(self) -> str:
+        """Texto de todas as mensagens em minúsculas, usado na busca de palavras-chave"""
+        if self._texto_minusculo is None:
+            self._texto_minusculo = " ".join([msg["message"].lower() for msg in self.mensagens])
+        return self._texto_minusculo
+
+    @property
+    def role_counts(self) -> Counter:
+        if self._papeis is None:
+            self._papeis = Counter(msg.get("role") for msg in self.mensagens)
+        return self._papeis
+
+
+def _render(messages: Iterable) -> str:
+    formatted = []
+    for msg in messages:
+        # Tratar timestamp que pode ser string ou datetime
+        timestamp = msg["timestamp"]
+        if hasattr(timestamp, 'strftime'):
+            timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            timestamp_str = str(timestamp)
+
+        role = msg.get("role", "user")
+        formatted.append(f"[{timestamp_str}] {role}: {msg['message']}")
+
+    return "\n".join(formatted)
+
+
+# Funções que aceitam tanto uma Conversa (derivados em cache) quanto uma lista de dicts
+
+Messages = Union[Conversa, List[Dict[str, Any]]]
+
+
+def format_messages(messages: Messages) -> str:
+    """Formata mensagens para análise ([timestamp] papel: mensagem, uma por linha)"""
+    if not messages:
+        return "Nenhuma mensagem encontrada."
+    if isinstance(messages, Conversa):
+        return messages.prompt_text
+    return _render(messages)
+
+
+def lowercase_text(messages: Messages) -> str:
+    if isinstance(messages, Conversa):
+        return messages.lower_text
+    return " ".join([msg["message"].lower() for msg in messages])
+
+
+def role_counts(messages: Messages) -> Counter:
+    if isinstance(messages, Conversa):
+        return messages.role_counts
+    return Counter(msg.get("role") for msg in messages)
@@ -52,6 +52,8 @@ AND table_name = 'conversation_classifications';
 \d conversation_classifications
 
 -- PASSO 9: Criar índices (agora que as tabelas existem)
+-- Obsoleto: índices do schema antigo (user_id/timestamp/conversation_classifications).
+-- Os índices do schema atual são criados por: python migrar_schema.py
 CREATE INDEX idx_chat_history_user_id ON chat_history(user_id);
 CREATE INDEX idx_chat_history_timestamp ON chat_history(timestamp);
 CREATE INDEX idx_classifications_user_id ON conversation_classifications(user_id);
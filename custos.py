@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Contabilidade de tokens e custo por chamada à IA (ledger consumo_tokens) e relatório por execução
+
+Uso:
+    python custos.py                      # última execução
+    python custos.py --execucao 20250101T120000-ab12cd
+    python custos.py --top 20             # conversas mais caras da execução
+"""
+
+import asyncio
+import argparse
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+from config import MODEL_PRICES
+
+
+def model_prices(model: str) -> Optional[Dict[str, float]]:
+    """Preços do modelo (USD por 1M tokens); aceita nomes com sufixo de versão (gpt-4o-mini-2024-07-18)"""
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    candidates = [name for name in MODEL_PRICES if model and model.startswith(name)]
+    return MODEL_PRICES[max(candidates, key=len)] if candidates else None
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Custo em USD de uma chamada; tokens de prompt em cache usam o preço reduzido"""
+    prices = model_prices(model)
+    if prices is None:
+        return 0.0
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * prices["entrada"]
+            + cached_tokens * prices.get("entrada_cache", prices["entrada"])
+            + completion_tokens * prices["saida"]) / 1_000_000
+
+
+def usage_record(call_type: str, requested_model: str, response, latency_ms: float) -> Dict[str, Any]:
+    """Registro do ledger a partir do `usage` real da resposta da API"""
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", 0) or 0
+    model = getattr(response, "model", None) or requested_model
+
+    return {
+        "tipo_chamada": call_type,
+        "modelo": model,
+        "tokens_prompt": prompt_tokens,
+        "tokens_completion": completion_tokens,
+        "tokens_cache": cached_tokens,
+        "tokens_total": prompt_tokens + completion_tokens,
+        "custo_usd": round(estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens), 8),
+        "latencia_ms": int(latency_ms),
+    }
+
+
+class CostTracker:
+    """Totais de tokens e custo da execução atual por tag e tipo de chamada"""
+
+    def __init__(self):
+        self.totals = defaultdict(lambda: {"chamadas": 0, "tokens_prompt": 0, "tokens_completion": 0,
+                                           "tokens_cache": 0, "custo_usd": 0.0})
+        self.conversations = 0
+
+    def add(self, tag: str, calls: List[Dict[str, Any]]):
+        if not calls:
+            return
+        self.conversations += 1
+        for call in calls:
+            entry = self.totals[(tag, call["tipo_chamada"])]
+            entry["chamadas"] += 1
+            entry["tokens_prompt"] += call["tokens_prompt"]
+            entry["tokens_completion"] += call["tokens_completion"]
+            entry["tokens_cache"] += call["tokens_cache"]
+            entry["custo_usd"] += call["custo_usd"]
+
+    @property
+    def total_cost(self) -> float:
+        return sum(entry["custo_usd"] for entry in self.totals.values())
+
+    def summary_lines(self) -> List[str]:
+        if not self.totals:
+            return ["nenhuma chamada à IA registrada"]
+        lines = [f"US$ {self.total_cost:.4f} em {self.conversations} conversas "
+                 f"(média US$ {self.total_cost / self.conversations:.6f} por conversa)"]
+        by_type = defaultdict(float)
+        for (_, call_type), entry in self.totals.items():
+            by_type[call_type] += entry["custo_usd"]
+        lines.append("por tipo: " + ", ".join(f"{call_type}: US$ {cost:.4f}" for call_type, cost in sorted(by_type.items())))
+        by_tag = defaultdict(float)
+        for (tag, _), entry in self.totals.items():
+            by_tag[tag] += entry["custo_usd"]
+        top = sorted(by_tag.items(), key=lambda item: item[1], reverse=True)[:5]
+        lines.append("maiores tags: " + ", ".join(f"{tag}: US$ {cost:.4f}" for tag, cost in top))
+        return lines
+
+
+# ----------------------------------------------------------------------------
+# Relatório a partir do banco
+# ----------------------------------------------------------------------------
+
+REPORT_BY_TAG_AND_TYPE = """
+    SELECT c.classificacao, t.tipo_chamada, t.modelo,
+           COUNT(*) AS chamadas,
+           COUNT(DISTINCT t.classificacao_id) AS conversas,
+           SUM(t.tokens_prompt) AS tokens_prompt,
+           SUM(t.tokens_completion) AS tokens_completion,
+           SUM(t.tokens_cache) AS tokens_cache,
+           SUM(t.custo_usd) AS custo_usd
+    FROM consumo_tokens t
+    JOIN classificacoes c ON c.id = t.classificacao_id
+    WHERE t.execucao_id = $1
+    GROUP BY c.classificacao, t.tipo_chamada, t.modelo
+    ORDER BY custo_usd DESC
+"""
+
+REPORT_TOP_CONVERSATIONS = """
+    SELECT t.user_id, c.classificacao,
+           SUM(t.tokens_prompt) AS tokens_prompt,
+           SUM(t.tokens_completion) AS tokens_completion,
+           SUM(t.custo_usd) AS custo_usd
+    FROM consumo_tokens t
+    JOIN classificacoes c ON c.id = t.classificacao_id
+    WHERE t.execucao_id = $1
+    GROUP BY t.user_id, c.classificacao
+    ORDER BY custo_usd DESC
+    LIMIT $2
+"""
+
+
+async def cost_report(run_id: str = None, top: int = 10):
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        conn = await db.get_connection()
+        try:
+            if run_id is None:
+                run_id = await conn.fetchval(
+                    "SELECT execucao_id FROM consumo_tokens ORDER BY data_registro DESC LIMIT 1"
+                )
+                if run_id is None:
+                    print("❌ Nenhuma chamada registrada em consumo_tokens")
+                    return
+
+            rows = await conn.fetch(REPORT_BY_TAG_AND_TYPE, run_id)
+            top_rows = await conn.fetch(REPORT_TOP_CONVERSATIONS, run_id, top)
+        finally:
+            await conn.close()
+
+        print(f"💰 RELATÓRIO DE CUSTO - execução {run_id}")
+        print("=" * 110)
+        print(f"{'Tag':<45} {'Tipo':<14} {'Modelo':<20} {'Chamadas':>8} {'Prompt':>10} {'Saída':>8} {'Cache':>8} {'US$':>10}")
+        print("-" * 110)
+        total = 0.0
+        for row in rows:
+            total += float(row["custo_usd"] or 0)
+            print(f"{row['classificacao'][:45]:<45} {row['tipo_chamada']:<14} {row['modelo'][:20]:<20} {row['chamadas']:>8} "
+                  f"{row['tokens_prompt']:>10} {row['tokens_completion']:>8} {row['tokens_cache']:>8} {float(row['custo_usd']):>10.4f}")
+        print("-" * 110)
+        print(f"Total: US$ {total:.4f}")
+
+        print(f"\n🔝 {top} conversas mais caras:")
+        for row in top_rows:
+            print(f"  Usuário {row['user_id']}: US$ {float(row['custo_usd']):.6f} "
+                  f"({row['tokens_prompt']} prompt + {row['tokens_completion']} saída) - {row['classificacao']}")
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório de tokens e custo por execução")
+    parser.add_argument("--execucao", help="execucao_id (padrão: a mais recente)")
+    parser.add_argument("--top", type=int, default=10, help="Quantidade de conversas mais caras listadas")
+    args = parser.parse_args()
+    asyncio.run(cost_report(args.execucao, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,51 +3,514 @@
 Módulo de conexão com banco de dados
 """
 
+import re
+import csv
+import json
 import asyncio
+from datetime import datetime
+from decimal import Decimal
 import asyncpg
 import logging
-from typing import List, Dict, Any, Optional
-from config import DATABASE_URL, CHAT_HISTORY_USER_ID_COLUMN, CHAT_HISTORY_TIMESTAMP_COLUMN, CHAT_HISTORY_MESSAGE_COLUMN
+from typing import List, Dict, Any, Optional, AsyncIterator
+from config import CLASSIFICATION_TAGS, DATABASE_URL, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, CHAT_HISTORY_USER_ID_COLUMN, CHAT_HISTORY_TIMESTAMP_COLUMN, CHAT_HISTORY_MESSAGE_COLUMN
+from instrumentacao import span
+from taxonomia import register_taxonomy
+from conversa import Conversa, Mensagem
+
+# Alterações idempotentes do schema (tabelas já existentes em produção); no início da execução o ensure_schema
+# consulta o catálogo e só executa as que faltam. Índices em tabelas grandes ficam no migrar_schema.INDEXES (CONCURRENTLY)
+SCHEMA_MIGRATIONS = [
+    "ALTER TABLE classificacoes ADD COLUMN IF NOT EXISTS tempos_etapas JSONB",
+    """
+    CREATE TABLE IF NOT EXISTS consumo_tokens (
+        id BIGSERIAL PRIMARY KEY,
+        classificacao_id INTEGER NOT NULL REFERENCES classificacoes(id) ON DELETE CASCADE,
+        user_id VARCHAR(255) NOT NULL,
+        execucao_id VARCHAR(64),
+        tipo_chamada VARCHAR(50) NOT NULL,
+        modelo VARCHAR(100),
+        tokens_prompt INTEGER NOT NULL DEFAULT 0,
+        tokens_completion INTEGER NOT NULL DEFAULT 0,
+        tokens_cache INTEGER NOT NULL DEFAULT 0,
+        custo_usd NUMERIC(14, 8) NOT NULL DEFAULT 0,
+        latencia_ms INTEGER,
+        data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_consumo_tokens_classificacao ON consumo_tokens(classificacao_id)",
+    "CREATE INDEX IF NOT EXISTS idx_consumo_tokens_execucao ON consumo_tokens(execucao_id, data_registro)",
+    """
+    CREATE TABLE IF NOT EXISTS classificacoes_resumo_diario (
+        dia DATE NOT NULL,
+        classificacao TEXT NOT NULL,
+        classificacao_especifica TEXT NOT NULL DEFAULT '',
+        faixa_confianca SMALLINT NOT NULL,
+        quantidade BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, classificacao, classificacao_especifica, faixa_confianca)
+    )
+    """,
+    "ALTER TABLE classificacoes ADD COLUMN IF NOT EXISTS classificacao_especifica_original TEXT",
+    "ALTER TABLE classificacoes ADD COLUMN IF NOT EXISTS versao_canonicalizacao INTEGER",
+    """
+    CREATE TABLE IF NOT EXISTS conversas_snapshot (
+        classificacao_id INTEGER PRIMARY KEY REFERENCES classificacoes(id) ON DELETE CASCADE,
+        user_id VARCHAR(255) NOT NULL,
+        customer_id BIGINT,
+        quantidade_mensagens SMALLINT NOT NULL,
+        ultima_mensagem TIMESTAMP,
+        mensagens JSONB NOT NULL,
+        data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_conversas_snapshot_user ON conversas_snapshot(user_id, classificacao_id DESC)",
+    "ALTER TABLE classificacoes ADD COLUMN IF NOT EXISTS pontuacoes_tags BYTEA",
+    """
+    CREATE TABLE IF NOT EXISTS tags_indice (
+        tag_idx SMALLINT PRIMARY KEY,
+        tag TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS classificacoes_tags (
+        classificacao_id INTEGER NOT NULL REFERENCES classificacoes(id) ON DELETE CASCADE,
+        tag_idx SMALLINT NOT NULL,
+        pontuacao REAL NOT NULL,
+        PRIMARY KEY (classificacao_id, tag_idx)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_classificacoes_tags_tag ON classificacoes_tags(tag_idx, pontuacao DESC)",
+    """
+    CREATE TABLE IF NOT EXISTS taxonomias (
+        versao VARCHAR(16) PRIMARY KEY,
+        tags JSONB NOT NULL,
+        prompt_hash VARCHAR(64) NOT NULL,
+        prompt TEXT,
+        data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "ALTER TABLE classificacoes ADD COLUMN IF NOT EXISTS versao_taxonomia VARCHAR(16)",
+    """
+    CREATE TABLE IF NOT EXISTS fila_reclassificacao (
+        user_id VARCHAR(255) PRIMARY KEY,
+        motivo VARCHAR(20) NOT NULL,
+        tag_anterior TEXT,
+        versao_origem VARCHAR(16),
+        versao_destino VARCHAR(16) NOT NULL,
+        data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        processado_em TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_fila_reclassificacao_pendentes ON fila_reclassificacao(data_registro) WHERE processado_em IS NULL",
+    """
+    CREATE TABLE IF NOT EXISTS resumos_conversa (
+        user_id VARCHAR(255) PRIMARY KEY,
+        resumo TEXT NOT NULL,
+        ultima_tag TEXT,
+        ultima_mensagem TIMESTAMP NOT NULL,
+        versao_taxonomia VARCHAR(16),
+        atualizacoes SMALLINT NOT NULL DEFAULT 0,
+        data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "ALTER TABLE classificacoes ADD COLUMN IF NOT EXISTS modo_prompt VARCHAR(12)",
+    "ALTER TABLE classificacoes ADD COLUMN IF NOT EXISTS tag_janela_completa TEXT",
+    """
+    CREATE TABLE IF NOT EXISTS sugestoes_cluster (
+        id SERIAL PRIMARY KEY,
+        execucao_id VARCHAR(64),
+        classificacao TEXT NOT NULL,
+        cluster SMALLINT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        termos JSONB,
+        representantes JSONB,
+        sugestao TEXT,
+        modelo VARCHAR(100),
+        tokens_prompt INTEGER NOT NULL DEFAULT 0,
+        tokens_completion INTEGER NOT NULL DEFAULT 0,
+        custo_usd NUMERIC(14, 8) NOT NULL DEFAULT 0,
+        data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sugestoes_cluster_membros (
+        sugestao_id INTEGER NOT NULL REFERENCES sugestoes_cluster(id) ON DELETE CASCADE,
+        classificacao_id INTEGER NOT NULL REFERENCES classificacoes(id) ON DELETE CASCADE,
+        user_id VARCHAR(255) NOT NULL,
+        similaridade REAL,
+        PRIMARY KEY (sugestao_id, classificacao_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sugestoes_cluster_membros_user ON sugestoes_cluster_membros(user_id, sugestao_id DESC)",
+    "ALTER TABLE fila_reclassificacao ADD COLUMN IF NOT EXISTS status VARCHAR(20)",
+    "ALTER TABLE fila_reclassificacao ADD COLUMN IF NOT EXISTS tentativas INTEGER NOT NULL DEFAULT 0",
+]
+
+_ADD_COLUMN = re.compile(r"ALTER TABLE (\w+) ADD COLUMN IF NOT EXISTS (\w+)")
+_CREATE_RELATION = re.compile(r"CREATE (?:TABLE|INDEX) IF NOT EXISTS (\w+)")
+
+def schema_object(statement: str) -> tuple:
+    """Objeto criado pela migração: ("coluna", tabela, coluna) ou ("relacao", nome)"""
+    column = _ADD_COLUMN.search(statement)
+    if column:
+        return ("coluna", column.group(1), column.group(2))
+    return ("relacao", _CREATE_RELATION.search(statement).group(1))
+
+# Faixas de confiança do resumo diário (mesmos cortes da QUERY 6 do query_tags_quantidade.sql)
+CONFIDENCE_BAND_SQL = """CASE
+        WHEN {0} >= 0.9 THEN 4
+        WHEN {0} >= 0.7 THEN 3
+        WHEN {0} >= 0.5 THEN 2
+        WHEN {0} > 0 THEN 1
+        ELSE 0
+    END"""
+
+def confidence_band(confidence) -> int:
+    """Mesma faixa do CONFIDENCE_BAND_SQL, calculada no Python"""
+    value = float(confidence or 0)
+    if value >= 0.9:
+        return 4
+    if value >= 0.7:
+        return 3
+    if value >= 0.5:
+        return 2
+    return 1 if value > 0 else 0
+
+# Contagem incremental por dia/tag/tag específica, na mesma transação do INSERT da classificação
+UPSERT_DAILY_SUMMARY = f"""
+    INSERT INTO classificacoes_resumo_diario (dia, classificacao, classificacao_especifica, faixa_confianca, quantidade)
+    VALUES ($1, $2, COALESCE($3, ''), {CONFIDENCE_BAND_SQL.format('COALESCE($4::float8, 0)')}, 1)
+    ON CONFLICT (dia, classificacao, classificacao_especifica, faixa_confianca)
+    DO UPDATE SET quantidade = classificacoes_resumo_diario.quantidade + 1
+"""
+
+# Reclassificação: a contagem da classificação anterior sai do resumo
+DECREMENT_DAILY_SUMMARY = f"""
+    UPDATE classificacoes_resumo_diario
+    SET quantidade = quantidade - 1
+    WHERE dia = $1 AND classificacao = $2 AND classificacao_especifica = COALESCE($3, '')
+      AND faixa_confianca = {CONFIDENCE_BAND_SQL.format('COALESCE($4::float8, 0)')}
+"""
+
+# Reconstrução completa do resumo a partir da classificacoes (backfill e correções em massa)
+REBUILD_DAILY_SUMMARY = f"""
+    INSERT INTO classificacoes_resumo_diario (dia, classificacao, classificacao_especifica, faixa_confianca, quantidade)
+    SELECT data_classificacao::date,
+           classificacao,
+           COALESCE(classificacao_especifica, ''),
+           {CONFIDENCE_BAND_SQL.format('COALESCE(confianca, 0)')},
+           COUNT(*)
+    FROM classificacoes
+    GROUP BY 1, 2, 3, 4
+"""
+
+INSERT_TOKEN_USAGE = """
+    INSERT INTO consumo_tokens (
+        classificacao_id, user_id, execucao_id, tipo_chamada, modelo,
+        tokens_prompt, tokens_completion, tokens_cache, custo_usd, latencia_ms
+    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+"""
+
+INSERT_CLASSIFICATION = """
+    INSERT INTO classificacoes (
+        user_id, classificacao, confianca, contexto,
+        tokens_utilizados, tempo_processamento_ms, status, wa_id, classificacao_especifica, sugestao_melhoria,
+        tempos_etapas, classificacao_especifica_original, versao_canonicalizacao, pontuacoes_tags, versao_taxonomia,
+        modo_prompt, tag_janela_completa
+    ) VALUES ($1, $2, $3, $4, $5, $6, 'concluido', $7, $8, $9, $10::jsonb, $11, $12, $13, $14, $15, $16)
+    RETURNING id, data_classificacao
+"""
+
+# Reclassificação: a linha existente é atualizada (o ledger consumo_tokens da classificação anterior é mantido)
+REPLACE_CLASSIFICATION = """
+    UPDATE classificacoes
+    SET classificacao = $2, confianca = $3, contexto = $4, tokens_utilizados = $5, tempo_processamento_ms = $6,
+        status = 'concluido', wa_id = $7, classificacao_especifica = $8, sugestao_melhoria = $9,
+        tempos_etapas = $10::jsonb, classificacao_especifica_original = $11, versao_canonicalizacao = $12,
+        pontuacoes_tags = $13, versao_taxonomia = $14, modo_prompt = $15, tag_janela_completa = $16,
+        data_classificacao = CURRENT_TIMESTAMP
+    WHERE id = $17 AND user_id = $1
+    RETURNING id, data_classificacao
+"""
+
+PREVIOUS_CLASSIFICATION = """
+    SELECT id, data_classificacao, classificacao, classificacao_especifica, confianca
+    FROM classificacoes
+    WHERE user_id = $1
+    ORDER BY id DESC
+    LIMIT 1
+    FOR UPDATE
+"""
+
+RECLASSIFICATION_QUEUE_QUERY = """
+    SELECT user_id
+    FROM fila_reclassificacao
+    WHERE processado_em IS NULL
+    ORDER BY data_registro, user_id
+    LIMIT $1
+"""
+
+# Tentativa sem classificação gravada: sai da fila (processado_em) ao atingir $3 tentativas
+RECLASSIFICATION_ATTEMPT = """
+    UPDATE fila_reclassificacao
+    SET tentativas = tentativas + 1, status = $2,
+        processado_em = CASE WHEN tentativas + 1 >= $3 THEN CURRENT_TIMESTAMP END
+    WHERE user_id = $1 AND processado_em IS NULL
+"""
+
+# Resumo acumulado do prompt incremental (uma linha por usuário, sobrescrita a cada classificação)
+UPSERT_CONVERSATION_SUMMARY = """
+    INSERT INTO resumos_conversa (user_id, resumo, ultima_tag, ultima_mensagem, versao_taxonomia, atualizacoes)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    ON CONFLICT (user_id) DO UPDATE
+    SET resumo = EXCLUDED.resumo, ultima_tag = EXCLUDED.ultima_tag, ultima_mensagem = EXCLUDED.ultima_mensagem,
+        versao_taxonomia = EXCLUDED.versao_taxonomia, atualizacoes = EXCLUDED.atualizacoes,
+        data_atualizacao = CURRENT_TIMESTAMP
+"""
+
+CONVERSATION_SUMMARY_QUERY = """
+    SELECT resumo, ultima_tag, ultima_mensagem, versao_taxonomia, atualizacoes, data_atualizacao
+    FROM resumos_conversa
+    WHERE user_id = $1
+"""
+
+# Usuários classificados com mensagens USR/AIR posteriores à janela gravada (usa o índice parcial do migrar_schema.py)
+ACTIVE_USERS_QUERY = f"""
+    SELECT c.user_id
+    FROM classificacoes c
+    JOIN conversas_snapshot s ON s.classificacao_id = c.id
+    WHERE s.customer_id IS NOT NULL
+      AND EXISTS (
+          SELECT 1 FROM chat_history h
+          WHERE h.{CHAT_HISTORY_USER_ID_COLUMN} = s.customer_id
+            AND h.message_type IN ('USR', 'AIR')
+            AND h.{CHAT_HISTORY_TIMESTAMP_COLUMN} > s.ultima_mensagem
+      )
+    ORDER BY s.ultima_mensagem
+"""
+
+# Entradas não nulas do vetor de pontuação por tag (consultas por tag e limiar)
+INSERT_TAG_SCORES = """
+    INSERT INTO classificacoes_tags (classificacao_id, tag_idx, pontuacao)
+    SELECT $1, * FROM unnest($2::smallint[], $3::real[])
+"""
+
+# Janela de mensagens exatamente como foi classificada (relatórios e reavaliação offline)
+INSERT_CONVERSATION_SNAPSHOT = """
+    INSERT INTO conversas_snapshot (
+        classificacao_id, user_id, customer_id, quantidade_mensagens, ultima_mensagem, mensagens
+    ) VALUES ($1, $2, $3, $4, $5, $6::jsonb)
+"""
+
+def snapshot_items(messages: List[Dict[str, Any]]) -> List[List[Any]]:
+    """Mensagens em arrays compactos [tipo, data, texto], na ordem em que foram classificadas"""
+    return [[msg.get("role"), msg["timestamp"].isoformat() if msg.get("timestamp") else None, msg.get("message")]
+            for msg in messages]
+
+def encode_snapshot(messages: List[Dict[str, Any]]) -> str:
+    """Serializa as mensagens para a coluna JSONB da conversas_snapshot"""
+    return json.dumps(snapshot_items(messages), ensure_ascii=False, separators=(",", ":"))
+
+def decode_snapshot(raw) -> Conversa:
+    """Inverso do encode_snapshot: mesmo formato devolvido por get_last_25_messages"""
+    items = json.loads(raw) if isinstance(raw, str) else raw
+    return Conversa(
+        Mensagem(text, datetime.fromisoformat(stamp) if stamp else None, role)
+        for role, stamp, text in items
+    )
+
+# Consultas do caminho quente (também verificadas com EXPLAIN pelo migrar_schema.py)
+IS_CLASSIFIED_QUERY = "SELECT EXISTS (SELECT 1 FROM classificacoes WHERE user_id = $1)"
+
+LAST_MESSAGES_QUERY = f"""
+    SELECT {CHAT_HISTORY_MESSAGE_COLUMN}, {CHAT_HISTORY_TIMESTAMP_COLUMN}, message_type
+    FROM chat_history
+    WHERE {CHAT_HISTORY_USER_ID_COLUMN} = $1
+    AND message_type IN ('USR', 'AIR')
+    ORDER BY {CHAT_HISTORY_TIMESTAMP_COLUMN} DESC
+    LIMIT 25
+"""
+
+WA_ID_QUERY = "SELECT wa_id FROM customers WHERE id = $1"
+
+# Sinais de prioridade calculados em lote por um único SQL para cada bloco de usuários
+PRIORITY_SIGNALS_QUERY = f"""
+    SELECT u.customer_id,
+           MAX(ch.{CHAT_HISTORY_TIMESTAMP_COLUMN}) FILTER (WHERE ch.message_type = 'USR') AS ultima_msg_usr,
+           COUNT(ch.{CHAT_HISTORY_TIMESTAMP_COLUMN}) AS total_mensagens,
+           COUNT(ch.{CHAT_HISTORY_TIMESTAMP_COLUMN}) FILTER (WHERE ch.message_type = 'USR') AS mensagens_usr,
+           COALESCE(BOOL_OR(ch.message_type = 'USR' AND ch.{CHAT_HISTORY_MESSAGE_COLUMN} ILIKE ANY($2::text[])), false) AS menciona_pagamento
+    FROM unnest($1::bigint[]) AS u(customer_id)
+    LEFT JOIN chat_history ch
+        ON ch.{CHAT_HISTORY_USER_ID_COLUMN} = u.customer_id
+        AND ch.message_type IN ('USR', 'AIR')
+    WHERE NOT EXISTS (
+        SELECT 1 FROM classificacoes c WHERE c.user_id = u.customer_id::text
+    )
+    GROUP BY u.customer_id
+"""
+
+class PooledConnection:
+    """Conexão emprestada do pool: close() a devolve ao pool em vez de encerrá-la"""
+    
+    __slots__ = ("_pool", "_conn", "_stats")
+    
+    def __init__(self, pool, conn, stats: Dict[str, int]):
+        self._pool = pool
+        self._conn = conn
+        self._stats = stats
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    async def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._stats["em_uso"] -= 1
+            await self._pool.release(conn)
 
 class DatabaseManager:
-    def __init__(self):
+    def __init__(self, min_size: int = DB_POOL_MIN_SIZE, max_size: int = DB_POOL_MAX_SIZE):
         self.database_url = DATABASE_URL
         self.logger = logging.getLogger(__name__)
+        self.min_size = min_size
+        self.max_size = max_size
+        # abertas/ativas: conexões físicas do pool; em_uso: emprestadas pelo get_connection
+        self.connection_stats = {"abertas": 0, "ativas": 0, "em_uso": 0, "falhas": 0}
+        self._pool_task = None
+        self._pool_loop = None
+    
+    def _connect_params(self) -> Dict[str, Any]:
+        # Extrair parâmetros da URL
+        url_parts = self.database_url.replace("postgresql+asyncpg://", "").split("@")
+        auth_part = url_parts[0].split(":")
+        host_port_db = url_parts[1].split("/")
+        host_port = host_port_db[0].split(":")
+        return {
+            "user": auth_part[0],
+            "password": auth_part[1],
+            "host": host_port[0],
+            "port": int(host_port[1]),
+            "database": host_port_db[1],
+        }
+    
+    async def _on_connection_opened(self, conn):
+        self.connection_stats["abertas"] += 1
+        self.connection_stats["ativas"] += 1
+        conn.add_termination_listener(self._on_connection_closed)
+    
+    def _on_connection_closed(self, conn):
+        self.connection_stats["ativas"] -= 1
+    
+    async def _get_pool(self):
+        """Pool do event loop atual, criado uma vez mesmo com várias tarefas pedindo conexão ao mesmo tempo"""
+        loop = asyncio.get_running_loop()
+        if self._pool_task is None or self._pool_loop is not loop:
+            self._pool_loop = loop
+            self._pool_task = asyncio.ensure_future(asyncpg.create_pool(
+                **self._connect_params(), min_size=self.min_size, max_size=self.max_size,
+                init=self._on_connection_opened
+            ))
+        try:
+            return await asyncio.shield(self._pool_task)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # A próxima chamada tenta criar o pool de novo
+            self._pool_task = None
+            raise
     
     async def get_connection(self):
-        """Obtém conexão com o banco"""
+        """Obtém conexão do pool (devolvida com await conn.close())"""
         try:
-            # Extrair parâmetros da URL
-            url_parts = self.database_url.replace("postgresql+asyncpg://", "").split("@")
-            auth_part = url_parts[0].split(":")
-            host_port_db = url_parts[1].split("/")
-            host_port = host_port_db[0].split(":")
-            
-            user = auth_part[0]
-            password = auth_part[1]
-            host = host_port[0]
-            port = int(host_port[1])
-            database = host_port_db[1]
-            
-            conn = await asyncpg.connect(
-                user=user,
-                password=password,
-                host=host,
-                port=port,
-                database=database
-            )
-            return conn
+            with span("conexao_banco"):
+                pool = await self._get_pool()
+                conn = await pool.acquire()
+            self.connection_stats["em_uso"] += 1
+            return PooledConnection(pool, conn, self.connection_stats)
             
         except Exception as e:
+            self.connection_stats["falhas"] += 1
             self.logger.error(f"Erro na conexão: {e}")
             raise
     
+    async def close(self):
+        """Encerra as conexões do pool"""
+        if self._pool_task is not None and self._pool_loop is asyncio.get_running_loop():
+            task, self._pool_task = self._pool_task, None
+            try:
+                pool = await task
+            except Exception:
+                return
+            await pool.close()
+    
+    async def ensure_schema(self):
+        """Aplica as alterações de schema pendentes (colunas e tabelas auxiliares da classificacoes)"""
+        conn = await self.get_connection()
+        try:
+            missing = await self._missing_schema_objects(conn)
+            summary_missing = ("relacao", "classificacoes_resumo_diario") in missing
+            snapshot_missing = ("relacao", "conversas_snapshot") in missing
+            pending = [statement for statement in SCHEMA_MIGRATIONS if schema_object(statement) in missing]
+            if pending:
+                self.logger.info(f"🔧 Aplicando {len(pending)} alterações de schema pendentes")
+            for statement in pending:
+                await conn.execute(statement)
+            
+            await self._sync_tag_index(conn)
+            await register_taxonomy(conn)
+            
+            if snapshot_missing:
+                # lz4 comprime melhor e mais rápido que o pglz padrão do TOAST (PostgreSQL 14+)
+                try:
+                    await conn.execute("ALTER TABLE conversas_snapshot ALTER COLUMN mensagens SET COMPRESSION lz4")
+                except Exception as e:
+                    self.logger.warning(f"Compressão lz4 indisponível para conversas_snapshot, mantendo o padrão: {e}")
+        finally:
+            await conn.close()
+        
+        if summary_missing:
+            # Resumo recém-criado: popula com as classificações que já existiam
+            rows = await self.rebuild_daily_summary()
+            self.logger.info(f"📊 Resumo diário de tags criado com {rows} linhas")
+    
+    async def _missing_schema_objects(self, conn) -> set:
+        """Colunas e relações das SCHEMA_MIGRATIONS que ainda não existem (duas consultas ao catálogo, sem DDL)"""
+        objects = [schema_object(statement) for statement in SCHEMA_MIGRATIONS]
+        columns = [obj for obj in objects if obj[0] == "coluna"]
+        relations = [obj[1] for obj in objects if obj[0] == "relacao"]
+        
+        existing_columns = {
+            ("coluna", row["table_name"], row["column_name"])
+            for row in await conn.fetch("""
+                SELECT table_name, column_name
+                FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = ANY($1::text[])
+            """, sorted({table for _, table, _ in columns}))
+        }
+        existing_relations = {
+            ("relacao", row["nome"])
+            for row in await conn.fetch(
+                "SELECT nome FROM unnest($1::text[]) AS nome WHERE to_regclass(nome) IS NOT NULL", relations
+            )
+        }
+        return set(objects) - existing_columns - existing_relations
+    
+    async def _sync_tag_index(self, conn):
+        """Mantém tags_indice igual à ordem de CLASSIFICATION_TAGS (índice usado nos vetores gravados)"""
+        stored = {row["tag_idx"]: row["tag"] for row in await conn.fetch("SELECT tag_idx, tag FROM tags_indice")}
+        for index, tag in enumerate(CLASSIFICATION_TAGS):
+            if index in stored and stored[index] != tag:
+                self.logger.warning(f"tags_indice[{index}] = '{stored[index]}' difere de '{tag}': "
+                                    f"tags novas devem ser acrescentadas no fim de CLASSIFICATION_TAGS")
+        missing = [(index, tag) for index, tag in enumerate(CLASSIFICATION_TAGS) if index not in stored]
+        if missing:
+            await conn.executemany("INSERT INTO tags_indice (tag_idx, tag) VALUES ($1, $2) ON CONFLICT DO NOTHING", missing)
+    
     async def get_customers_from_csv(self) -> List[str]:
         """Obtém lista de clientes do arquivo CSV"""
         try:
-            import pandas as pd
-            df = pd.read_csv("customers.csv")
-            return df['customer_id'].astype(str).tolist()
+            with open("customers.csv", newline="", encoding="utf-8") as f:
+                return [row["customer_id"].strip() for row in csv.DictReader(f)]
         except Exception as e:
             self.logger.error(f"Erro ao ler customers.csv: {e}")
             return []
@@ -55,33 +518,65 @@ class DatabaseManager:
     async def get_unclassified_users(self) -> List[str]:
         """Obtém usuários que não foram classificados ainda"""
         try:
-            conn = await self.get_connection()
-            
             # Obter clientes do CSV
             customers = await self.get_customers_from_csv()
             
-            # Verificar quais já foram classificados
-            unclassified = []
-            for customer_id in customers:
-                count = await conn.fetchval(
-                    "SELECT COUNT(*) FROM classificacoes WHERE user_id = $1",
-                    customer_id
-                )
-                if count == 0:
-                    unclassified.append(customer_id)
-            
-            await conn.close()
+            conn = await self.get_connection()
+            try:
+                # Verificar quais já foram classificados
+                unclassified = []
+                for customer_id in customers:
+                    count = await conn.fetchval(
+                        "SELECT COUNT(*) FROM classificacoes WHERE user_id = $1",
+                        customer_id
+                    )
+                    if count == 0:
+                        unclassified.append(customer_id)
+            finally:
+                await conn.close()
             return unclassified
             
         except Exception as e:
             self.logger.error(f"Erro ao obter usuários não classificados: {e}")
             return []
     
-    async def get_last_25_messages(self, user_id: str) -> List[Dict[str, Any]]:
+    async def is_user_classified(self, user_id: str) -> bool:
+        """Verifica se o usuário já possui classificação salva"""
+        conn = await self.get_connection()
+        try:
+            classified = await conn.fetchval(IS_CLASSIFIED_QUERY, user_id)
+        finally:
+            await conn.close()
+        return classified
+    
+    async def get_priority_signals(self, customer_ids: List[str], payment_keywords: List[str],
+                                   chunk_size: int = 5000) -> Dict[str, Dict[str, Any]]:
+        """Sinais de prioridade dos usuários ainda não classificados, calculados em blocos"""
+        numeric_ids = []
+        for customer_id in customer_ids:
+            try:
+                numeric_ids.append(int(customer_id))
+            except ValueError:
+                self.logger.warning(f"customer_id não numérico ignorado na priorização: {customer_id}")
+        
+        patterns = [f"%{keyword}%" for keyword in payment_keywords]
+        signals = {}
+        
+        conn = await self.get_connection()
+        try:
+            for start in range(0, len(numeric_ids), chunk_size):
+                chunk = numeric_ids[start:start + chunk_size]
+                rows = await conn.fetch(PRIORITY_SIGNALS_QUERY, chunk, patterns)
+                for row in rows:
+                    signals[str(row["customer_id"])] = dict(row)
+        finally:
+            await conn.close()
+        
+        return signals
+    
+    async def get_last_25_messages(self, user_id: str) -> Conversa:
         """Obtém as últimas 25 mensagens de um usuário"""
         try:
-            conn = await self.get_connection()
-            
             # Converter user_id para integer se possível
             try:
                 user_id_int = int(user_id)
@@ -89,58 +584,200 @@ class DatabaseManager:
             except ValueError:
                 param = user_id
             
-            messages = await conn.fetch(f"""
-                SELECT {CHAT_HISTORY_MESSAGE_COLUMN}, {CHAT_HISTORY_TIMESTAMP_COLUMN}, message_type
-                FROM chat_history
-                WHERE {CHAT_HISTORY_USER_ID_COLUMN} = $1
-                AND message_type IN ('USR', 'AIR')
-                ORDER BY {CHAT_HISTORY_TIMESTAMP_COLUMN} DESC
-                LIMIT 25
-            """, param)
-            
-            await conn.close()
+            conn = await self.get_connection()
+            try:
+                messages = await conn.fetch(LAST_MESSAGES_QUERY, param)
+            finally:
+                await conn.close()
             
-            return [
-                {
-                    "message": msg[CHAT_HISTORY_MESSAGE_COLUMN],
-                    "timestamp": msg[CHAT_HISTORY_TIMESTAMP_COLUMN],
-                    "role": msg["message_type"]
-                }
-                for msg in messages
-            ]
+            # Mensagens com __slots__ e derivados (prompt, minúsculas, papéis) calculados uma vez por conversa
+            return Conversa.from_records(messages, CHAT_HISTORY_MESSAGE_COLUMN, CHAT_HISTORY_TIMESTAMP_COLUMN,
+                                         "message_type")
             
         except Exception as e:
             self.logger.error(f"Erro ao obter mensagens do usuário {user_id}: {e}")
-            return []
+            return Conversa()
     
     async def save_classification(self, user_id: str, classification: str, 
                                 confidence: float, context: str, 
                                 tokens_used: int, processing_time: int, wa_id: str = None,
-                                classificacao_especifica: str = None, sugestao_melhoria: str = None):
-        """Salva classificação no banco"""
+                                classificacao_especifica: str = None, sugestao_melhoria: str = None,
+                                tempos_etapas: Dict[str, float] = None,
+                                llm_calls: List[Dict[str, Any]] = None, execucao_id: str = None,
+                                classificacao_especifica_original: str = None,
+                                versao_canonicalizacao: int = None,
+                                messages: List[Dict[str, Any]] = None,
+                                pontuacoes_tags=None, versao_taxonomia: str = None,
+                                substituir: bool = False, modo_prompt: str = None,
+                                tag_janela_completa: str = None,
+                                resumo_conversa: Dict[str, Any] = None) -> int:
+        """Salva a classificação, o consumo de tokens e a janela de mensagens classificada na mesma transação
+        
+        Com substituir=True (reclassificação) a classificação anterior do usuário é atualizada no lugar.
+        """
+        # NumPy só no caminho de gravação: scripts de consulta importam o database sem pagar por ele
+        from pontuacoes_tags import pack_scores, sparse_entries
         try:
             conn = await self.get_connection()
             
-            await conn.execute("""
-                INSERT INTO classificacoes (
-                    user_id, classificacao, confianca, contexto,
-                    tokens_utilizados, tempo_processamento_ms, status, wa_id, classificacao_especifica, sugestao_melhoria
-                ) VALUES ($1, $2, $3, $4, $5, $6, 'concluido', $7, $8, $9)
-            """, user_id, classification, confidence, context, 
-                 tokens_used, processing_time, wa_id, classificacao_especifica, sugestao_melhoria)
+            try:
+                async with conn.transaction():
+                    values = (user_id, classification, confidence, context,
+                              tokens_used, processing_time, wa_id, classificacao_especifica, sugestao_melhoria,
+                              json.dumps(tempos_etapas) if tempos_etapas else None,
+                              classificacao_especifica_original, versao_canonicalizacao,
+                              pack_scores(pontuacoes_tags) if pontuacoes_tags is not None else None,
+                              versao_taxonomia, modo_prompt, tag_janela_completa)
+                    previous = await conn.fetchrow(PREVIOUS_CLASSIFICATION, user_id) if substituir else None
+                    if previous is not None:
+                        saved = await conn.fetchrow(REPLACE_CLASSIFICATION, *values, previous["id"])
+                        await conn.execute(DECREMENT_DAILY_SUMMARY, previous["data_classificacao"].date(),
+                                           previous["classificacao"], previous["classificacao_especifica"],
+                                           previous["confianca"])
+                        await conn.execute("DELETE FROM classificacoes_tags WHERE classificacao_id = $1", previous["id"])
+                        await conn.execute("DELETE FROM conversas_snapshot WHERE classificacao_id = $1", previous["id"])
+                    else:
+                        saved = await conn.fetchrow(INSERT_CLASSIFICATION, *values)
+                    classificacao_id = saved["id"]
+                    
+                    if substituir:
+                        await conn.execute(
+                            "UPDATE fila_reclassificacao SET processado_em = CURRENT_TIMESTAMP, status = 'reclassificado' "
+                            "WHERE user_id = $1",
+                            user_id
+                        )
+                    
+                    await conn.execute(UPSERT_DAILY_SUMMARY, saved["data_classificacao"].date(), classification,
+                                       classificacao_especifica, confidence)
+                    
+                    if llm_calls:
+                        await conn.executemany(INSERT_TOKEN_USAGE, [
+                            (classificacao_id, user_id, execucao_id, call["tipo_chamada"], call["modelo"],
+                             call["tokens_prompt"], call["tokens_completion"], call["tokens_cache"],
+                             Decimal(str(call["custo_usd"])), call.get("latencia_ms"))
+                            for call in llm_calls
+                        ])
+                    
+                    if pontuacoes_tags is not None:
+                        indexes, values = sparse_entries(pontuacoes_tags)
+                        if indexes:
+                            await conn.execute(INSERT_TAG_SCORES, classificacao_id, indexes, values)
+                    
+                    if resumo_conversa:
+                        await conn.execute(UPSERT_CONVERSATION_SUMMARY, user_id, resumo_conversa["resumo"],
+                                           resumo_conversa["ultima_tag"], resumo_conversa["ultima_mensagem"],
+                                           resumo_conversa["versao_taxonomia"], resumo_conversa["atualizacoes"])
+                    
+                    if messages:
+                        stamps = [msg["timestamp"] for msg in messages if msg.get("timestamp")]
+                        await conn.execute(INSERT_CONVERSATION_SNAPSHOT, classificacao_id, user_id,
+                                           int(user_id) if str(user_id).isdigit() else None, len(messages),
+                                           max(stamps) if stamps else None, encode_snapshot(messages))
+            finally:
+                await conn.close()
             
-            await conn.close()
+            return classificacao_id
             
         except Exception as e:
             self.logger.error(f"Erro ao salvar classificação: {e}")
             raise 
 
+    async def get_reclassification_queue(self, limit: int = 1000000) -> List[str]:
+        """Usuários pendentes na fila_reclassificacao (preenchida pelo taxonomia.py), mais antigos primeiro"""
+        conn = await self.get_connection()
+        try:
+            rows = await conn.fetch(RECLASSIFICATION_QUEUE_QUERY, limit)
+        finally:
+            await conn.close()
+        return [row["user_id"] for row in rows]
+    
+    async def record_reclassification_attempt(self, user_id: str, status: str, max_attempts: int = 1):
+        """Registra na fila_reclassificacao um usuário que não foi reclassificado (sem_mensagens ou erro)"""
+        conn = await self.get_connection()
+        try:
+            await conn.execute(RECLASSIFICATION_ATTEMPT, user_id, status, max_attempts)
+        finally:
+            await conn.close()
+    
+    async def get_conversation_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Resumo acumulado do usuário para o prompt incremental, ou None"""
+        conn = await self.get_connection()
+        try:
+            row = await conn.fetchrow(CONVERSATION_SUMMARY_QUERY, user_id)
+        finally:
+            await conn.close()
+        return dict(row) if row else None
+    
+    async def get_active_users(self) -> List[str]:
+        """Usuários já classificados que receberam mensagens depois da janela classificada"""
+        conn = await self.get_connection()
+        try:
+            rows = await conn.fetch(ACTIVE_USERS_QUERY)
+        finally:
+            await conn.close()
+        return [row["user_id"] for row in rows]
+    
+    async def rebuild_daily_summary(self) -> int:
+        """Recalcula classificacoes_resumo_diario do zero; retorna o número de linhas do resumo"""
+        conn = await self.get_connection()
+        try:
+            async with conn.transaction():
+                # Bloqueia novas classificações durante a reconstrução para não contar duas vezes
+                await conn.execute("LOCK TABLE classificacoes IN SHARE MODE")
+                await conn.execute("DELETE FROM classificacoes_resumo_diario")
+                status = await conn.execute(REBUILD_DAILY_SUMMARY)
+        finally:
+            await conn.close()
+        return int(status.split()[-1])
+    
+    async def get_conversation_snapshot(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Mensagens da classificação mais recente do usuário, como foram enviadas ao classificador"""
+        conn = await self.get_connection()
+        try:
+            raw = await conn.fetchval(
+                "SELECT mensagens FROM conversas_snapshot WHERE user_id = $1 ORDER BY classificacao_id DESC LIMIT 1",
+                str(user_id)
+            )
+        finally:
+            await conn.close()
+        return decode_snapshot(raw) if raw is not None else None
+    
+    async def iter_conversation_snapshots(self, batch_size: int = 1000,
+                                          after_id: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """Percorre os snapshots por classificacao_id (paginação por chave) para reavaliação offline"""
+        while True:
+            conn = await self.get_connection()
+            try:
+                rows = await conn.fetch("""
+                    SELECT s.classificacao_id, s.user_id, s.mensagens, c.classificacao, c.classificacao_especifica
+                    FROM conversas_snapshot s
+                    JOIN classificacoes c ON c.id = s.classificacao_id
+                    WHERE s.classificacao_id > $1
+                    ORDER BY s.classificacao_id
+                    LIMIT $2
+                """, after_id, batch_size)
+            finally:
+                await conn.close()
+            if not rows:
+                return
+            for row in rows:
+                yield {
+                    "classificacao_id": row["classificacao_id"],
+                    "user_id": row["user_id"],
+                    "classificacao": row["classificacao"],
+                    "classificacao_especifica": row["classificacao_especifica"],
+                    "messages": decode_snapshot(row["mensagens"]),
+                }
+            after_id = rows[-1]["classificacao_id"]
+    
     async def get_wa_id_by_customer_id(self, customer_id: str) -> str:
         """Busca o wa_id na tabela customers pelo customer_id"""
         try:
             conn = await self.get_connection()
-            wa_id = await conn.fetchval("SELECT wa_id FROM customers WHERE id = $1", int(customer_id))
-            await conn.close()
+            try:
+                wa_id = await conn.fetchval(WA_ID_QUERY, int(customer_id))
+            finally:
+                await conn.close()
             return wa_id
         except Exception as e:
             self.logger.error(f"Erro ao buscar wa_id para o customer_id {customer_id}: {e}")
@@ -199,6 +199,7 @@ async def main():
         print("\n🎯 PRÓXIMOS PASSOS:")
         if chat_history_ok and classificacoes_ok:
             print("   - Ambos os componentes estão prontos!")
+            print("   - Criar índices e verificar planos: python migrar_schema.py")
             print("   - Pode prosseguir para a ETAPA 3")
         elif chat_history_ok and not classificacoes_ok:
             print("   - Criar apenas a tabela classificacoes")
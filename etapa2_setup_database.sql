@@ -27,6 +27,8 @@ CREATE TABLE IF NOT EXISTS conversation_classifications (
 );
 
 -- 4. Criar índices para otimização
+-- Obsoleto: índices do schema antigo (user_id/timestamp/conversation_classifications).
+-- Os índices do schema atual são criados por: python migrar_schema.py
 CREATE INDEX IF NOT EXISTS idx_chat_history_user_id ON chat_history(user_id);
 CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history(timestamp);
 CREATE INDEX IF NOT EXISTS idx_classifications_user_id ON conversation_classifications(user_id);
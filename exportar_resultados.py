@@ -1,48 +1,214 @@
 #!/usr/bin/env python3
 """
-Script para exportar resultados das classificações para CSV
+Script para exportar resultados das classificações para CSV ou Parquet
+(leitura em streaming: memória constante independente do tamanho da tabela)
+
+Uso:
+    python exportar_resultados.py
+    python exportar_resultados.py --saida classificacoes.parquet --desde 2025-01-01 --ate 2025-02-01
+    python exportar_resultados.py --colunas user_id,wa_id,classificacao,classificacao_especifica
 """
 
+import os
 import asyncio
-import pandas as pd
+import argparse
+from datetime import datetime, date
+from typing import List, Tuple, Any
 from database import DatabaseManager
 
-async def export_results():
-    db = DatabaseManager()
-    conn = await db.get_connection()
+# Colunas exportáveis e o tipo usado no Parquet
+EXPORTABLE_COLUMNS = {
+    "user_id": "string",
+    "wa_id": "string",
+    "classificacao": "string",
+    "classificacao_especifica": "string",
+    "confianca": "float64",
+    "contexto": "string",
+    "sugestao_melhoria": "string",
+    "data_classificacao": "timestamp",
+    "modelo_utilizado": "string",
+    "tokens_utilizados": "int64",
+    "tempo_processamento_ms": "int64",
+    "status": "string",
+}
+
+DEFAULT_COLUMNS = [
+    "user_id", "classificacao", "confianca", "contexto",
+    "data_classificacao", "tokens_utilizados", "tempo_processamento_ms"
+]
+
+def parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def build_filters(since: date = None, until: date = None) -> Tuple[str, List[Any]]:
+    """Cláusula WHERE pelo intervalo [desde, ate) de data_classificacao e seus parâmetros"""
+    conditions, params = [], []
+    if since is not None:
+        params.append(since)
+        conditions.append(f"data_classificacao >= ${len(params)}")
+    if until is not None:
+        params.append(until)
+        conditions.append(f"data_classificacao < ${len(params)}")
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+# Sem sugestão por conversa (PER_CONVERSATION_SUGGESTIONS=False) a sugestão vem do cluster da classificação
+# (sugestoes_por_cluster.py); a busca pelo usuário usa o idx_sugestoes_cluster_membros_user
+COLUMN_EXPRESSIONS = {
+    "sugestao_melhoria": "COALESCE(NULLIF(c.sugestao_melhoria, ''), cluster_sugestao.sugestao) AS sugestao_melhoria",
+}
+
+CLUSTER_SUGGESTION_JOIN = """
+        LEFT JOIN LATERAL (
+            SELECT sc.sugestao
+            FROM sugestoes_cluster_membros m
+            JOIN sugestoes_cluster sc ON sc.id = m.sugestao_id
+            WHERE m.user_id = c.user_id AND m.classificacao_id = c.id
+            ORDER BY m.sugestao_id DESC
+            LIMIT 1
+        ) cluster_sugestao ON TRUE"""
+
+def build_export_query(columns: List[str], where: str) -> str:
+    expressions = [COLUMN_EXPRESSIONS.get(column, f"c.{column}") for column in columns]
+    join = CLUSTER_SUGGESTION_JOIN if "sugestao_melhoria" in columns else ""
+    return f"""
+        SELECT {', '.join(expressions)}
+        FROM classificacoes c{join}
+        {where}
+        ORDER BY c.data_classificacao DESC
+    """
+
+async def export_csv(conn, path: str, query: str, params: List[Any]) -> int:
+    """COPY ... TO STDOUT: o Postgres formata o CSV e o arquivo é escrito em blocos"""
+    result = await conn.copy_from_query(query, *params, output=path, format="csv", header=True)
+    # asyncpg devolve o status do COPY ("COPY 1234")
+    return int(result.split()[-1])
+
+async def export_parquet(conn, path: str, query: str, params: List[Any], columns: List[str], chunk_size: int) -> int:
+    """Cursor no servidor com um row group do Parquet por lote"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Exportação em Parquet requer o pacote pyarrow (pip install pyarrow)")
+    
+    arrow_types = {
+        "string": pa.string(),
+        "float64": pa.float64(),
+        "int64": pa.int64(),
+        "timestamp": pa.timestamp("us"),
+    }
+    schema = pa.schema([(column, arrow_types[EXPORTABLE_COLUMNS[column]]) for column in columns])
+    float_columns = [column for column in columns if EXPORTABLE_COLUMNS[column] == "float64"]
     
-    # Buscar todas as classificações
-    results = await conn.fetch("""
-        SELECT user_id, classificacao, confianca, contexto, 
-               data_classificacao, tokens_utilizados, tempo_processamento_ms
+    total = 0
+    writer = pq.ParquetWriter(path, schema, compression="zstd")
+    try:
+        async with conn.transaction():
+            batch = []
+            async for record in conn.cursor(query, *params, prefetch=chunk_size):
+                batch.append(record)
+                if len(batch) >= chunk_size:
+                    writer.write_table(records_to_table(batch, columns, float_columns, schema))
+                    total += len(batch)
+                    batch = []
+            if batch:
+                writer.write_table(records_to_table(batch, columns, float_columns, schema))
+                total += len(batch)
+    finally:
+        writer.close()
+    return total
+
+def records_to_table(batch, columns: List[str], float_columns: List[str], schema):
+    import pyarrow as pa
+    data = {}
+    for column in columns:
+        values = [record[column] for record in batch]
+        if column in float_columns:
+            # NUMERIC chega como Decimal
+            values = [float(value) if value is not None else None for value in values]
+        data[column] = values
+    return pa.table(data, schema=schema)
+
+async def print_summary(conn, where: str, params: List[Any]):
+    """Resumo calculado por agregação no banco (sem carregar as linhas)"""
+    totals = await conn.fetchrow(f"""
+        SELECT COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE classificacao = 'Erro na classificação') AS com_erro
         FROM classificacoes
-        ORDER BY data_classificacao DESC
-    """)
+        {where}
+    """, *params)
     
-    # Converter para DataFrame
-    df = pd.DataFrame(results, columns=[
-        'user_id', 'classificacao', 'confianca', 'contexto',
-        'data_classificacao', 'tokens_utilizados', 'tempo_processamento_ms'
-    ])
+    if totals["total"] == 0:
+        return
     
-    # Salvar em CSV
-    df.to_csv('classificacoes_completas.csv', index=False)
-    print(f"✅ Exportadas {len(df)} classificações para classificacoes_completas.csv")
+    print("\n📊 Resumo das classificações:")
+    print(f"  Total de classificações: {totals['total']}")
+    print(f"  Classificações com sucesso: {totals['total'] - totals['com_erro']}")
+    print(f"  Classificações com erro: {totals['com_erro']}")
     
-    # Mostrar resumo
-    if len(df) > 0:
-        print("\n📊 Resumo das classificações:")
-        print(f"  Total de classificações: {len(df)}")
-        print(f"  Classificações com sucesso: {len(df[df['classificacao'] != 'Erro na classificação'])}")
-        print(f"  Classificações com erro: {len(df[df['classificacao'] == 'Erro na classificação'])}")
-        
-        # Distribuição das classificações
-        print("\n📋 Distribuição das classificações:")
-        dist = df['classificacao'].value_counts()
-        for classificacao, count in dist.items():
-            print(f"  {classificacao}: {count}")
+    # Distribuição das classificações
+    print("\n📋 Distribuição das classificações:")
+    distribution = await conn.fetch(f"""
+        SELECT classificacao, COUNT(*) AS quantidade
+        FROM classificacoes
+        {where}
+        GROUP BY classificacao
+        ORDER BY quantidade DESC
+    """, *params)
+    for row in distribution:
+        print(f"  {row['classificacao']}: {row['quantidade']}")
+
+async def export_results(output: str = "classificacoes_completas.csv", columns: List[str] = None,
+                         since: date = None, until: date = None, file_format: str = None,
+                         chunk_size: int = 5000, summary: bool = True):
+    columns = columns or DEFAULT_COLUMNS
+    unknown = [column for column in columns if column not in EXPORTABLE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Colunas desconhecidas: {', '.join(unknown)} (disponíveis: {', '.join(EXPORTABLE_COLUMNS)})")
+    file_format = file_format or ("parquet" if output.endswith(".parquet") else "csv")
     
-    await conn.close()
+    where, params = build_filters(since, until)
+    query = build_export_query(columns, where)
+    
+    db = DatabaseManager()
+    try:
+        conn = await db.get_connection()
+        try:
+            if file_format == "parquet":
+                total = await export_parquet(conn, output, query, params, columns, chunk_size)
+            else:
+                total = await export_csv(conn, output, query, params)
+            print(f"✅ Exportadas {total} classificações para {output} ({os.path.getsize(output) / 1024:.0f} KB)")
+        
+            if summary:
+                await print_summary(conn, where, params)
+        finally:
+            await conn.close()
+    finally:
+        await db.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Exporta a tabela classificacoes em streaming")
+    parser.add_argument("--saida", default="classificacoes_completas.csv", help="Arquivo de saída (.csv ou .parquet)")
+    parser.add_argument("--formato", choices=["csv", "parquet"], help="Padrão: pela extensão da saída")
+    parser.add_argument("--colunas", help=f"Colunas separadas por vírgula (padrão: {','.join(DEFAULT_COLUMNS)})")
+    parser.add_argument("--desde", type=parse_date, help="Data inicial (AAAA-MM-DD, inclusiva)")
+    parser.add_argument("--ate", type=parse_date, help="Data final (AAAA-MM-DD, exclusiva)")
+    parser.add_argument("--lote", type=int, default=5000, help="Linhas por lote/row group no Parquet")
+    parser.add_argument("--sem-resumo", action="store_true", help="Não calcula o resumo por classificação")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    asyncio.run(export_results(
+        output=args.saida,
+        columns=args.colunas.split(",") if args.colunas else None,
+        since=args.desde,
+        until=args.ate,
+        file_format=args.formato,
+        chunk_size=args.lote,
+        summary=not args.sem_resumo
+    ))
 
 if __name__ == "__main__":
-    asyncio.run(export_results()) 
\ No newline at end of file
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Servidor local compatível com o chat completions da OpenAI para testes de carga sem rede
+
+Uso:
+    python fake_openai_server.py --port 8089 --latency-ms 800 --rate-429 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake python main.py
+"""
+
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Tuple
+
+# Linhas da conversa no formato gerado por format_messages_for_analysis
+_CONVERSATION_LINE = re.compile(r"^\[[^\]]*\] (\w+): (.*)$")
+
+SUGGESTION_ANSWERS = [
+    "• Responder a dúvida de pagamento com as opções e já convidar para a próxima aula do minicurso",
+    "• Antecipar a objeção de preço mostrando o valor do conteúdo antes de falar em parcelamento",
+    "• Personalizar a resposta com o nome do aluno e reforçar o benefício da próxima etapa",
+    "Conversa bem conduzida - atendimento eficiente e motivação adequada",
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """Aproximação de ~4 caracteres por token"""
+    return max(1, len(text) // 4)
+
+
+class FakeOpenAIServer:
+    """
+    Stub do endpoint /v1/chat/completions com latência configurável, uso de tokens,
+    injeção de 429/5xx e cabeçalhos de rate limit no formato da OpenAI.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "lognormal",
+                 latency_ms: float = 800.0, latency_sigma: float = 0.5, rate_429: float = 0.0,
+                 rate_500: float = 0.0, rpm_limit: int = 0, seed: int = None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.rpm_limit = rpm_limit
+
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._httpd = None
+        self._thread = None
+        self._keyword_classifier = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def sample_latency(self) -> float:
+        """Latência em segundos conforme a distribuição configurada"""
+        with self._lock:
+            if self.latency == "fixed":
+                value = self.latency_ms
+            elif self.latency == "uniform":
+                spread = self.latency_ms * self.latency_sigma
+                value = self.random.uniform(self.latency_ms - spread, self.latency_ms + spread)
+            else:
+                # lognormal com mediana latency_ms: cauda longa como a da API real
+                value = self.random.lognormvariate(math.log(self.latency_ms), self.latency_sigma)
+        return max(0.0, value) / 1000
+
+    def _rate_limit_state(self) -> Tuple[bool, int, float]:
+        """Janela de um minuto: (estourou, restantes, segundos até reset)"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 60:
+                self._window_start = now
+                self._window_requests = 0
+            self._window_requests += 1
+            reset = 60 - (now - self._window_start)
+            if not self.rpm_limit:
+                return False, 0, reset
+            remaining = max(0, self.rpm_limit - self._window_requests)
+            return self._window_requests > self.rpm_limit, remaining, reset
+
+    def _injected_error(self) -> int:
+        with self._lock:
+            draw = self.random.random()
+        if draw < self.rate_429:
+            return 429
+        if draw < self.rate_429 + self.rate_500:
+            return self.random.choice([500, 502, 503])
+        return 0
+
+    def answer(self, messages) -> str:
+        """Resposta plausível: tag|justificativa|específica ou sugestões de melhoria"""
+        system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        prompt = next((m.get("content", "") for m in messages if m.get("role") == "user"), "")
+
+        if "especialista em atendimento" in system:
+            index = estimate_tokens(prompt) % len(SUGGESTION_ANSWERS)
+            return SUGGESTION_ANSWERS[index]
+
+        conversation = []
+        for line in prompt.splitlines():
+            match = _CONVERSATION_LINE.match(line.strip())
+            if match:
+                conversation.append({"role": match.group(1), "message": match.group(2)})
+
+        if self._keyword_classifier is None:
+            from tag_based_classifier import TagBasedClassifier
+            self._keyword_classifier = TagBasedClassifier(use_ai=False)
+
+        tag, _, context = self._keyword_classifier.classify_by_keywords(conversation)
+        specific = tag.split(":", 1)[-1].replace("Dúvidas sobre", "Perguntou sobre").strip()
+        if "QUARTA parte" in prompt:
+            # Prompt incremental/resumo: quarta parte com o resumo acumulado
+            return f"{tag}|{context} (resposta simulada)|{specific}|Cliente {specific.lower()} (resumo simulado)"
+        return f"{tag}|{context} (resposta simulada)|{specific}"
+
+    def handle(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, str], Dict[str, Any]]:
+        """Processa uma requisição e devolve (status, cabeçalhos, corpo)"""
+        limited, remaining, reset = self._rate_limit_state()
+        headers = {
+            "x-ratelimit-limit-requests": str(self.rpm_limit or 10000),
+            "x-ratelimit-remaining-requests": str(remaining if self.rpm_limit else 9999),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s",
+            "x-request-id": f"req_fake_{self.random.getrandbits(48):012x}",
+        }
+
+        time.sleep(self.sample_latency())
+
+        status = 429 if limited else self._injected_error()
+        if status == 429:
+            self.stats["429"] += 1
+            headers["retry-after-ms"] = str(int(min(reset, 1.0) * 1000))
+            error = {"message": "Rate limit reached (fake server)", "type": "requests", "code": "rate_limit_exceeded"}
+            return 429, headers, {"error": error}
+        if status:
+            self.stats["5xx"] += 1
+            return status, headers, {"error": {"message": "Injected server error", "type": "server_error", "code": None}}
+
+        messages = body.get("messages", [])
+        content = self.answer(messages)
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+        completion_tokens = min(estimate_tokens(content), body.get("max_tokens") or 4096)
+        self.stats["ok"] += 1
+
+        return 200, headers, {
+            "id": f"chatcmpl-fake{self.random.getrandbits(40):010x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": 0}
+            }
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, headers, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b"{}"
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {}, {"error": {"message": f"Rota não suportada: {self.path}"}})
+                    return
+                try:
+                    body = json.loads(raw)
+                except json.JSONDecodeError:
+                    self._send(400, {}, {"error": {"message": "JSON inválido"}})
+                    return
+                self._send(*server.handle(body))
+
+        return Handler
+
+    def start(self) -> str:
+        """Sobe o servidor em uma thread de fundo e retorna a base URL"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Argumentos de configuração do servidor (reutilizados pelo harness de carga)"""
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Latência média/mediana em ms")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Dispersão da latência")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fração de respostas 429 injetadas")
+    parser.add_argument("--rate-500", type=float, default=0.0, help="Fração de respostas 5xx injetadas")
+    parser.add_argument("--rpm-limit", type=int, default=0, help="Limite real de requisições por minuto (0 = sem limite)")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def server_from_args(args, host: str = "127.0.0.1", port: int = 0) -> FakeOpenAIServer:
+    return FakeOpenAIServer(
+        host=host, port=port, latency=args.latency, latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma, rate_429=args.rate_429, rate_500=args.rate_500,
+        rpm_limit=args.rpm_limit, seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor fake compatível com a API da OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_args(args, host=args.host, port=args.port)
+    base_url = server.start()
+    print(f"🧪 Servidor fake da OpenAI em {base_url}")
+    print(f"   Use: OPENAI_BASE_URL={base_url} OPENAI_API_KEY=fake python main.py")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   Respostas: {dict(server.stats)}")
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
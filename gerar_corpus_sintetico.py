@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Gerador de corpus sintético (customers + chat_history + classificacoes) em um Postgres local
+para reproduzir o comportamento de produção em escala
+
+Uso:
+    python gerar_corpus_sintetico.py --clientes 1000000 --recriar --csv customers_sintetico.csv
+
+ATENÇÃO: --recriar apaga as tabelas customers, chat_history e classificacoes do banco
+configurado em DATABASE_URL. Use apenas em um banco local de testes.
+"""
+
+import csv
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List, Tuple, Iterator
+from database import DatabaseManager, SCHEMA_MIGRATIONS, REBUILD_DAILY_SUMMARY
+from config import (
+    TAG_KEYWORDS, CHAT_HISTORY_USER_ID_COLUMN, CHAT_HISTORY_TIMESTAMP_COLUMN, CHAT_HISTORY_MESSAGE_COLUMN
+)
+
+CREATE_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS customers (
+        id BIGINT PRIMARY KEY,
+        wa_id VARCHAR(50),
+        profile_name TEXT,
+        from_number VARCHAR(50)
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS chat_history (
+        id BIGSERIAL PRIMARY KEY,
+        {CHAT_HISTORY_USER_ID_COLUMN} BIGINT NOT NULL,
+        {CHAT_HISTORY_MESSAGE_COLUMN} TEXT NOT NULL,
+        {CHAT_HISTORY_TIMESTAMP_COLUMN} TIMESTAMP NOT NULL,
+        message_type VARCHAR(10) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS classificacoes (
+        id SERIAL PRIMARY KEY,
+        user_id VARCHAR(255) NOT NULL,
+        classificacao TEXT NOT NULL,
+        confianca DECIMAL(5,4),
+        contexto TEXT,
+        data_classificacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        modelo_utilizado VARCHAR(100) DEFAULT 'gpt-4o-mini',
+        tokens_utilizados INTEGER,
+        tempo_processamento_ms INTEGER,
+        status VARCHAR(50) DEFAULT 'concluido',
+        observacoes TEXT,
+        wa_id VARCHAR(50),
+        classificacao_especifica TEXT,
+        sugestao_melhoria TEXT,
+        tempos_etapas JSONB
+    )
+    """,
+]
+
+DROP_TABLES_SQL = "DROP TABLE IF EXISTS classificacoes_resumo_diario, conversas_snapshot, classificacoes_tags, tags_indice, taxonomias, fila_reclassificacao, resumos_conversa, sugestoes_cluster_membros, sugestoes_cluster, consumo_tokens, classificacoes, chat_history, customers CASCADE"
+
+# Mensagens repetidas do bot (AIR) e de campanhas automáticas (AIO)
+BOT_TEMPLATES = [
+    "Olá! Seja bem-vindo ao minicurso. Como posso te ajudar hoje?",
+    "Sua próxima aula já está disponível na área do aluno. Bora assistir?",
+    "Posso te enviar o link de pagamento com as condições especiais de hoje?",
+    "Obrigado pela mensagem! Em breve um especialista vai te responder.",
+    "O pagamento pode ser feito por PIX, boleto ou cartão em até 12x.",
+    "Entendo sua dúvida! O acesso ao curso é liberado logo após a confirmação do pagamento.",
+    "Fico feliz em ajudar! Tem mais alguma dúvida sobre o curso?",
+]
+CAMPAIGN_TEMPLATES = [
+    "🔥 Última chance: condição especial encerra hoje à meia-noite!",
+    "📚 Aula 2 liberada! Acesse agora pelo link da área do aluno.",
+    "⏰ Lembrete: sua vaga com desconto expira em 24 horas.",
+]
+GREETINGS = ["oi", "olá", "bom dia", "boa tarde", "boa noite", "oi, tudo bem?"]
+FILLERS = ["entendi", "obrigado", "ok", "vou ver aqui", "pode me explicar melhor?", "certo", "ainda tenho dúvida"]
+CUSTOMER_TEMPLATES = [
+    "{saudacao}, {frase}",
+    "{frase}?",
+    "olha, {frase}",
+    "{frase}. {preenchimento}",
+    "{saudacao}! queria saber: {frase}",
+]
+
+NAMES = ["Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+         "Larissa", "Marcos", "Natália", "Otávio", "Patrícia", "Rafael", "Sabrina", "Thiago", "Vanessa"]
+
+
+class CorpusGenerator:
+    def __init__(self, seed: int = 42, mean_messages: float = 10.0, max_messages: int = 2000,
+                 usr_share: float = 0.45, aio_share: float = 0.10, days: int = 180):
+        self.rng = random.Random(seed)
+        self.max_messages = max_messages
+        self.usr_share = usr_share
+        self.aio_share = aio_share
+        self.days = days
+        self.now = datetime.now().replace(microsecond=0)
+
+        # Pareto com alpha 1.5 tem média alpha/(alpha-1) = 3 vezes a escala
+        self.pareto_alpha = 1.5
+        self.pareto_scale = mean_messages / 3.0
+
+        # Frases do cliente pré-montadas a partir do TAG_KEYWORDS para gerar rápido
+        self.tags = list(TAG_KEYWORDS)
+        self.customer_phrases = {tag: self._build_phrases(keywords) for tag, keywords in TAG_KEYWORDS.items()}
+
+    def _build_phrases(self, keywords: List[str]) -> List[str]:
+        phrases = []
+        for keyword in keywords:
+            for template in CUSTOMER_TEMPLATES:
+                phrases.append(template.format(
+                    saudacao=self.rng.choice(GREETINGS),
+                    frase=keyword,
+                    preenchimento=self.rng.choice(FILLERS)
+                ))
+        return phrases
+
+    def messages_per_customer(self) -> int:
+        """Distribuição de cauda longa: muitos clientes com poucas mensagens, poucos com milhares"""
+        value = int(self.rng.paretovariate(self.pareto_alpha) * self.pareto_scale)
+        return max(0, min(self.max_messages, value))
+
+    @staticmethod
+    def wa_id(customer_id: int) -> str:
+        return f"5511{customer_id % 10 ** 9:09d}"
+
+    def customer_row(self, customer_id: int) -> Tuple:
+        number = self.wa_id(customer_id)
+        return (customer_id, number, f"{self.rng.choice(NAMES)} {customer_id}", number)
+
+    def conversation(self, customer_id: int, tag: str) -> Iterator[Tuple]:
+        """Mensagens (customer_id, texto, data, tipo) de um cliente, em ordem cronológica"""
+        rng = self.rng
+        total = self.messages_per_customer()
+        moment = self.now - timedelta(days=rng.uniform(0, self.days), seconds=rng.uniform(0, 86400))
+        phrases = self.customer_phrases[tag]
+
+        for _ in range(total):
+            draw = rng.random()
+            if draw < self.usr_share:
+                roll = rng.random()
+                if roll < 0.5:
+                    text = rng.choice(phrases)
+                elif roll < 0.75:
+                    text = rng.choice(GREETINGS)
+                else:
+                    text = rng.choice(FILLERS)
+                yield (customer_id, text, moment, "USR")
+            elif draw < self.usr_share + self.aio_share:
+                yield (customer_id, rng.choice(CAMPAIGN_TEMPLATES), moment, "AIO")
+            else:
+                yield (customer_id, rng.choice(BOT_TEMPLATES), moment, "AIR")
+            moment += timedelta(seconds=rng.expovariate(1 / 1800))
+
+    def classification_row(self, customer_id: int, tag: str) -> Tuple:
+        keyword = self.rng.choice(TAG_KEYWORDS[tag])
+        return (
+            str(customer_id), tag, Decimal(f"{self.rng.uniform(0.6, 0.95):.4f}"),
+            f"Cliente mencionou '{keyword}'", self.rng.randint(900, 2200), self.rng.randint(600, 4000),
+            self.wa_id(customer_id), f"Mencionou {keyword}", ""
+        )
+
+
+async def copy_rows(conn, table: str, columns: List[str], rows: List[Tuple]):
+    if rows:
+        await conn.copy_records_to_table(table, records=rows, columns=columns)
+
+
+async def generate(args):
+    db = DatabaseManager()
+    try:
+        conn = await db.get_connection()
+        generator = CorpusGenerator(
+            seed=args.seed, mean_messages=args.media_mensagens, max_messages=args.max_mensagens,
+            usr_share=args.fracao_usr, aio_share=args.fracao_aio, days=args.dias
+        )
+
+        chat_columns = [CHAT_HISTORY_USER_ID_COLUMN, CHAT_HISTORY_MESSAGE_COLUMN, CHAT_HISTORY_TIMESTAMP_COLUMN, "message_type"]
+        classification_columns = [
+            "user_id", "classificacao", "confianca", "contexto", "tokens_utilizados",
+            "tempo_processamento_ms", "wa_id", "classificacao_especifica", "sugestao_melhoria"
+        ]
+
+        try:
+            if args.recriar:
+                print("🗑️ Removendo tabelas customers, chat_history, classificacoes e auxiliares...")
+                await conn.execute(DROP_TABLES_SQL)
+            for sql in CREATE_TABLES_SQL + SCHEMA_MIGRATIONS:
+                await conn.execute(sql)
+
+            csv_file = open(args.csv, "w", newline="", encoding="utf-8") if args.csv else None
+            csv_writer = csv.writer(csv_file, quoting=csv.QUOTE_NONNUMERIC) if csv_file else None
+            if csv_writer:
+                csv_writer.writerow(["customer_id"])
+
+            started = time.perf_counter()
+            customers, messages, classifications = [], [], []
+            total_messages = 0
+            total_classified = 0
+
+            for index in range(args.clientes):
+                customer_id = args.primeiro_id + index
+                tag = generator.rng.choice(generator.tags)
+                customers.append(generator.customer_row(customer_id))
+                conversation = list(generator.conversation(customer_id, tag))
+                messages.extend(conversation)
+                if csv_writer:
+                    csv_writer.writerow([customer_id])
+
+                if conversation and generator.rng.random() < args.fracao_classificada:
+                    classifications.append(generator.classification_row(customer_id, tag))
+
+                if len(messages) >= args.lote:
+                    await copy_rows(conn, "customers", ["id", "wa_id", "profile_name", "from_number"], customers)
+                    await copy_rows(conn, "chat_history", chat_columns, messages)
+                    await copy_rows(conn, "classificacoes", classification_columns, classifications)
+                    total_messages += len(messages)
+                    total_classified += len(classifications)
+                    customers, messages, classifications = [], [], []
+
+                    elapsed = time.perf_counter() - started
+                    print(f"📈 {index + 1:,} clientes, {total_messages:,} mensagens ({total_messages / elapsed:,.0f} msg/s)")
+
+            await copy_rows(conn, "customers", ["id", "wa_id", "profile_name", "from_number"], customers)
+            await copy_rows(conn, "chat_history", chat_columns, messages)
+            await copy_rows(conn, "classificacoes", classification_columns, classifications)
+            total_messages += len(messages)
+            total_classified += len(classifications)
+
+            if csv_file:
+                csv_file.close()
+
+            print("📊 Recalculando o resumo diário de tags...")
+            await conn.execute("DELETE FROM classificacoes_resumo_diario")
+            await conn.execute(REBUILD_DAILY_SUMMARY)
+
+            print("🔄 Atualizando estatísticas (ANALYZE)...")
+            await conn.execute("ANALYZE customers")
+            await conn.execute("ANALYZE chat_history")
+            await conn.execute("ANALYZE classificacoes")
+
+            elapsed = time.perf_counter() - started
+            print("\n" + "=" * 50)
+            print("🎉 CORPUS SINTÉTICO GERADO")
+            print("=" * 50)
+            print(f"  Clientes: {args.clientes:,}")
+            print(f"  Mensagens: {total_messages:,}")
+            print(f"  Classificações pré-existentes: {total_classified:,}")
+            print(f"  Tempo: {elapsed:.1f}s ({total_messages / elapsed:,.0f} msg/s)")
+            if args.csv:
+                print(f"  Lista de clientes: {args.csv}")
+            print("\n💡 As tabelas são criadas sem índices secundários para acelerar a carga.")
+
+        finally:
+            await conn.close()
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um corpus sintético de conversas no Postgres local")
+    parser.add_argument("--clientes", type=int, default=100000)
+    parser.add_argument("--primeiro-id", type=int, default=1000000, help="Primeiro customer_id gerado")
+    parser.add_argument("--media-mensagens", type=float, default=10.0, help="Média de mensagens por cliente")
+    parser.add_argument("--max-mensagens", type=int, default=2000, help="Teto de mensagens por cliente")
+    parser.add_argument("--fracao-usr", type=float, default=0.45, help="Fração de mensagens USR")
+    parser.add_argument("--fracao-aio", type=float, default=0.10, help="Fração de mensagens AIO (o resto é AIR)")
+    parser.add_argument("--fracao-classificada", type=float, default=0.3, help="Fração de clientes já classificados")
+    parser.add_argument("--dias", type=int, default=180, help="Janela de datas das conversas")
+    parser.add_argument("--lote", type=int, default=200000, help="Mensagens por COPY")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--csv", help="Grava os customer_id gerados neste CSV (formato do customers.csv)")
+    parser.add_argument("--recriar", action="store_true", help="Apaga e recria as tabelas antes da carga")
+    asyncio.run(generate(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
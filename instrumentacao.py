@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Instrumentação leve do caminho quente: spans de tempo por etapa, agregados em
+histogramas no processo e acumulados por usuário para gravação junto da classificação
+"""
+
+import time
+import bisect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Tuple
+
+# Limites superiores (ms) dos buckets; o último bucket é aberto
+DEFAULT_BUCKETS_MS: Tuple[float, ...] = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000
+)
+
+# Tempos do usuário em processamento; cada task do asyncio enxerga o seu próprio dicionário
+_user_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("tempos_etapas", default=None)
+
+
+class LatencyHistogram:
+    """Histograma de latências com buckets fixos (custo constante por observação)"""
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = DEFAULT_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+
+    def observe(self, milliseconds: float):
+        self.counts[bisect.bisect_left(self.buckets_ms, milliseconds)] += 1
+        self.count += 1
+        self.total_ms += milliseconds
+        self.min_ms = min(self.min_ms, milliseconds)
+        self.max_ms = max(self.max_ms, milliseconds)
+
+    def quantile(self, fraction: float) -> float:
+        """Estimativa do quantil por interpolação linear dentro do bucket"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= target:
+                lower = max(self.buckets_ms[index - 1] if index > 0 else 0.0, self.min_ms)
+                upper = min(self.buckets_ms[index] if index < len(self.buckets_ms) else self.max_ms, self.max_ms)
+                return lower + (upper - lower) * (target - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "n": self.count,
+            "media_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.50), 2),
+            "p95_ms": round(self.quantile(0.95), 2),
+            "p99_ms": round(self.quantile(0.99), 2),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+class StageInstrumentation:
+    """Registra a duração de cada etapa no histograma global e nos tempos do usuário atual"""
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    def observe(self, stage: str, milliseconds: float):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.observe(milliseconds)
+
+        timings = _user_timings.get()
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + milliseconds, 2)
+
+    @contextmanager
+    def span(self, stage: str):
+        """Mede o bloco e registra em `stage`, inclusive quando ele levanta exceção"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, (time.perf_counter() - start) * 1000)
+
+    @contextmanager
+    def track_user(self):
+        """Abre o acumulador de tempos por etapa do usuário processado na task atual"""
+        timings: Dict[str, float] = {}
+        token = _user_timings.set(timings)
+        try:
+            yield timings
+        finally:
+            _user_timings.reset(token)
+
+    def user_timings(self) -> Dict[str, float]:
+        """Cópia dos tempos acumulados do usuário da task atual (vazio fora de track_user)"""
+        return dict(_user_timings.get() or {})
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {stage: histogram.snapshot() for stage, histogram in self.histograms.items()}
+
+    def reset(self):
+        self.histograms.clear()
+
+
+# Instância compartilhada pelo pipeline (classificador, banco e orquestração)
+stage_timings = StageInstrumentation()
+span = stage_timings.span
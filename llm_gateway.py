@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Gateway único das chamadas à IA: um cliente HTTP com pool compartilhado, cache, limite de requisições,
+retentativas e contabilidade de uso em um só lugar, com backends plugáveis (OpenAI, servidor fake, regras)
+
+Uso:
+    LLM_BACKEND=fake python main.py           # servidor fake em processo, sem rede
+    LLM_BACKEND=regras python main.py         # respostas do classificador por palavras-chave, sem HTTP
+    LLM_BACKEND=cassete python main.py        # respostas gravadas (cassete.py), sem rede e sem custo
+    python llm_gateway.py --backend fake      # mostra uma chamada de teste e as estatísticas do gateway
+"""
+
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import importlib
+import argparse
+from collections import OrderedDict, Counter
+from contextvars import ContextVar
+from types import SimpleNamespace
+from typing import Dict, Any, List, Optional
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL, OPENAI_TIMEOUT, LLM_BACKEND, LLM_CACHE_SIZE,
+    LLM_RPM_LIMIT, LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE, LLM_MAX_ATTEMPTS, LLM_RETRY_BASE_DELAY,
+    LLM_FAKE_LATENCY_MS
+)
+from concurrency_controller import classify_llm_error
+from instrumentacao import stage_timings
+from custos import usage_record
+
+logger = logging.getLogger(__name__)
+
+# Chamadas à IA da conversa sendo classificada na task atual (uso real informado pela API)
+current_llm_calls: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("chamadas_llm", default=None)
+
+# Erros que valem nova tentativa (os demais, como 400/401, falhariam de novo)
+RETRYABLE_ERRORS = ("rate_limit", "timeout", "server")
+
+
+def make_usage(prompt_tokens: int = 0, completion_tokens: int = 0, cached_tokens: int = 0) -> SimpleNamespace:
+    """Uso no mesmo formato do `usage` da OpenAI (lido por custos.usage_record)"""
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+    )
+
+
+class LLMResponse:
+    """Resposta normalizada de qualquer backend"""
+
+    __slots__ = ("content", "model", "usage", "backend", "cached")
+
+    def __init__(self, content: str, model: str, usage: SimpleNamespace, backend: str, cached: bool = False):
+        self.content = content
+        self.model = model
+        self.usage = usage
+        self.backend = backend
+        self.cached = cached
+
+    def from_cache(self) -> "LLMResponse":
+        """Cópia servida pelo cache: mesmo conteúdo, sem tokens consumidos"""
+        return LLMResponse(self.content, self.model, make_usage(), self.backend, cached=True)
+
+
+class TokenBucket:
+    """Limite de requisições por minuto com rajada de até um segundo de crédito (no mínimo uma requisição)"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60
+        self.capacity = max(1.0, rate_per_minute / 60)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> float:
+        """Reserva uma requisição e espera o crédito; devolve os segundos esperados"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        wait = -self.tokens / self.rate
+        await asyncio.sleep(wait)
+        return wait
+
+
+# ----------------------------------------------------------------------------
+# Backends
+# ----------------------------------------------------------------------------
+
+BACKENDS = {}
+
+# Backends em módulos próprios: importados só quando pedidos pelo nome (módulo, classe)
+EXTERNAL_BACKENDS = {
+    "cassete": ("cassete", "CassetteBackend"),
+}
+
+
+def register_backend(cls):
+    """Registra um backend pelo seu `nome` (usado em LLM_BACKEND)"""
+    BACKENDS[cls.nome] = cls
+    return cls
+
+
+def backend_names() -> List[str]:
+    return sorted(set(BACKENDS) | set(EXTERNAL_BACKENDS))
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Espera pedida pela API nos cabeçalhos retry-after-ms / retry-after, quando houver"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+@register_backend
+class OpenAIBackend:
+    """API de chat da OpenAI (ou compatível) com um único cliente e pool de conexões keep-alive"""
+
+    nome = "openai"
+
+    def __init__(self, api_key: str = None, base_url: str = None, timeout: float = OPENAI_TIMEOUT,
+                 max_connections: int = LLM_MAX_CONNECTIONS, max_keepalive: int = LLM_MAX_KEEPALIVE):
+        self.api_key = api_key or OPENAI_API_KEY
+        self.base_url = base_url or OPENAI_BASE_URL
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self._client = None
+        self._loop = None
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key) and self.api_key != 'sua_chave_api_aqui'
+
+    async def _get_client(self):
+        """Cliente do event loop atual: as conexões do httpx não podem ser usadas em outro loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                await self._close_stale_client()
+            import httpx
+            import openai
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_keepalive),
+                timeout=httpx.Timeout(self.timeout, connect=min(10.0, self.timeout)),
+            )
+            # As retentativas ficam no gateway, que as observa e contabiliza
+            self._client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                              timeout=self.timeout, max_retries=0, http_client=http_client)
+            self._loop = loop
+        return self._client
+
+    async def complete(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                       temperature: float) -> LLMResponse:
+        client = await self._get_client()
+        response = await client.chat.completions.create(
+            model=model, messages=messages, max_tokens=max_tokens, temperature=temperature
+        )
+        return LLMResponse(response.choices[0].message.content or "", response.model or model,
+                           response.usage, self.nome)
+
+    async def _close_stale_client(self):
+        """Fecha o cliente criado em outro event loop (no próprio loop, se ele ainda estiver rodando)"""
+        client, loop = self._client, self._loop
+        self._client = None
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.close(), loop)
+            return
+        try:
+            await client.close()
+        except Exception as e:
+            # Loop antigo já fechado: os sockets dele não podem mais ser encerrados de forma limpa
+            logger.debug(f"Cliente da IA do event loop anterior fechado com erro: {e}")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+@register_backend
+class FakeServerBackend(OpenAIBackend):
+    """Servidor fake (fake_openai_server.py) em processo, acessado pelo mesmo cliente HTTP da OpenAI"""
+
+    nome = "fake"
+
+    def __init__(self, latency_ms: float = LLM_FAKE_LATENCY_MS, **kwargs):
+        from fake_openai_server import FakeOpenAIServer
+        self.server = FakeOpenAIServer(latency="fixed", latency_ms=latency_ms)
+        super().__init__(api_key="fake-key", base_url=self.server.start(), **kwargs)
+
+    async def aclose(self):
+        await super().aclose()
+        self.server.stop()
+
+
+@register_backend
+class RuleBasedBackend:
+    """Respostas do classificador por palavras-chave no formato da IA, sem HTTP e sem custo"""
+
+    nome = "regras"
+    available = True
+
+    def __init__(self):
+        from fake_openai_server import FakeOpenAIServer
+        self.responder = FakeOpenAIServer()
+
+    async def complete(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                       temperature: float) -> LLMResponse:
+        return LLMResponse(self.responder.answer(messages), "regras", make_usage(), self.nome)
+
+    async def aclose(self):
+        pass
+
+
+def create_backend(name: str = None, **kwargs):
+    name = name or LLM_BACKEND
+    if name not in BACKENDS and name in EXTERNAL_BACKENDS:
+        module, class_name = EXTERNAL_BACKENDS[name]
+        BACKENDS[name] = getattr(importlib.import_module(module), class_name)
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de IA desconhecido: {name} (disponíveis: {', '.join(backend_names())})")
+    return BACKENDS[name](**kwargs)
+
+
+# ----------------------------------------------------------------------------
+# Gateway
+# ----------------------------------------------------------------------------
+
+class LLMGateway:
+    """Cache LRU com deduplicação de chamadas em voo, limite de RPM, retentativas e contabilidade de uso"""
+
+    def __init__(self, backend=None, cache_size: int = LLM_CACHE_SIZE, rpm_limit: int = LLM_RPM_LIMIT,
+                 max_attempts: int = LLM_MAX_ATTEMPTS, retry_base_delay: float = LLM_RETRY_BASE_DELAY):
+        self.backend = backend if backend is not None else create_backend()
+        self.cache_size = cache_size
+        self.rate_limiter = TokenBucket(rpm_limit) if rpm_limit else None
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_delay = retry_base_delay
+        self.observers = []
+        self.counters = Counter()
+        self._cache: "OrderedDict[str, LLMResponse]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def available(self) -> bool:
+        return bool(getattr(self.backend, "available", False))
+
+    def add_observer(self, observer):
+        """Registra um callback(latency_ms, error) chamado após cada tentativa de chamada"""
+        self.observers.append(observer)
+
+    @staticmethod
+    def cache_key(messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float) -> str:
+        payload = json.dumps([model, max_tokens, temperature, messages], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, response: LLMResponse):
+        if not self.cache_size:
+            return
+        self._cache[key] = response
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def complete(self, messages: List[Dict[str, str]], model: str = OPENAI_MODEL, max_tokens: int = 200,
+                       temperature: float = 0.3, etapa: str = "llm", observers=()) -> LLMResponse:
+        """Uma chamada de chat; respostas repetidas saem do cache e chamadas idênticas em voo são unificadas"""
+        key = self.cache_key(messages, model, max_tokens, temperature)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.counters["cache"] += 1
+            return cached.from_cache()
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.counters["deduplicadas"] += 1
+            return (await asyncio.shield(pending)).from_cache()
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            response = await self._call_with_retries(messages, model, max_tokens, temperature, etapa, observers)
+            self._remember(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita "exception was never retrieved" quando ninguém esperava a mesma chamada
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _call_with_retries(self, messages, model, max_tokens, temperature, etapa, observers) -> LLMResponse:
+        for attempt in range(1, self.max_attempts + 1):
+            if self.rate_limiter is not None:
+                waited = await self.rate_limiter.acquire()
+                if waited:
+                    self.counters["espera_rpm"] += 1
+            start = time.perf_counter()
+            error = None
+            try:
+                response = await self.backend.complete(messages, model, max_tokens, temperature)
+                self.counters["chamadas"] += 1
+                calls = current_llm_calls.get()
+                if calls is not None:
+                    calls.append(usage_record(etapa.replace("llm_", "", 1), model, response,
+                                              (time.perf_counter() - start) * 1000))
+                return response
+            except Exception as e:
+                error = classify_llm_error(e)
+                self.counters[f"erro_{error}"] += 1
+                if error not in RETRYABLE_ERRORS or attempt == self.max_attempts:
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    # Backoff exponencial com jitter completo
+                    delay = random.uniform(0, self.retry_base_delay * 2 ** (attempt - 1))
+                self.counters["retentativas"] += 1
+                logger.warning(f"Chamada à IA falhou ({error}), tentativa {attempt}/{self.max_attempts}; "
+                               f"nova tentativa em {delay:.2f}s")
+            finally:
+                latency_ms = (time.perf_counter() - start) * 1000
+                stage_timings.observe(etapa, latency_ms)
+                for observer in (*self.observers, *observers):
+                    observer(latency_ms, error)
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.counters["chamadas"] + self.counters["cache"] + self.counters["deduplicadas"]
+        hits = self.counters["cache"] + self.counters["deduplicadas"]
+        stats = {
+            "backend": self.backend.nome,
+            **dict(self.counters),
+            "cache_entradas": len(self._cache),
+            "taxa_cache": round(hits / requests, 4) if requests else 0.0,
+        }
+        if hasattr(self.backend, "stats"):
+            stats["backend_detalhes"] = self.backend.stats()
+        return stats
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_gateway() -> LLMGateway:
+    """Gateway compartilhado do processo, com o backend de LLM_BACKEND"""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway()
+    return _gateway
+
+
+async def _smoke(backend: str):
+    gateway = LLMGateway(create_backend(backend))
+    messages = [
+        {"role": "system", "content": "Você é um classificador especializado em conversas de atendimento ao cliente."},
+        {"role": "user", "content": "CONVERSA:\n[2025-01-01 10:00:00] USR: qual o valor do curso? tem desconto?"},
+    ]
+    try:
+        for _ in range(2):
+            response = await gateway.complete(messages, etapa="llm_teste")
+            print(f"🤖 [{response.backend}{' cache' if response.cached else ''}] {response.content}")
+        print(f"📊 {gateway.stats()}")
+    finally:
+        await gateway.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chamada de teste pelo gateway de IA")
+    parser.add_argument("--backend", default=LLM_BACKEND, choices=backend_names())
+    args = parser.parse_args()
+    asyncio.run(_smoke(args.backend))
+
+
+if __name__ == "__main__":
+    main()
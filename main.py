@@ -3,13 +3,34 @@
 Programa principal do classificador de conversas
 """
 
+import argparse
 import asyncio
 import logging
 import time
+import uuid
+import random
+from collections import Counter
+from datetime import datetime
 from typing import List, Dict, Any
-from database import DatabaseManager
+from database import DatabaseManager, snapshot_items, decode_snapshot
 from tag_based_classifier import TagBasedClassifier
-from config import BATCH_SIZE, DELAY_BETWEEN_REQUESTS
+from run_journal import RunJournal
+from concurrency_controller import AIMDConcurrencyController
+from priority_scheduler import PriorityScheduler
+from triage import ConversationTriage
+from instrumentacao import stage_timings, span
+from metricas import MetricsRegistry, MetricsServer, ThroughputTracker
+from custos import CostTracker
+from canonicalizacao import TagCanonicalizer
+from pontuacoes_tags import scores_for_result
+from taxonomia import TAXONOMY_VERSION
+from resumos_conversa import INCREMENTAL, plan_prompt_window, summary_record
+from config import (
+    BATCH_SIZE, PRIORITY_SCHEDULING, TRIAGE_ENABLED, PERSIST_STAGE_TIMINGS,
+    METRICS_ENABLED, METRICS_HOST, METRICS_PORT, METRICS_THROUGHPUT_WINDOW,
+    CANONICALIZATION_ENABLED, RECLASSIFICATION_JOURNAL_FILE, INCREMENTAL_PROMPTING,
+    INCREMENTAL_AGREEMENT_SAMPLE_RATE, ACTIVE_USERS_JOURNAL_FILE, RECLASSIFICATION_MAX_ATTEMPTS
+)
 
 # Configurar logging
 logging.basicConfig(
@@ -24,25 +45,138 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class ConversationClassifier:
-    def __init__(self):
-        self.db = DatabaseManager()
-        self.ai = TagBasedClassifier(use_ai=True)
+    def __init__(self, db=None, journal: RunJournal = None, ai: TagBasedClassifier = None,
+                 metrics_port: int = None, reclassify: bool = False, incremental: bool = False,
+                 active: bool = False):
+        self.db = db or DatabaseManager()
+        self.ai = ai or TagBasedClassifier(use_ai=True)
+        # Reclassificação (fila_reclassificacao ou usuários ativos) usa journal próprio para não misturar com a execução normal
+        self.active = active
+        self.reclassify = reclassify or active
+        if journal is None:
+            journal = RunJournal(ACTIVE_USERS_JOURNAL_FILE if active else RECLASSIFICATION_JOURNAL_FILE) \
+                if self.reclassify else RunJournal()
+        self.journal = journal
+        # Prompt incremental: resumo acumulado + mensagens novas (usuários ativos sempre usam)
+        self.incremental = incremental or active or INCREMENTAL_PROMPTING
+        self.prompt_windows = Counter()
+        self.concurrency = AIMDConcurrencyController()
+        self.scheduler = PriorityScheduler(self.db)
+        self.triage = ConversationTriage(calls_per_hit=self.ai.calls_per_conversation)
+        self.ai.add_llm_observer(self.concurrency.record)
+        
+        # Identifica as linhas do ledger consumo_tokens gravadas nesta execução
+        self.run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.costs = CostTracker()
+        self.canonicalizer = TagCanonicalizer() if CANONICALIZATION_ENABLED else None
+        
+        # Progresso da execução atual, lido pelo endpoint de métricas
+        self.metrics_port = METRICS_PORT if metrics_port is None else metrics_port
+        self.progress = {"total": 0, "despachados": 0, "finalizados": 0}
+        self.throughput = ThroughputTracker(METRICS_THROUGHPUT_WINDOW)
+        self.metrics = self.build_metrics()
+        self.ai.add_llm_observer(self._observe_llm_call)
+    
+    def build_metrics(self) -> MetricsRegistry:
+        """Registra as métricas expostas em /metrics"""
+        registry = MetricsRegistry()
+        self.users_metric = registry.counter("usuarios_total", "Usuários finalizados por status", ("status",))
+        self.tokens_metric = registry.counter("tokens_total", "Tokens consumidos nas chamadas à IA")
+        registry.callback_counter("custo_usd_total", "Custo estimado das chamadas à IA (USD)", lambda: round(self.costs.total_cost, 6))
+        self.llm_calls_metric = registry.counter("chamadas_llm_total", "Chamadas à IA por resultado", ("resultado",))
+        
+        registry.gauge("usuarios_fila", "Usuários desta execução ainda não finalizados",
+                       lambda: self.progress["total"] - self.progress["finalizados"])
+        registry.gauge("usuarios_aguardando_despacho", "Usuários ainda não despachados para uma tarefa",
+                       lambda: self.progress["total"] - self.progress["despachados"])
+        registry.gauge("tarefas_em_voo", "Tarefas process_user em execução", lambda: self.concurrency.in_flight)
+        registry.gauge("limite_concorrencia", "Limite atual do controlador AIMD", lambda: self.concurrency.current_limit)
+        registry.gauge("usuarios_por_segundo", "Usuários finalizados por segundo (janela deslizante)", lambda: self.throughput.rate())
+        registry.gauge("eta_segundos", "Tempo estimado para finalizar a fila no ritmo atual", self.eta_seconds)
+        
+        registry.callback_counter("triagem_avaliadas_total", "Conversas avaliadas pela triagem", lambda: self.triage.evaluated)
+        registry.callback_counter("triagem_resolvidas_total", "Conversas resolvidas pela triagem sem IA", lambda: sum(self.triage.hits.values()))
+        registry.callback_counter("chamadas_llm_evitadas_total", "Chamadas à IA evitadas pela triagem", lambda: self.triage.calls_avoided)
+        registry.gauge("triagem_taxa_acerto", "Fração das conversas resolvidas pela triagem",
+                       lambda: sum(self.triage.hits.values()) / self.triage.evaluated if self.triage.evaluated else 0.0)
+        
+        stats = getattr(self.db, "connection_stats", None)
+        if stats is not None:
+            registry.callback_counter("banco_conexoes_abertas_total", "Conexões abertas pelo pool do banco", lambda: stats["abertas"])
+            registry.callback_counter("banco_conexoes_falhas_total", "Falhas ao obter conexão do banco", lambda: stats["falhas"])
+            registry.gauge("banco_conexoes_ativas", "Conexões do pool abertas no momento", lambda: stats["ativas"])
+            registry.gauge("banco_conexoes_em_uso", "Conexões do pool emprestadas no momento", lambda: stats["em_uso"])
+        
+        gateway = getattr(self.ai, "gateway", None)
+        if gateway is not None:
+            counters = gateway.counters
+            registry.callback_counter("llm_cache_acertos_total", "Chamadas à IA respondidas pelo cache do gateway", lambda: counters["cache"])
+            registry.callback_counter("llm_deduplicadas_total", "Chamadas à IA unificadas com uma idêntica em voo", lambda: counters["deduplicadas"])
+            registry.callback_counter("llm_retentativas_total", "Novas tentativas após erro transitório da IA", lambda: counters["retentativas"])
+            registry.callback_counter("llm_espera_rpm_total", "Chamadas à IA que esperaram o limite de RPM", lambda: counters["espera_rpm"])
+            registry.gauge("llm_taxa_cache", "Fração das chamadas à IA atendidas por cache ou deduplicação",
+                           lambda: gateway.stats()["taxa_cache"])
+        
+        registry.stage_histograms("etapa_duracao_segundos", "Duração de cada etapa do processamento", stage_timings)
+        return registry
+    
+    def _observe_llm_call(self, latency_ms: float, error: str = None):
+        self.llm_calls_metric.inc(error or "ok")
+    
+    def eta_seconds(self) -> float:
+        """Segundos restantes estimados pela taxa recente de usuários finalizados"""
+        remaining = self.progress["total"] - self.progress["finalizados"]
+        rate = self.throughput.rate()
+        if remaining <= 0:
+            return 0.0
+        return round(remaining / rate, 1) if rate > 0 else None
+    
+    async def save_result(self, user_id: str, result: Dict[str, Any], messages: List[Dict[str, Any]] = None):
+        """Busca o wa_id e grava o resultado da classificação (e a janela de mensagens analisada) no banco"""
+        with span("busca_wa_id"):
+            wa_id = await self.db.get_wa_id_by_customer_id(user_id)
+        especifica = original = result.get("classificacao_especifica", "")
+        if self.canonicalizer is not None:
+            with span("canonicalizacao"):
+                especifica = self.canonicalizer.canonicalize(original)
+        with span("gravacao"):
+            await self.db.save_classification(
+                user_id=user_id,
+                classification=result["classification"],
+                confidence=result["confidence"],
+                context=result["context"],
+                tokens_used=result["tokens_used"],
+                processing_time=result["processing_time"],
+                wa_id=wa_id,
+                classificacao_especifica=especifica,
+                sugestao_melhoria=result.get("sugestao_melhoria", ""),
+                tempos_etapas=result.get("tempos_etapas") if PERSIST_STAGE_TIMINGS else None,
+                llm_calls=result.get("llm_calls"),
+                execucao_id=self.run_id,
+                classificacao_especifica_original=original if self.canonicalizer is not None else None,
+                versao_canonicalizacao=self.canonicalizer.version if self.canonicalizer is not None else None,
+                messages=messages,
+                pontuacoes_tags=scores_for_result(result),
+                versao_taxonomia=TAXONOMY_VERSION,
+                substituir=self.reclassify,
+                modo_prompt=result.get("modo_prompt"),
+                tag_janela_completa=result.get("tag_janela_completa"),
+                resumo_conversa=summary_record(result, messages) if self.incremental else None
+            )
+        self.journal.record(user_id, "salvo")
     
     async def process_user(self, user_id: str) -> Dict[str, Any]:
         """Processa um usuário específico"""
         logger.info(f"Processando usuário: {user_id}")
+        self.journal.record(user_id, "iniciado")
         
         try:
             # Verificar se o usuário já foi classificado (verificação adicional de segurança)
-            conn = await self.db.get_connection()
-            count = await conn.fetchval(
-                "SELECT COUNT(*) FROM classificacoes WHERE user_id = $1",
-                user_id
-            )
-            await conn.close()
-            
-            if count > 0:
+            with span("verificacao"):
+                classified = False if self.reclassify else await self.db.is_user_classified(user_id)
+            if classified:
                 logger.info(f"Usuário {user_id} já foi classificado anteriormente, pulando...")
+                self.journal.record(user_id, "ja_classificado")
                 return {
                     "user_id": user_id,
                     "status": "ja_classificado",
@@ -50,33 +184,48 @@ class ConversationClassifier:
                 }
             
             # Obter mensagens do usuário
-            messages = await self.db.get_last_25_messages(user_id)
+            with span("busca_mensagens"):
+                messages = await self.db.get_last_25_messages(user_id)
             
             if not messages:
                 logger.warning(f"Usuário {user_id} não possui mensagens")
+                self.journal.record(user_id, "sem_mensagens")
+                if self.reclassify:
+                    await self.db.record_reclassification_attempt(user_id, "sem_mensagens")
                 return {
                     "user_id": user_id,
                     "status": "sem_mensagens",
                     "classification": "Sem dados para análise"
                 }
             
+            # Conversas triviais são rotuladas por regra, sem chamar a IA
+            with span("triagem"):
+                result = self.triage.evaluate(messages) if TRIAGE_ENABLED else None
+            
             # Classificar conversa
-            result = await self.ai.classify_conversation(messages)
+            if result is None:
+                summary, new_messages, chain = None, None, 0
+                if self.incremental:
+                    with span("resumo"):
+                        previous = await self.db.get_conversation_summary(user_id)
+                    mode, selected, reason = plan_prompt_window(previous, messages)
+                    self.prompt_windows[reason] += 1
+                    if mode == INCREMENTAL:
+                        summary, new_messages, chain = previous, selected, previous["atualizacoes"] + 1
+                result = await self.ai.classify_conversation(
+                    messages, summary=summary, new_messages=new_messages, want_summary=self.incremental,
+                    compare_full=summary is not None and random.random() < INCREMENTAL_AGREEMENT_SAMPLE_RATE
+                )
+                result["atualizacoes_resumo"] = chain
+                self.costs.add(result["classification"], result.get("llm_calls"))
+            
+            # Tempos das etapas até aqui seguem gravados junto da classificação
+            result["tempos_etapas"] = stage_timings.user_timings()
+            # A janela analisada vai junto no journal: a regravação após uma queda grava o snapshot e o resumo
+            self.journal.record(user_id, "classificado", {**result, "janela_mensagens": snapshot_items(messages)})
             
-            # Buscar wa_id do usuário
-            wa_id = await self.db.get_wa_id_by_customer_id(user_id)
             # Salvar no banco
-            await self.db.save_classification(
-                user_id=user_id,
-                classification=result["classification"],
-                confidence=result["confidence"],
-                context=result["context"],
-                tokens_used=result["tokens_used"],
-                processing_time=result["processing_time"],
-                wa_id=wa_id,
-                classificacao_especifica=result.get("classificacao_especifica", ""),
-                sugestao_melhoria=result.get("sugestao_melhoria", "")
-            )
+            await self.save_result(user_id, result, messages)
             
             logger.info(f"Usuário {user_id} classificado como: {result['classification']}")
             
@@ -84,64 +233,223 @@ class ConversationClassifier:
                 "user_id": user_id,
                 "status": "concluido",
                 "classification": result["classification"],
-                "confidence": result["confidence"]
+                "confidence": result["confidence"],
+                "tokens_used": result["tokens_used"]
             }
             
         except Exception as e:
             logger.error(f"Erro ao processar usuário {user_id}: {e}")
+            self.journal.record(user_id, "erro")
+            if self.reclassify:
+                try:
+                    await self.db.record_reclassification_attempt(user_id, "erro", RECLASSIFICATION_MAX_ATTEMPTS)
+                except Exception as queue_error:
+                    logger.error(f"Erro ao registrar tentativa de reclassificação do usuário {user_id}: {queue_error}")
             return {
                 "user_id": user_id,
                 "status": "erro",
                 "error": str(e)
             }
     
-    async def run(self):
-        """Executa o classificador"""
+    async def replay_unsaved_results(self) -> int:
+        """Grava no banco os resultados do journal que foram classificados mas não salvos"""
+        replayed = 0
+        for user_id, result in self.journal.unsaved_results():
+            try:
+                if not self.reclassify and await self.db.is_user_classified(user_id):
+                    # O INSERT chegou ao banco antes da queda, só faltou o registro no journal
+                    self.journal.record(user_id, "salvo")
+                    continue
+                # Journals antigos não têm a janela: busca as mensagens de novo para o snapshot/resumo
+                window = result.get("janela_mensagens")
+                messages = decode_snapshot(window) if window else await self.db.get_last_25_messages(user_id)
+                await self.save_result(user_id, result, messages)
+                replayed += 1
+            except Exception as e:
+                logger.error(f"❌ Erro ao regravar resultado do usuário {user_id}: {e}")
+        return replayed
+    
+    async def get_pending_users(self) -> List[str]:
+        """Retoma a lista do último checkpoint ou descobre os usuários no banco"""
+        if self.journal.load():
+            replayed = await self.replay_unsaved_results()
+            pending = self.journal.remaining_users()
+            logger.info(f"♻️ Retomando do checkpoint: {replayed} resultados regravados sem nova chamada à IA, {len(pending)} usuários pendentes")
+            return pending
+        
+        with span("descoberta"):
+            if self.active:
+                unclassified_users = await self.db.get_active_users()
+            elif self.reclassify:
+                unclassified_users = await self.db.get_reclassification_queue()
+            elif PRIORITY_SCHEDULING:
+                unclassified_users = await self.scheduler.get_prioritized_users()
+            else:
+                unclassified_users = await self.db.get_unclassified_users()
+        self.journal.start(unclassified_users)
+        return unclassified_users
+    
+    def finish_journal(self):
+        """Remove o journal só sem resultados pagos pendentes de gravação; senão compacta e mantém"""
+        if self.journal.unsaved:
+            self.journal.compact()
+            logger.warning(f"⚠️ {len(self.journal.unsaved)} resultados classificados ainda não gravados: "
+                           f"journal mantido em {self.journal.path} para regravar no próximo start")
+        else:
+            self.journal.finish()
+    
+    async def _process_with_limit(self, user_id: str) -> Dict[str, Any]:
+        """Processa um usuário e libera a vaga no controlador de concorrência"""
+        try:
+            with stage_timings.track_user(), span("usuario_total"):
+                return await self.process_user(user_id)
+        finally:
+            self.concurrency.release()
+    
+    def budget_exhausted(self, started: float, tokens_used: int, time_budget: float = None,
+                         token_budget: int = None, tokens_in_flight: float = 0) -> str:
+        """Retorna o motivo se algum orçamento da execução acabou, senão string vazia"""
+        if time_budget is not None and time.monotonic() - started >= time_budget:
+            return f"tempo ({time_budget:g}s)"
+        # As tarefas em voo ainda vão consumir tokens: conta a estimativa delas junto com o consumo já medido
+        if token_budget is not None and tokens_used + tokens_in_flight >= token_budget:
+            return f"tokens ({token_budget})"
+        return ""
+    
+    async def run(self, time_budget: float = None, token_budget: int = None):
+        """Executa o classificador (opcionalmente limitado por orçamento de tempo/tokens)"""
         logger.info("🚀 Iniciando classificador de conversas")
+        started = time.monotonic()
+        metrics_server = None
         
         try:
-            # Obter usuários não classificados
-            unclassified_users = await self.db.get_unclassified_users()
+            if METRICS_ENABLED and self.metrics_port:
+                try:
+                    metrics_server = MetricsServer(self.metrics, METRICS_HOST, self.metrics_port)
+                    logger.info(f"📡 Métricas em {metrics_server.start()}")
+                except OSError as e:
+                    metrics_server = None
+                    logger.warning(f"⚠️ Endpoint de métricas não iniciado: {e}")
+            
+            try:
+                await self.db.ensure_schema()
+            except Exception as e:
+                # Sem as colunas e tabelas novas cada gravação falharia: encerra antes de chamar a IA
+                logger.error(f"❌ Não foi possível atualizar o schema da classificacoes, execução abortada: {e}")
+                raise SystemExit(1)
+            
+            # Obter usuários não classificados (ou retomar do journal)
+            unclassified_users = await self.get_pending_users()
             logger.info(f"📊 Encontrados {len(unclassified_users)} usuários para classificar")
             
             if not unclassified_users:
                 logger.info("✅ Todos os usuários já foram classificados!")
+                self.finish_journal()
                 return
             
-            # Processar usuários em lotes
-            processed_count = 0
-            skipped_count = 0
-            for i, user_id in enumerate(unclassified_users):
-                try:
-                    result = await self.process_user(user_id)
-                    
+            # Processar usuários com concorrência ajustada pelo controlador AIMD
+            total = len(unclassified_users)
+            self.progress.update(total=total, despachados=0, finalizados=0)
+            self.throughput = ThroughputTracker(METRICS_THROUGHPUT_WINDOW)
+            counts = {"finished": 0, "processed": 0, "skipped": 0, "tokens": 0}
+            tasks = set()
+            
+            def on_done(task: asyncio.Task):
+                tasks.discard(task)
+                counts["finished"] += 1
+                self.progress["finalizados"] += 1
+                self.throughput.mark()
+                if task.cancelled() or task.exception() is not None:
+                    self.users_metric.inc("erro")
+                    logger.error(f"❌ Erro ao processar usuário: {task.exception() if not task.cancelled() else 'cancelado'}")
+                else:
+                    result = task.result()
+                    self.users_metric.inc(result["status"])
+                    self.tokens_metric.inc(amount=result.get("tokens_used", 0))
                     # Contar apenas usuários realmente processados
                     if result["status"] == "concluido":
-                        processed_count += 1
+                        counts["processed"] += 1
+                        counts["tokens"] += result.get("tokens_used", 0)
                     elif result["status"] == "ja_classificado":
-                        skipped_count += 1
-                    
-                    # Log de progresso
-                    if (i + 1) % BATCH_SIZE == 0:
-                        logger.info(f"📈 Processados {i + 1}/{len(unclassified_users)} usuários (novos: {processed_count}, pulados: {skipped_count})")
-                    
-                    # Delay para evitar rate limiting
-                    if i < len(unclassified_users) - 1:  # Não delay no último
-                        await asyncio.sleep(DELAY_BETWEEN_REQUESTS)
-                    
-                except Exception as e:
-                    logger.error(f"❌ Erro ao processar usuário {user_id}: {e}")
-                    continue
+                        counts["skipped"] += 1
+                
+                # Log de progresso
+                if counts["finished"] % BATCH_SIZE == 0:
+                    logger.info(f"📈 Processados {counts['finished']}/{total} usuários (novos: {counts['processed']}, pulados: {counts['skipped']}, concorrência: {self.concurrency.current_limit})")
+            
+            left = []
+            for index, user_id in enumerate(unclassified_users):
+                await self.concurrency.acquire()
+                # Estimativa das tarefas em voo: média de tokens por usuário finalizado até aqui
+                in_flight_tokens = counts["tokens"] / counts["finished"] * len(tasks) if counts["finished"] else 0
+                reason = self.budget_exhausted(started, counts["tokens"], time_budget, token_budget, in_flight_tokens)
+                if reason:
+                    self.concurrency.release()
+                    left = unclassified_users[index:]
+                    break
+                task = asyncio.create_task(self._process_with_limit(user_id))
+                self.progress["despachados"] += 1
+                tasks.add(task)
+                task.add_done_callback(on_done)
             
-            logger.info(f"🎉 Processamento concluído! {processed_count} usuários processados, {skipped_count} usuários pulados (já classificados)")
+            if tasks:
+                await asyncio.wait(tasks)
+            
+            if left:
+                # Os restantes continuam no journal e são retomados na próxima execução
+                logger.info(f"⏳ Orçamento de {reason} esgotado: {len(left)} usuários não processados (próximos: {', '.join(left[:10])})")
+            else:
+                # Execução completa: o próximo start volta a descobrir usuários no banco
+                self.finish_journal()
+            logger.info(f"🪙 Tokens consumidos: {counts['tokens']}")
+            for line in self.costs.summary_lines():
+                logger.info(f"💰 Custo ({self.run_id}): {line}")
+            logger.info(f"🧹 Triagem: {self.triage.summary()}")
+            if self.canonicalizer is not None:
+                logger.info(f"🔖 Canonicalização (v{self.canonicalizer.version}): {dict(self.canonicalizer.stats)}")
+            if self.incremental:
+                logger.info(f"🧾 Janela do prompt: {dict(self.prompt_windows)}")
+            logger.info(f"🎛️ Controle de concorrência: {self.concurrency.snapshot()}")
+            for stage, stats in stage_timings.summary().items():
+                logger.info(f"⏱️ {stage}: n={stats['n']} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms max={stats['max_ms']}ms")
+            logger.info(f"🎉 Processamento concluído! {counts['processed']} usuários processados, {counts['skipped']} usuários pulados (já classificados)")
             
         except Exception as e:
             logger.error(f"❌ Erro geral no processamento: {e}")
+        finally:
+            self.journal.close()
+            gateway = getattr(self.ai, "gateway", None)
+            if gateway is not None:
+                await gateway.aclose()
+            if hasattr(self.db, "close"):
+                await self.db.close()
+            if metrics_server is not None:
+                metrics_server.stop()
 
-async def main():
+async def main(time_budget: float = None, token_budget: int = None, metrics_port: int = None,
+               reclassify: bool = False, incremental: bool = False, active: bool = False):
     """Função principal"""
-    classifier = ConversationClassifier()
-    await classifier.run()
+    classifier = ConversationClassifier(metrics_port=metrics_port, reclassify=reclassify,
+                                        incremental=incremental, active=active)
+    await classifier.run(time_budget=time_budget, token_budget=token_budget)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Classificador de conversas")
+    parser.add_argument("--time-budget", type=float, help="Tempo máximo da execução em segundos")
+    parser.add_argument("--token-budget", type=int, help="Máximo de tokens consumidos na execução")
+    parser.add_argument("--metrics-port", type=int, help=f"Porta do endpoint /metrics (padrão {METRICS_PORT}, 0 desativa)")
+    parser.add_argument("--reclassificar", action="store_true",
+                        help="Processa a fila_reclassificacao (montada pelo taxonomia.py) em vez dos usuários novos")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Guarda o resumo da conversa e, havendo resumo, envia só as mensagens novas")
+    parser.add_argument("--ativos", action="store_true",
+                        help="Reclassifica usuários com mensagens novas desde a última classificação (prompt incremental)")
+    return parser.parse_args()
+
+def cli():
+    args = parse_args()
+    asyncio.run(main(time_budget=args.time_budget, token_budget=args.token_budget, metrics_port=args.metrics_port,
+                     reclassify=args.reclassificar, incremental=args.incremental, active=args.ativos))
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    cli() 
\ No newline at end of file
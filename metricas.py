@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Métricas do classificador em memória, expostas por HTTP no formato texto do Prometheus
+(consultar o progresso não custa nenhuma query no banco de produção)
+"""
+
+import re
+import time
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple, Callable, Optional
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: Dict[str, str] = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Valor que só cresce (por combinação de labels)"""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self.values.get(label_values, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self.values.items())
+        if not items and not self.label_names:
+            items = [((), 0)]
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}" for labels, value in items]
+
+
+class Gauge(Metric):
+    """Valor instantâneo; com `function` é calculado na hora da leitura"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, function: Callable[[], Optional[float]] = None):
+        super().__init__(name, help_text)
+        self.function = function
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self) -> List[str]:
+        value = self.function() if self.function is not None else self.value
+        if value is None:
+            return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class CallbackCounter(Gauge):
+    """Contador mantido por outro componente (ex.: acertos da triagem), lido na hora da coleta"""
+    kind = "counter"
+
+
+class StageHistogramCollector(Metric):
+    """Exporta os histogramas do instrumentacao.StageInstrumentation (ms) como histograma em segundos"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, instrumentation, stages: Callable[[str], bool] = None):
+        super().__init__(name, help_text, ("etapa",))
+        self.instrumentation = instrumentation
+        self.stages = stages or (lambda stage: True)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for stage, histogram in list(self.instrumentation.histograms.items()):
+            if not self.stages(stage):
+                continue
+            cumulative = 0
+            for bound_ms, count in zip(histogram.buckets_ms, histogram.counts):
+                cumulative += count
+                labels = _format_labels(("etapa",), (stage,), {"le": _format_value(bound_ms / 1000)})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(("etapa",), (stage,), {"le": "+Inf"})
+            lines.append(f"{self.name}_bucket{labels} {histogram.count}")
+            labels = _format_labels(("etapa",), (stage,))
+            lines.append(f"{self.name}_sum{labels} {_format_value(histogram.total_ms / 1000)}")
+            lines.append(f"{self.name}_count{labels} {histogram.count}")
+        return lines
+
+
+class ThroughputTracker:
+    """Taxa de conclusões por segundo em uma janela deslizante, usada no cálculo do ETA"""
+
+    def __init__(self, window_seconds: float = 120.0):
+        self.window_seconds = window_seconds
+        self.events = deque()
+        self.started = time.monotonic()
+
+    def mark(self):
+        now = time.monotonic()
+        self.events.append(now)
+        while self.events and now - self.events[0] > self.window_seconds:
+            self.events.popleft()
+
+    def rate(self) -> float:
+        now = time.monotonic()
+        while self.events and now - self.events[0] > self.window_seconds:
+            self.events.popleft()
+        span = min(self.window_seconds, now - self.started)
+        return len(self.events) / span if span > 0 else 0.0
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "classificador"):
+        self.prefix = prefix
+        self.metrics: List[Metric] = []
+
+    def _name(self, name: str) -> str:
+        return f"{self.prefix}_{name}" if self.prefix else name
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(self._name(name), help_text, labels))
+
+    def gauge(self, name: str, help_text: str, function: Callable[[], Optional[float]] = None) -> Gauge:
+        return self.register(Gauge(self._name(name), help_text, function))
+
+    def callback_counter(self, name: str, help_text: str, function: Callable[[], Optional[float]]) -> CallbackCounter:
+        return self.register(CallbackCounter(self._name(name), help_text, function))
+
+    def stage_histograms(self, name: str, help_text: str, instrumentation, stages=None) -> StageHistogramCollector:
+        return self.register(StageHistogramCollector(self._name(name), help_text, instrumentation, stages))
+
+    def render(self) -> str:
+        """Texto no formato de exposição do Prometheus (version=0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Falha ao coletar métrica {metric.name}: {e}")
+                continue
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Servidor HTTP em thread de fundo com GET /metrics"""
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._httpd = None
+        self._thread = None
+
+    def _make_handler(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                data = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def start(self) -> str:
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+_SAMPLE_LINE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)$")
+
+
+def parse_exposition(text: str) -> Dict[str, float]:
+    """Lê o texto de /metrics em {"nome{labels}": valor} (usado pelo monitor_progresso.py)"""
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE_LINE.match(line.strip())
+        if match:
+            values[match.group(1) + (match.group(2) or "")] = float(match.group(3))
+    return values
+
+
+def fetch_metrics(url: str, timeout: float = 2.0) -> Dict[str, float]:
+    """Busca e interpreta o endpoint de métricas de um classificador em execução"""
+    from urllib.request import urlopen
+    with urlopen(url, timeout=timeout) as response:
+        return parse_exposition(response.read().decode("utf-8"))
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Migração de índices do schema atual (chat_history, classificacoes) com CREATE INDEX CONCURRENTLY
+e verificação dos planos das consultas do caminho quente do database.py com EXPLAIN (ANALYZE, BUFFERS)
+
+Uso:
+    python migrar_schema.py                        # aplica a migração e verifica os planos
+    python migrar_schema.py --apenas-verificar     # só roda os EXPLAIN
+    python migrar_schema.py --remover-duplicadas   # mantém só a classificação mais recente de cada user_id
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from typing import Dict, Any, List, Tuple
+from database import (
+    DatabaseManager, IS_CLASSIFIED_QUERY, LAST_MESSAGES_QUERY, WA_ID_QUERY, PRIORITY_SIGNALS_QUERY
+)
+from config import (
+    CHAT_HISTORY_USER_ID_COLUMN, CHAT_HISTORY_TIMESTAMP_COLUMN, PRIORITY_PAYMENT_KEYWORDS
+)
+
+# Índices criados sem bloquear escrita; as definições seguem as consultas do database.py
+INDEXES = [
+    {
+        # Filtro geral por cliente + tipo, mais recentes primeiro
+        "nome": "idx_chat_history_cliente_tipo_data",
+        "definicao": f"ON chat_history ({CHAT_HISTORY_USER_ID_COLUMN}, message_type, {CHAT_HISTORY_TIMESTAMP_COLUMN} DESC)",
+    },
+    {
+        # Parcial com só as mensagens lidas pelo classificador: LIMIT 25 sai direto do índice, sem ordenação
+        "nome": "idx_chat_history_cliente_data_usr_air",
+        "definicao": f"ON chat_history ({CHAT_HISTORY_USER_ID_COLUMN}, {CHAT_HISTORY_TIMESTAMP_COLUMN} DESC) "
+                     f"WHERE message_type IN ('USR', 'AIR')",
+    },
+    {
+        "nome": "idx_classificacoes_data",
+        "definicao": "ON classificacoes (data_classificacao)",
+    },
+    {
+        # Contagem por versão da taxonomia e tag (taxonomia.py --diff e montagem da fila de reclassificação)
+        "nome": "idx_classificacoes_versao_taxonomia",
+        "definicao": "ON classificacoes (versao_taxonomia, classificacao)",
+    },
+]
+
+UNIQUE_USER_CONSTRAINT = "classificacoes_user_id_key"
+
+# Tabelas em que um Seq Scan numa consulta do caminho quente indica índice faltando
+WATCHED_TABLES = {"chat_history", "classificacoes", "customers"}
+
+INDEX_STATE_QUERY = """
+    SELECT i.indisvalid
+    FROM pg_class c
+    JOIN pg_index i ON i.indexrelid = c.oid
+    WHERE c.relname = $1
+"""
+
+
+async def create_index(conn, name: str, definition: str, unique: bool = False) -> str:
+    """Cria o índice com CONCURRENTLY; um índice inválido de uma tentativa anterior é removido antes"""
+    valid = await conn.fetchval(INDEX_STATE_QUERY, name)
+    if valid:
+        return "existente"
+    if valid is False:
+        print(f"   ⚠️ {name} ficou inválido numa execução anterior, recriando")
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+    started = time.perf_counter()
+    await conn.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY {name} {definition}")
+    return f"criado em {time.perf_counter() - started:.1f}s"
+
+
+async def duplicated_users(conn, sample: int = 10) -> Tuple[int, List[Dict[str, Any]]]:
+    total = await conn.fetchval("""
+        SELECT COUNT(*) FROM (
+            SELECT user_id FROM classificacoes GROUP BY user_id HAVING COUNT(*) > 1
+        ) d
+    """)
+    rows = await conn.fetch("""
+        SELECT user_id, COUNT(*) AS quantidade
+        FROM classificacoes
+        GROUP BY user_id
+        HAVING COUNT(*) > 1
+        ORDER BY quantidade DESC
+        LIMIT $1
+    """, sample)
+    return total, [dict(row) for row in rows]
+
+
+async def remove_duplicates(db: DatabaseManager) -> int:
+    """Apaga as classificações antigas de usuários repetidos (ledger e snapshot saem em cascata)"""
+    conn = await db.get_connection()
+    try:
+        status = await conn.execute("""
+            DELETE FROM classificacoes c
+            USING classificacoes newer
+            WHERE newer.user_id = c.user_id
+              AND newer.id > c.id
+        """)
+    finally:
+        await conn.close()
+    removed = int(status.split()[-1])
+    if removed:
+        rows = await db.rebuild_daily_summary()
+        print(f"   📊 Resumo diário recalculado: {rows} linhas")
+    return removed
+
+
+async def ensure_unique_user(db: DatabaseManager, remove: bool = False) -> bool:
+    """Chave única em classificacoes.user_id (índice concorrente promovido a constraint)"""
+    conn = await db.get_connection()
+    try:
+        exists = await conn.fetchval("SELECT 1 FROM pg_constraint WHERE conname = $1", UNIQUE_USER_CONSTRAINT)
+        if exists:
+            print(f"   ✅ {UNIQUE_USER_CONSTRAINT}: existente")
+            return True
+
+        total, sample = await duplicated_users(conn)
+        if total and not remove:
+            print(f"   ❌ {total} user_id com mais de uma classificação; chave única não criada")
+            for row in sample:
+                print(f"      - {row['user_id']}: {row['quantidade']} classificações")
+            print("      Rode com --remover-duplicadas para manter só a mais recente de cada usuário")
+            return False
+    finally:
+        await conn.close()
+
+    if total:
+        removed = await remove_duplicates(db)
+        print(f"   🧹 {removed} classificações duplicadas removidas")
+
+    conn = await db.get_connection()
+    try:
+        state = await create_index(conn, UNIQUE_USER_CONSTRAINT, "ON classificacoes (user_id)", unique=True)
+        await conn.execute(
+            f"ALTER TABLE classificacoes ADD CONSTRAINT {UNIQUE_USER_CONSTRAINT} UNIQUE USING INDEX {UNIQUE_USER_CONSTRAINT}"
+        )
+    finally:
+        await conn.close()
+    print(f"   ✅ {UNIQUE_USER_CONSTRAINT}: {state}")
+    return True
+
+
+async def migrate(db: DatabaseManager, remove_duplicated: bool = False) -> bool:
+    print("🔧 Aplicando migrações do schema...")
+    await db.ensure_schema()
+
+    conn = await db.get_connection()
+    try:
+        for index in INDEXES:
+            state = await create_index(conn, index["nome"], index["definicao"])
+            print(f"   ✅ {index['nome']}: {state}")
+        # Estatísticas atualizadas para o planner considerar os índices novos
+        await conn.execute("ANALYZE chat_history")
+        await conn.execute("ANALYZE classificacoes")
+    finally:
+        await conn.close()
+
+    return await ensure_unique_user(db, remove_duplicated)
+
+
+# ----------------------------------------------------------------------------
+# Verificação dos planos
+# ----------------------------------------------------------------------------
+
+def plan_nodes(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+    nodes = [node]
+    for child in node.get("Plans", []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+
+def describe_node(node: Dict[str, Any]) -> str:
+    text = node["Node Type"]
+    if node.get("Index Name"):
+        text += f" usando {node['Index Name']}"
+    if node.get("Relation Name"):
+        text += f" em {node['Relation Name']}"
+    return text
+
+
+async def sample_params(conn) -> Dict[str, Any]:
+    """Valores reais do banco para executar as consultas do caminho quente"""
+    customer_id = await conn.fetchval(f"SELECT {CHAT_HISTORY_USER_ID_COLUMN} FROM chat_history LIMIT 1")
+    classified = await conn.fetchval("SELECT user_id FROM classificacoes ORDER BY id DESC LIMIT 1")
+    customers = [row["id"] for row in await conn.fetch("SELECT id FROM customers LIMIT 1000")]
+    return {
+        "customer_id": customer_id,
+        "classified_user": classified or str(customer_id),
+        "customer_ids": customers or [customer_id],
+    }
+
+
+def hot_queries(params: Dict[str, Any]) -> List[Tuple[str, str, Tuple]]:
+    """(etapa, SQL, parâmetros) de cada consulta do caminho quente do database.py"""
+    patterns = [f"%{keyword}%" for keyword in PRIORITY_PAYMENT_KEYWORDS]
+    return [
+        ("verificacao", IS_CLASSIFIED_QUERY, (params["classified_user"],)),
+        ("busca_mensagens", LAST_MESSAGES_QUERY, (params["customer_id"],)),
+        ("busca_wa_id", WA_ID_QUERY, (params["customer_id"],)),
+        ("priorizacao", PRIORITY_SIGNALS_QUERY, (params["customer_ids"], patterns)),
+    ]
+
+
+async def explain(conn, query: str, args: Tuple, repetitions: int) -> Dict[str, Any]:
+    """EXPLAIN (ANALYZE, BUFFERS); o tempo reportado é a mediana das repetições"""
+    plans = []
+    for _ in range(repetitions):
+        raw = await conn.fetchval(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", *args)
+        plans.append((json.loads(raw) if isinstance(raw, str) else raw)[0])
+
+    last = plans[-1]
+    root = last["Plan"]
+    nodes = plan_nodes(root)
+    seq_scans = sorted({node["Relation Name"] for node in nodes
+                        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in WATCHED_TABLES})
+    return {
+        "planejamento_ms": round(statistics.median(plan["Planning Time"] for plan in plans), 3),
+        "execucao_ms": round(statistics.median(plan["Execution Time"] for plan in plans), 3),
+        "buffers_hit": root.get("Shared Hit Blocks", 0),
+        "buffers_read": root.get("Shared Read Blocks", 0),
+        "nos": [describe_node(node) for node in nodes if node.get("Relation Name")],
+        "seq_scans": seq_scans,
+    }
+
+
+async def verify_plans(db: DatabaseManager, repetitions: int = 3) -> bool:
+    conn = await db.get_connection()
+    try:
+        params = await sample_params(conn)
+        if params["customer_id"] is None:
+            print("❌ chat_history vazia, nada para verificar")
+            return False
+
+        print(f"\n🔍 PLANOS DAS CONSULTAS DO CAMINHO QUENTE (mediana de {repetitions} execuções)")
+        print("=" * 90)
+        ok = True
+        for stage, query, args in hot_queries(params):
+            try:
+                result = await explain(conn, query, args, repetitions)
+            except Exception as e:
+                print(f"❌ {stage}: erro no EXPLAIN: {e}")
+                ok = False
+                continue
+
+            status = "⚠️" if result["seq_scans"] else "✅"
+            print(f"{status} {stage}: execução {result['execucao_ms']}ms, planejamento {result['planejamento_ms']}ms, "
+                  f"buffers {result['buffers_hit']} hit / {result['buffers_read']} read")
+            for node in result["nos"]:
+                print(f"      {node}")
+            if result["seq_scans"]:
+                ok = False
+                print(f"      Seq Scan em {', '.join(result['seq_scans'])}: índice ausente ou não usado")
+    finally:
+        await conn.close()
+    return ok
+
+
+async def main_async(args) -> int:
+    db = DatabaseManager()
+    try:
+        ok = True
+        if not args.apenas_verificar:
+            ok = await migrate(db, args.remover_duplicadas)
+        plans_ok = await verify_plans(db, args.repeticoes)
+        print("\n" + ("✅ Schema e planos OK" if ok and plans_ok else "⚠️ Há pendências acima"))
+        return 0 if ok and plans_ok else 1
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migração de índices e verificação de planos das consultas")
+    parser.add_argument("--apenas-verificar", action="store_true", help="Não altera o schema, só roda os EXPLAIN")
+    parser.add_argument("--remover-duplicadas", action="store_true",
+                        help="Antes da chave única, apaga as classificações antigas de user_id repetidos")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções de cada EXPLAIN ANALYZE")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,62 @@
 #!/usr/bin/env python3
 """
 Script para verificar progresso das classificações
+(lê o endpoint /metrics do classificador em execução; sem ele, consulta o banco)
 """
 
 import asyncio
-from database import DatabaseManager
+from metricas import fetch_metrics
+from config import METRICS_HOST, METRICS_PORT
+
+def check_progress_from_metrics() -> bool:
+    """Mostra o progresso a partir do endpoint de métricas; False se não houver execução ativa"""
+    url = f"http://{METRICS_HOST}:{METRICS_PORT}/metrics"
+    try:
+        metrics = fetch_metrics(url)
+    except Exception:
+        return False
+    
+    def value(name: str) -> float:
+        return metrics.get(f"classificador_{name}", 0)
+    
+    statuses = {key.split('status="')[1].rstrip('"}'): count for key, count in metrics.items() if key.startswith("classificador_usuarios_total{")}
+    finished = sum(statuses.values())
+    queue = value("usuarios_fila")
+    total = finished + queue
+    progress = (finished / total) * 100 if total > 0 else 0
+    eta = metrics.get("classificador_eta_segundos")
+    
+    print(f"📊 PROGRESSO DO CLASSIFICADOR (execução ativa em {url})")
+    print(f"Usuários nesta execução: {total:.0f}")
+    print(f"Finalizados: {finished:.0f} ({', '.join(f'{status}: {count:.0f}' for status, count in statuses.items()) or 'nenhum'})")
+    print(f"Progresso: {progress:.1f}%")
+    print(f"Na fila: {queue:.0f} | Em voo: {value('tarefas_em_voo'):.0f} (limite {value('limite_concorrencia'):.0f})")
+    print(f"Ritmo: {value('usuarios_por_segundo'):.2f} usuários/s | ETA: {f'{eta / 60:.1f} min' if eta is not None else 'indefinido'}")
+    print(f"Tokens consumidos: {value('tokens_total'):.0f} | Chamadas evitadas pela triagem: {value('chamadas_llm_evitadas_total'):.0f}")
+    return True
 
 async def check_progress():
-    db = DatabaseManager()
+    if check_progress_from_metrics():
+        return
     
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        await print_database_progress(db)
+    finally:
+        await db.close()
+
+async def print_database_progress(db):
     # Total de clientes no CSV
     customers = await db.get_customers_from_csv()
     total_customers = len(customers)
     
     # Total de classificações
     conn = await db.get_connection()
-    total_classifications = await conn.fetchval("SELECT COUNT(*) FROM classificacoes")
-    await conn.close()
+    try:
+        total_classifications = await conn.fetchval("SELECT COUNT(*) FROM classificacoes")
+    finally:
+        await conn.close()
     
     # Progresso
     progress = (total_classifications / total_customers) * 100 if total_customers > 0 else 0
@@ -35,13 +75,15 @@ async def check_progress():
     # Mostrar últimas classificações
     if total_classifications > 0:
         conn = await db.get_connection()
-        ultimas = await conn.fetch("""
-            SELECT user_id, classificacao, data_classificacao
-            FROM classificacoes
-            ORDER BY data_classificacao DESC
-            LIMIT 5
-        """)
-        await conn.close()
+        try:
+            ultimas = await conn.fetch("""
+                SELECT user_id, classificacao, data_classificacao
+                FROM classificacoes
+                ORDER BY data_classificacao DESC
+                LIMIT 5
+            """)
+        finally:
+            await conn.close()
         
         print(f"\n📋 Últimas 5 classificações:")
         for row in ultimas:
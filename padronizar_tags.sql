@@ -1,6 +1,9 @@
 -- =====================================================
 -- PADRONIZAÇÃO DE TAGS - VERSÃO ESSENCIAL
 -- =====================================================
+-- Obsoleto: as novas classificações já são gravadas na forma canônica
+-- (canonicalizacao.py + config/canonicalizacao.yaml). Para aplicar novos
+-- mapeamentos às linhas antigas use: python canonicalizacao.py --backfill
 
 -- ATUALIZAÇÃO 1: Padronizar tags de problemas financeiros
 UPDATE classificacoes 
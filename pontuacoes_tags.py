@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Vetor de pontuação por tag de cada conversa (float32, índice fixo = posição em CLASSIFICATION_TAGS)
+e consultas de top-k e de usuários com uma tag acima de um limiar (tabela classificacoes_tags)
+
+Uso:
+    python pontuacoes_tags.py --usuario 12345 --top 3
+    python pontuacoes_tags.py --tag "Dúvidas sobre preço/valor" --minimo 0.3
+    python pontuacoes_tags.py --tag "Dúvidas sobre preço/valor" --minimo 0.3 --secundaria
+"""
+
+import asyncio
+import argparse
+import numpy as np
+from typing import Dict, Any, List, Tuple, Optional
+from config import CLASSIFICATION_TAGS
+
+# Novas tags devem ser acrescentadas no fim da lista: o índice é gravado nos vetores
+TAG_INDEX = {tag: index for index, tag in enumerate(CLASSIFICATION_TAGS)}
+SCORE_DTYPE = np.dtype("<f4")
+
+# Mesma normalização da confiança do classify_by_keywords
+HITS_FOR_MAX_SCORE = 3.0
+MAX_KEYWORD_SCORE = 0.9
+
+
+def empty_scores() -> np.ndarray:
+    return np.zeros(len(CLASSIFICATION_TAGS), dtype=SCORE_DTYPE)
+
+
+def keyword_scores(tag_hits: Dict[str, int]) -> np.ndarray:
+    """Vetor a partir das palavras-chave encontradas por tag"""
+    scores = empty_scores()
+    for tag, hits in tag_hits.items():
+        if tag in TAG_INDEX:
+            scores[TAG_INDEX[tag]] = min(hits / HITS_FOR_MAX_SCORE, MAX_KEYWORD_SCORE)
+    return scores
+
+
+def merge_tag(scores: np.ndarray, tag: str, confidence: float) -> np.ndarray:
+    """Inclui a tag escolhida (IA ou triagem) com a sua confiança, sem reduzir o que já havia"""
+    index = TAG_INDEX.get(tag)
+    if index is not None:
+        scores[index] = max(scores[index], float(confidence or 0))
+    return scores
+
+
+def scores_for_result(result: Dict[str, Any]) -> Optional[np.ndarray]:
+    """Vetor do resultado; resultados sem vetor (triagem, journal antigo) viram a tag principal isolada"""
+    if result.get("pontuacoes_tags") is not None:
+        return np.asarray(result["pontuacoes_tags"], dtype=SCORE_DTYPE)
+    if result.get("classification") not in TAG_INDEX:
+        return None
+    return merge_tag(empty_scores(), result["classification"], result.get("confidence"))
+
+
+def pack_scores(scores: np.ndarray) -> bytes:
+    return np.asarray(scores, dtype=SCORE_DTYPE).tobytes()
+
+
+def unpack_scores(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype=SCORE_DTYPE)
+
+
+def sparse_entries(scores: np.ndarray) -> Tuple[List[int], List[float]]:
+    """Índices e valores das tags com pontuação, para a tabela classificacoes_tags"""
+    indexes = np.flatnonzero(scores)
+    return indexes.tolist(), scores[indexes].astype(float).tolist()
+
+
+def top_k(scores: np.ndarray, k: int = 3) -> List[Tuple[str, float]]:
+    order = np.argsort(-scores, kind="stable")[:k]
+    return [(CLASSIFICATION_TAGS[index], float(scores[index])) for index in order if scores[index] > 0]
+
+
+# ----------------------------------------------------------------------------
+# Consultas
+# ----------------------------------------------------------------------------
+
+TOP_TAGS_QUERY = """
+    SELECT t.tag, ct.pontuacao
+    FROM classificacoes_tags ct
+    JOIN tags_indice t ON t.tag_idx = ct.tag_idx
+    WHERE ct.classificacao_id = (
+        SELECT id FROM classificacoes WHERE user_id = $1 ORDER BY id DESC LIMIT 1
+    )
+    ORDER BY ct.pontuacao DESC
+    LIMIT $2
+"""
+
+USERS_ABOVE_QUERY = """
+    SELECT c.user_id, ct.pontuacao, c.classificacao
+    FROM classificacoes_tags ct
+    JOIN classificacoes c ON c.id = ct.classificacao_id
+    WHERE ct.tag_idx = $1
+      AND ct.pontuacao >= $2
+      AND (NOT $3::boolean OR c.classificacao <> $4)
+    ORDER BY ct.pontuacao DESC
+    LIMIT $5
+"""
+
+
+async def print_top_tags(user_id: str, k: int):
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        conn = await db.get_connection()
+        try:
+            rows = await conn.fetch(TOP_TAGS_QUERY, user_id, k)
+        finally:
+            await conn.close()
+
+        if not rows:
+            print(f"❌ Nenhuma pontuação gravada para o usuário {user_id}")
+            return
+        print(f"🏷️ Top {k} tags do usuário {user_id}:")
+        for row in rows:
+            print(f"  {row['tag']}: {row['pontuacao']:.2f}")
+    finally:
+        await db.close()
+
+
+async def print_users_above(tag: str, minimum: float, secondary: bool, limit: int):
+    if tag not in TAG_INDEX:
+        print(f"❌ Tag desconhecida: {tag}")
+        return
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        conn = await db.get_connection()
+        try:
+            rows = await conn.fetch(USERS_ABOVE_QUERY, TAG_INDEX[tag], minimum, secondary, tag, limit)
+        finally:
+            await conn.close()
+
+        scope = "como intenção secundária" if secondary else "no total"
+        print(f"👥 {len(rows)} usuários com '{tag}' >= {minimum} {scope}:")
+        for row in rows:
+            print(f"  {row['user_id']}: {row['pontuacao']:.2f} (principal: {row['classificacao']})")
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas sobre as pontuações por tag das conversas")
+    parser.add_argument("--usuario", help="Mostra as tags de maior pontuação do usuário")
+    parser.add_argument("--top", type=int, default=3)
+    parser.add_argument("--tag", help="Lista os usuários com esta tag acima de --minimo")
+    parser.add_argument("--minimo", type=float, default=0.3)
+    parser.add_argument("--secundaria", action="store_true", help="Só usuários em que a tag não é a principal")
+    parser.add_argument("--limite", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.usuario:
+        asyncio.run(print_top_tags(args.usuario, args.top))
+    elif args.tag:
+        asyncio.run(print_users_above(args.tag, args.minimo, args.secundaria, args.limite))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
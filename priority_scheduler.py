@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Ordenação dos usuários pendentes por prioridade (recência, volume, pagamento)
+"""
+
+import math
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Callable
+from config import (
+    PRIORITY_WEIGHTS, PRIORITY_RECENCY_HALF_LIFE_DAYS, PRIORITY_VOLUME_SATURATION,
+    PRIORITY_PAYMENT_KEYWORDS, PRIORITY_CHUNK_SIZE
+)
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def score_recency(signals: Dict[str, Any], now: datetime) -> float:
+    """1.0 para mensagem USR agora, caindo pela metade a cada meia-vida"""
+    last = signals.get("ultima_msg_usr")
+    if last is None:
+        return 0.0
+    days = max(0.0, (now - _as_utc(last)).total_seconds() / 86400)
+    return 0.5 ** (days / PRIORITY_RECENCY_HALF_LIFE_DAYS)
+
+
+def score_volume(signals: Dict[str, Any], now: datetime) -> float:
+    """Volume de mensagens em escala log, saturando em PRIORITY_VOLUME_SATURATION"""
+    total = signals.get("total_mensagens") or 0
+    return min(1.0, math.log1p(total) / math.log1p(PRIORITY_VOLUME_SATURATION))
+
+
+def score_payment(signals: Dict[str, Any], now: datetime) -> float:
+    """1.0 se alguma mensagem do cliente menciona pagamento"""
+    return 1.0 if signals.get("menciona_pagamento") else 0.0
+
+
+def score_customer_engagement(signals: Dict[str, Any], now: datetime) -> float:
+    """Proporção de mensagens escritas pelo cliente"""
+    total = signals.get("total_mensagens") or 0
+    return (signals.get("mensagens_usr") or 0) / total if total else 0.0
+
+
+# Sinais disponíveis; PRIORITY_WEIGHTS escolhe quais entram no score e com que peso
+SIGNAL_SCORERS: Dict[str, Callable[[Dict[str, Any], datetime], float]] = {
+    "recencia": score_recency,
+    "volume": score_volume,
+    "pagamento": score_payment,
+    "engajamento": score_customer_engagement,
+}
+
+
+class PriorityScheduler:
+    def __init__(self, db, weights: Dict[str, float] = None):
+        self.db = db
+        self.weights = weights if weights is not None else PRIORITY_WEIGHTS
+        self.logger = logging.getLogger(__name__)
+
+        unknown = set(self.weights) - set(SIGNAL_SCORERS)
+        if unknown:
+            raise ValueError(f"Sinais de prioridade desconhecidos: {', '.join(sorted(unknown))}")
+
+    def score(self, signals: Dict[str, Any], now: datetime) -> float:
+        """Soma ponderada dos sinais configurados"""
+        return sum(weight * SIGNAL_SCORERS[name](signals, now) for name, weight in self.weights.items())
+
+    async def prioritize(self, customer_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Retorna os usuários ainda não classificados ordenados por prioridade
+        (maior primeiro, mantendo a ordem do CSV nos empates)
+        """
+        signals = await self.db.get_priority_signals(customer_ids, PRIORITY_PAYMENT_KEYWORDS, PRIORITY_CHUNK_SIZE)
+        now = datetime.now(timezone.utc)
+
+        ranked = []
+        for customer_id in customer_ids:
+            row = signals.get(str(customer_id))
+            if row is None:
+                # Já classificado (ou id inválido)
+                continue
+            ranked.append({"user_id": str(customer_id), "prioridade": self.score(row, now), **row})
+
+        ranked.sort(key=lambda item: item["prioridade"], reverse=True)
+        return ranked
+
+    async def get_prioritized_users(self) -> List[str]:
+        """Lê o customers.csv e devolve os ids pendentes em ordem de prioridade"""
+        customers = await self.db.get_customers_from_csv()
+        ranked = await self.prioritize(customers)
+
+        if ranked:
+            top = ", ".join(f"{item['user_id']} ({item['prioridade']:.2f})" for item in ranked[:5])
+            self.logger.info(f"🎯 {len(ranked)} usuários priorizados; maiores prioridades: {top}")
+
+        return [item["user_id"] for item in ranked]
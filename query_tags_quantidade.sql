@@ -94,4 +94,72 @@ GROUP BY
         WHEN confianca > 0 THEN 'Baixa confiança (1-49%)'
         ELSE 'Sem confiança (0%)'
     END
-ORDER BY quantidade DESC; 
\ No newline at end of file
+ORDER BY quantidade DESC; 
+
+-- =====================================================
+-- MESMAS ANÁLISES SOBRE O RESUMO DIÁRIO INCREMENTAL
+-- (classificacoes_resumo_diario é atualizada na mesma transação de cada INSERT;
+--  custo proporcional a dias x tags em vez do número de classificações)
+-- Recalcular do zero: python resumo_tags.py --recalcular
+-- =====================================================
+
+-- QUERY 1R: Tags principais e suas quantidades
+SELECT classificacao, quantidade, percentual
+FROM (
+    SELECT 
+        classificacao,
+        SUM(quantidade) as quantidade,
+        ROUND(SUM(quantidade) * 100.0 / NULLIF(SUM(SUM(quantidade)) OVER (), 0), 2) as percentual
+    FROM classificacoes_resumo_diario
+    GROUP BY classificacao
+) tags
+WHERE classificacao != 'Erro na classificação'
+ORDER BY quantidade DESC;
+
+-- QUERY 2R: Tags específicas e suas quantidades
+SELECT 
+    classificacao_especifica,
+    SUM(quantidade) as quantidade,
+    ROUND(SUM(quantidade) * 100.0 / NULLIF(SUM(SUM(quantidade)) OVER (), 0), 2) as percentual
+FROM classificacoes_resumo_diario
+WHERE classificacao_especifica != ''
+GROUP BY classificacao_especifica
+ORDER BY quantidade DESC;
+
+-- QUERY 3R: Combinação de tags principais e específicas
+SELECT 
+    classificacao as tag_principal,
+    classificacao_especifica as tag_especifica,
+    SUM(quantidade) as quantidade
+FROM classificacoes_resumo_diario
+WHERE classificacao != 'Erro na classificação'
+    AND classificacao_especifica != ''
+GROUP BY classificacao, classificacao_especifica
+ORDER BY quantidade DESC;
+
+-- QUERY 4R: Resumo geral das classificações
+SELECT 
+    COALESCE(SUM(quantidade), 0) as total_classificacoes,
+    COALESCE(SUM(quantidade) FILTER (WHERE classificacao != 'Erro na classificação'), 0) as com_sucesso,
+    COALESCE(SUM(quantidade) FILTER (WHERE classificacao = 'Erro na classificação'), 0) as com_erro,
+    COALESCE(SUM(quantidade) FILTER (WHERE classificacao_especifica != ''), 0) as com_tags_especificas
+FROM classificacoes_resumo_diario;
+
+-- QUERY 6R: Distribuição por confiança (faixa 4 = 90-100%, 3 = 70-89%, 2 = 50-69%, 1 = 1-49%, 0 = 0%)
+SELECT 
+    faixa_confianca,
+    SUM(quantidade) as quantidade
+FROM classificacoes_resumo_diario
+WHERE classificacao != 'Erro na classificação'
+GROUP BY faixa_confianca
+ORDER BY quantidade DESC;
+
+-- QUERY 7R: Tags por dia nos últimos 30 dias
+SELECT 
+    dia,
+    classificacao,
+    SUM(quantidade) as quantidade
+FROM classificacoes_resumo_diario
+WHERE dia >= CURRENT_DATE - 30
+GROUP BY dia, classificacao
+ORDER BY dia DESC, quantidade DESC;
@@ -2,7 +2,13 @@
 -- QUERY: USUÁRIOS COM DÚVIDAS + MENSAGENS REAIS
 -- =====================================================
 
--- QUERY PRINCIPAL: Com as 20 últimas mensagens reais
+-- As mensagens vêm da conversas_snapshot: a janela exata (USR/AIR, até 25
+-- mensagens) que o classificador analisou, gravada na mesma transação da
+-- classificação. Cada linha custa uma busca pela chave primária, sem varrer
+-- a chat_history. Formato de mensagens: [[tipo, data, texto], ...] da mais
+-- recente para a mais antiga.
+
+-- QUERY PRINCIPAL (RECOMENDADA): Mensagens analisadas agrupadas por usuário
 SELECT 
     c.user_id,
     c.wa_id,
@@ -12,129 +18,35 @@ SELECT
     c.classificacao_especifica as tag_especifica,
     c.confianca,
     c.data_classificacao,
-    STRING_AGG(
-        CONCAT(
-            CASE 
-                WHEN ch.message_type = 'USR' THEN '👤 Cliente: '
-                WHEN ch.message_type = 'AIO' THEN '🤖 IA: '
+    COALESCE(NULLIF(c.sugestao_melhoria, ''), sugestao_cluster.sugestao) as sugestao_melhoria,
+    (
+        SELECT STRING_AGG(
+            CASE m.item->>0
+                WHEN 'USR' THEN '👤 Cliente: '
+                WHEN 'AIR' THEN '🤖 IA: '
                 ELSE '❓ Outro: '
-            END,
-            ch.message
-        ), 
-        E'\n' ORDER BY ch.message_date DESC
+            END || (m.item->>2),
+            E'\n' ORDER BY m.pos DESC
+        )
+        FROM jsonb_array_elements(s.mensagens) WITH ORDINALITY AS m(item, pos)
     ) as mensagens_analisadas
 FROM classificacoes c
-LEFT JOIN customers cust ON c.user_id = cust.id::text
+JOIN conversas_snapshot s ON s.classificacao_id = c.id
+LEFT JOIN customers cust ON cust.id = s.customer_id
 LEFT JOIN LATERAL (
-    SELECT 
-        ch2.message,
-        ch2.message_type,
-        ch2.message_date
-    FROM chat_history ch2
-    WHERE ch2.customer_id = c.user_id::integer
-        AND ch2.message_type IN ('USR', 'AIO')
-    ORDER BY ch2.message_date DESC
-    LIMIT 20
-) ch ON true
-WHERE c.classificacao LIKE '%Dúvidas%'
-    AND c.classificacao != 'Erro na classificação'
-GROUP BY c.user_id, c.wa_id, cust.profile_name, cust.from_number, 
-         c.classificacao, c.classificacao_especifica, c.confianca, c.data_classificacao
-ORDER BY c.data_classificacao DESC;
-
--- QUERY ALTERNATIVA: Versão mais simples sem agregação
-SELECT 
-    c.user_id,
-    c.wa_id,
-    cust.profile_name as nome_cliente,
-    cust.from_number as telefone_cliente,
-    c.classificacao as tag_principal,
-    c.classificacao_especifica as tag_especifica,
-    c.confianca,
-    c.data_classificacao,
-    ch.message_type,
-    ch.message,
-    ch.message_date
-FROM classificacoes c
-LEFT JOIN customers cust ON c.user_id = cust.id::text
-LEFT JOIN chat_history ch ON ch.customer_id = c.user_id::integer
-    AND ch.message_type IN ('USR', 'AIO')
+    -- Sem sugestão por conversa (PER_CONVERSATION_SUGGESTIONS=False) vale a do cluster
+    SELECT sc.sugestao
+    FROM sugestoes_cluster_membros scm
+    JOIN sugestoes_cluster sc ON sc.id = scm.sugestao_id
+    WHERE scm.user_id = c.user_id AND scm.classificacao_id = c.id
+    ORDER BY scm.sugestao_id DESC
+    LIMIT 1
+) sugestao_cluster ON TRUE
 WHERE c.classificacao LIKE '%Dúvidas%'
     AND c.classificacao != 'Erro na classificação'
-    AND ch.message_date >= (
-        SELECT MAX(ch2.message_date) - INTERVAL '7 days'
-        FROM chat_history ch2 
-        WHERE ch2.customer_id = c.user_id::integer
-    )
-ORDER BY c.data_classificacao DESC, ch.message_date DESC;
-
--- QUERY COM EXATAMENTE 25 ÚLTIMAS MENSAGENS POR USUÁRIO
-WITH ranked_messages AS (
-    SELECT 
-        ch.customer_id,
-        ch.message,
-        ch.message_type,
-        ch.message_date,
-        ROW_NUMBER() OVER (
-            PARTITION BY ch.customer_id 
-            ORDER BY ch.message_date DESC
-        ) as rn
-    FROM chat_history ch
-    WHERE ch.message_type IN ('USR', 'AIR')
-)
-SELECT 
-    c.user_id,
-    c.wa_id,
-    cust.profile_name as nome_cliente,
-    cust.from_number as telefone_cliente,
-    c.classificacao as tag_principal,
-    c.classificacao_especifica as tag_especifica,
-    c.confianca,
-    c.data_classificacao,
-    rm.message_type,
-    rm.message,
-    rm.message_date
-FROM classificacoes c
-LEFT JOIN customers cust ON c.user_id = cust.id::text
-LEFT JOIN ranked_messages rm ON rm.customer_id = c.user_id::integer
-WHERE c.classificacao LIKE '%Dúvidas%'
-    AND c.classificacao != 'Erro na classificação'
-    AND rm.rn <= 25
-ORDER BY c.data_classificacao DESC, rm.message_date ASC;
+ORDER BY s.ultima_mensagem DESC;
 
--- QUERY FINAL: Mensagens agrupadas por usuário (RECOMENDADA) - 25 ÚLTIMAS MENSAGENS
-WITH ranked_messages AS (
-    SELECT 
-        ch.customer_id,
-        ch.message,
-        ch.message_type,
-        ch.message_date,
-        ROW_NUMBER() OVER (
-            PARTITION BY ch.customer_id 
-            ORDER BY ch.message_date DESC
-        ) as rn
-    FROM chat_history ch
-    WHERE ch.message_type IN ('USR', 'AIR')
-),
-user_messages AS (
-    SELECT 
-        rm.customer_id,
-        STRING_AGG(
-            CONCAT(
-                CASE 
-                    WHEN rm.message_type = 'USR' THEN '👤 Cliente: '
-                    WHEN rm.message_type = 'AIR' THEN '🤖 IA: '
-                    ELSE '❓ Outro: '
-                END,
-                rm.message
-            ), 
-            E'\n' ORDER BY rm.message_date ASC
-        ) as mensagens_analisadas,
-        MAX(rm.message_date) as ultima_interacao
-    FROM ranked_messages rm
-    WHERE rm.rn <= 25
-    GROUP BY rm.customer_id
-)
+-- QUERY ALTERNATIVA: Uma linha por mensagem analisada
 SELECT 
     c.user_id,
     c.wa_id,
@@ -144,14 +56,16 @@ SELECT
     c.classificacao_especifica as tag_especifica,
     c.confianca,
     c.data_classificacao,
-    c.sugestao_melhoria,
-    um.mensagens_analisadas
+    m.item->>0 as message_type,
+    m.item->>2 as message,
+    (m.item->>1)::timestamp as message_date
 FROM classificacoes c
-LEFT JOIN customers cust ON c.user_id = cust.id::text
-LEFT JOIN user_messages um ON um.customer_id = c.user_id::integer
+JOIN conversas_snapshot s ON s.classificacao_id = c.id
+LEFT JOIN customers cust ON cust.id = s.customer_id
+CROSS JOIN LATERAL jsonb_array_elements(s.mensagens) WITH ORDINALITY AS m(item, pos)
 WHERE c.classificacao LIKE '%Dúvidas%'
     AND c.classificacao != 'Erro na classificação'
-ORDER BY um.ultima_interacao DESC;
+ORDER BY c.data_classificacao DESC, m.pos DESC;
 
 -- =====================================================
 -- QUERY: QUANTIDADE TOTAL DE TAGS POR CATEGORIA
@@ -241,9 +155,18 @@ SELECT
     c.classificacao as categoria_principal,
     c.confianca,
     c.data_classificacao,
-    c.sugestao_melhoria
+    COALESCE(NULLIF(c.sugestao_melhoria, ''), sugestao_cluster.sugestao) as sugestao_melhoria
 FROM classificacoes c
 LEFT JOIN customers cust ON c.user_id = cust.id::text
+LEFT JOIN LATERAL (
+    -- Sem sugestão por conversa (PER_CONVERSATION_SUGGESTIONS=False) vale a do cluster
+    SELECT sc.sugestao
+    FROM sugestoes_cluster_membros scm
+    JOIN sugestoes_cluster sc ON sc.id = scm.sugestao_id
+    WHERE scm.user_id = c.user_id AND scm.classificacao_id = c.id
+    ORDER BY scm.sugestao_id DESC
+    LIMIT 1
+) sugestao_cluster ON TRUE
 WHERE c.classificacao LIKE '%Dúvidas%'
     AND c.classificacao != 'Erro na classificação'
 ORDER BY c.data_classificacao DESC;
@@ -286,61 +209,6 @@ ORDER BY quantidade DESC;
 -- - Para outros: WHERE c.classificacao LIKE '%Outros%'
 -- - Para categoria específica: WHERE c.classificacao = 'Dúvidas sobre preço/valor'
 
-WITH ranked_messages AS (
-    SELECT 
-        ch.customer_id,
-        ch.message,
-        ch.message_type,
-        ch.message_date,
-        ROW_NUMBER() OVER (
-            PARTITION BY ch.customer_id 
-            ORDER BY ch.message_date DESC
-        ) as rn
-    FROM chat_history ch
-    WHERE ch.message_type IN ('USR', 'AIO')
-),
-user_messages AS (
-    SELECT 
-        rm.customer_id,
-        STRING_AGG(
-            CONCAT(
-                CASE 
-                    WHEN rm.message_type = 'USR' THEN '👤 Cliente: '
-                    WHEN rm.message_type = 'AIO' THEN '🤖 IA: '
-                    ELSE '❓ Outro: '
-                END,
-                rm.message
-            ), 
-            E'\n' ORDER BY rm.message_date ASC
-        ) as mensagens_analisadas,
-        MAX(rm.message_date) as ultima_interacao
-    FROM ranked_messages rm
-    WHERE rm.rn <= 25
-    GROUP BY rm.customer_id
-)
-SELECT 
-    c.user_id,
-    c.wa_id,
-    cust.profile_name as nome_cliente,
-    cust.from_number as telefone_cliente,
-    c.classificacao as categoria_principal,
-    c.classificacao_especifica as categoria_especifica,
-    c.confianca,
-    c.data_classificacao,
-    c.sugestao_melhoria,
-    um.mensagens_analisadas
-FROM classificacoes c
-LEFT JOIN customers cust ON c.user_id = cust.id::text
-LEFT JOIN user_messages um ON um.customer_id = c.user_id::integer
-WHERE c.classificacao LIKE '%XXXX%'  -- SUBSTITUA XXXX pela categoria desejada
-    AND c.classificacao != 'Erro na classificação'
-ORDER BY c.data_classificacao DESC;
-
--- =====================================================
--- QUERY GENÉRICA SIMPLIFICADA (ALTERNATIVA)
--- =====================================================
-
--- Versão mais simples que pode funcionar melhor em alguns casos
 SELECT 
     c.user_id,
     c.wa_id,
@@ -350,26 +218,32 @@ SELECT
     c.classificacao_especifica as categoria_especifica,
     c.confianca,
     c.data_classificacao,
-    c.sugestao_melhoria,
-    STRING_AGG(
-        CONCAT(
-            CASE 
-                WHEN ch.message_type = 'USR' THEN '👤 Cliente: '
-                WHEN ch.message_type = 'AIO' THEN '🤖 IA: '
+    COALESCE(NULLIF(c.sugestao_melhoria, ''), sugestao_cluster.sugestao) as sugestao_melhoria,
+    (
+        SELECT STRING_AGG(
+            CASE m.item->>0
+                WHEN 'USR' THEN '👤 Cliente: '
+                WHEN 'AIR' THEN '🤖 IA: '
                 ELSE '❓ Outro: '
-            END,
-            ch.message
-        ), 
-        E'\n' ORDER BY ch.message_date DESC
+            END || (m.item->>2),
+            E'\n' ORDER BY m.pos DESC
+        )
+        FROM jsonb_array_elements(s.mensagens) WITH ORDINALITY AS m(item, pos)
     ) as mensagens_analisadas
 FROM classificacoes c
-LEFT JOIN customers cust ON c.user_id = cust.id::text
-LEFT JOIN chat_history ch ON ch.customer_id = c.user_id::integer
-    AND ch.message_type IN ('USR', 'AIO')
+JOIN conversas_snapshot s ON s.classificacao_id = c.id
+LEFT JOIN customers cust ON cust.id = s.customer_id
+LEFT JOIN LATERAL (
+    -- Sem sugestão por conversa (PER_CONVERSATION_SUGGESTIONS=False) vale a do cluster
+    SELECT sc.sugestao
+    FROM sugestoes_cluster_membros scm
+    JOIN sugestoes_cluster sc ON sc.id = scm.sugestao_id
+    WHERE scm.user_id = c.user_id AND scm.classificacao_id = c.id
+    ORDER BY scm.sugestao_id DESC
+    LIMIT 1
+) sugestao_cluster ON TRUE
 WHERE c.classificacao LIKE '%XXXX%'  -- SUBSTITUA XXXX pela categoria desejada
     AND c.classificacao != 'Erro na classificação'
-GROUP BY c.user_id, c.wa_id, cust.profile_name, cust.from_number, 
-         c.classificacao, c.classificacao_especifica, c.confianca, c.data_classificacao, c.sugestao_melhoria
 ORDER BY c.data_classificacao DESC;
 
 -- =====================================================
@@ -447,10 +321,55 @@ SELECT
     c.classificacao_especifica as categoria_especifica,
     c.confianca,
     c.data_classificacao,
-    c.sugestao_melhoria
+    COALESCE(NULLIF(c.sugestao_melhoria, ''), sugestao_cluster.sugestao) as sugestao_melhoria
 FROM classificacoes c
 LEFT JOIN customers cust ON c.user_id = cust.id::text
+LEFT JOIN LATERAL (
+    -- Sem sugestão por conversa (PER_CONVERSATION_SUGGESTIONS=False) vale a do cluster
+    SELECT sc.sugestao
+    FROM sugestoes_cluster_membros scm
+    JOIN sugestoes_cluster sc ON sc.id = scm.sugestao_id
+    WHERE scm.user_id = c.user_id AND scm.classificacao_id = c.id
+    ORDER BY scm.sugestao_id DESC
+    LIMIT 1
+) sugestao_cluster ON TRUE
 WHERE c.classificacao LIKE '%Dúvidas sobre certificado%'
     AND c.classificacao_especifica IS NOT NULL
     AND c.classificacao_especifica != ''
-ORDER BY c.data_classificacao DESC; 
\ No newline at end of file
+ORDER BY c.data_classificacao DESC;
+
+-- =====================================================
+-- CARGA INICIAL DA conversas_snapshot (EXECUTAR UMA VEZ)
+-- =====================================================
+
+-- Classificações gravadas antes da conversas_snapshot não têm a janela exata;
+-- esta carga a reconstrói pelas 25 últimas mensagens USR/AIR atuais (aproximação)
+INSERT INTO conversas_snapshot (classificacao_id, user_id, customer_id, quantidade_mensagens, ultima_mensagem, mensagens)
+SELECT 
+    c.id,
+    c.user_id,
+    c.user_id::bigint,
+    w.quantidade,
+    w.ultima,
+    w.mensagens
+FROM classificacoes c
+CROSS JOIN LATERAL (
+    SELECT 
+        COUNT(*) as quantidade,
+        MAX(ch.message_date) as ultima,
+        jsonb_agg(
+            jsonb_build_array(ch.message_type, to_char(ch.message_date, 'YYYY-MM-DD"T"HH24:MI:SS.US'), ch.message)
+            ORDER BY ch.message_date DESC
+        ) as mensagens
+    FROM (
+        SELECT message_type, message_date, message
+        FROM chat_history
+        WHERE customer_id = c.user_id::bigint
+            AND message_type IN ('USR', 'AIR')
+        ORDER BY message_date DESC
+        LIMIT 25
+    ) ch
+) w
+WHERE c.user_id ~ '^[0-9]+$'
+    AND w.quantidade > 0
+    AND NOT EXISTS (SELECT 1 FROM conversas_snapshot s WHERE s.classificacao_id = c.id);
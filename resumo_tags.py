@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Consultas de distribuição de tags sobre o resumo diário incremental (classificacoes_resumo_diario)
+em vez de varrer a tabela classificacoes
+
+Uso:
+    python resumo_tags.py
+    python resumo_tags.py --desde 2025-01-01 --ate 2025-02-01 --top 20
+    python resumo_tags.py --recalcular     # reconstrói o resumo a partir da classificacoes
+"""
+
+import asyncio
+import argparse
+from datetime import datetime, date
+from typing import Dict, Any, List, Tuple
+from database import DatabaseManager
+
+ERROR_TAG = "Erro na classificação"
+
+CONFIDENCE_BANDS = {
+    4: "Alta confiança (90-100%)",
+    3: "Média-alta confiança (70-89%)",
+    2: "Média confiança (50-69%)",
+    1: "Baixa confiança (1-49%)",
+    0: "Sem confiança (0%)",
+}
+
+
+class TagSummary:
+    """API de consulta do resumo diário: custo proporcional a dias x tags, não ao número de classificações"""
+
+    def __init__(self, db: DatabaseManager = None):
+        self.db = db or DatabaseManager()
+
+    @staticmethod
+    def _filters(since: date = None, until: date = None, extra: List[str] = ()) -> Tuple[str, List[Any]]:
+        conditions, params = list(extra), []
+        if since is not None:
+            params.append(since)
+            conditions.append(f"dia >= ${len(params)}")
+        if until is not None:
+            params.append(until)
+            conditions.append(f"dia < ${len(params)}")
+        return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+    async def _fetch(self, query: str, params: List[Any]) -> List[Dict[str, Any]]:
+        conn = await self.db.get_connection()
+        try:
+            return [dict(row) for row in await conn.fetch(query, *params)]
+        finally:
+            await conn.close()
+
+    async def tag_counts(self, since: date = None, until: date = None) -> List[Dict[str, Any]]:
+        """Tags principais, quantidade e percentual sobre o total do período (QUERY 1)"""
+        where, params = self._filters(since, until)
+        return await self._fetch(f"""
+            SELECT classificacao, quantidade, percentual
+            FROM (
+                SELECT classificacao,
+                       SUM(quantidade) AS quantidade,
+                       ROUND(SUM(quantidade) * 100.0 / NULLIF(SUM(SUM(quantidade)) OVER (), 0), 2) AS percentual
+                FROM classificacoes_resumo_diario
+                {where}
+                GROUP BY classificacao
+            ) tags
+            WHERE classificacao <> '{ERROR_TAG}'
+            ORDER BY quantidade DESC
+        """, params)
+
+    async def specific_counts(self, since: date = None, until: date = None, limit: int = None) -> List[Dict[str, Any]]:
+        """Tags específicas, quantidade e percentual (QUERY 2 e, com limit, QUERY 5)"""
+        where, params = self._filters(since, until, ["classificacao_especifica <> ''"])
+        query = f"""
+            SELECT classificacao_especifica,
+                   SUM(quantidade) AS quantidade,
+                   ROUND(SUM(quantidade) * 100.0 / NULLIF(SUM(SUM(quantidade)) OVER (), 0), 2) AS percentual
+            FROM classificacoes_resumo_diario
+            {where}
+            GROUP BY classificacao_especifica
+            ORDER BY quantidade DESC
+        """
+        if limit:
+            params.append(limit)
+            query += f" LIMIT ${len(params)}"
+        return await self._fetch(query, params)
+
+    async def combinations(self, since: date = None, until: date = None, limit: int = None) -> List[Dict[str, Any]]:
+        """Combinações tag principal x específica (QUERY 3)"""
+        where, params = self._filters(since, until, ["classificacao_especifica <> ''", f"classificacao <> '{ERROR_TAG}'"])
+        query = f"""
+            SELECT classificacao AS tag_principal,
+                   classificacao_especifica AS tag_especifica,
+                   SUM(quantidade) AS quantidade
+            FROM classificacoes_resumo_diario
+            {where}
+            GROUP BY classificacao, classificacao_especifica
+            ORDER BY quantidade DESC
+        """
+        if limit:
+            params.append(limit)
+            query += f" LIMIT ${len(params)}"
+        return await self._fetch(query, params)
+
+    async def overview(self, since: date = None, until: date = None) -> Dict[str, int]:
+        """Totais gerais (QUERY 4)"""
+        where, params = self._filters(since, until)
+        rows = await self._fetch(f"""
+            SELECT COALESCE(SUM(quantidade), 0) AS total,
+                   COALESCE(SUM(quantidade) FILTER (WHERE classificacao = '{ERROR_TAG}'), 0) AS com_erro,
+                   COALESCE(SUM(quantidade) FILTER (WHERE classificacao_especifica <> ''), 0) AS com_especifica
+            FROM classificacoes_resumo_diario
+            {where}
+        """, params)
+        row = rows[0]
+        return {
+            "Total de classificações": row["total"],
+            "Classificações com sucesso": row["total"] - row["com_erro"],
+            "Classificações com erro": row["com_erro"],
+            "Com tags específicas": row["com_especifica"],
+        }
+
+    async def confidence_distribution(self, since: date = None, until: date = None) -> List[Dict[str, Any]]:
+        """Distribuição por faixa de confiança (QUERY 6)"""
+        where, params = self._filters(since, until, [f"classificacao <> '{ERROR_TAG}'"])
+        rows = await self._fetch(f"""
+            SELECT faixa_confianca, SUM(quantidade) AS quantidade
+            FROM classificacoes_resumo_diario
+            {where}
+            GROUP BY faixa_confianca
+            ORDER BY quantidade DESC
+        """, params)
+        return [{"nivel_confianca": CONFIDENCE_BANDS[row["faixa_confianca"]], "quantidade": row["quantidade"]} for row in rows]
+
+    async def daily_series(self, classificacao: str, since: date = None, until: date = None) -> List[Dict[str, Any]]:
+        """Quantidade por dia de uma tag principal"""
+        where, params = self._filters(since, until)
+        params.append(classificacao)
+        where = f"{where} {'AND' if where else 'WHERE'} classificacao = ${len(params)}"
+        return await self._fetch(f"""
+            SELECT dia, SUM(quantidade) AS quantidade
+            FROM classificacoes_resumo_diario
+            {where}
+            GROUP BY dia
+            ORDER BY dia
+        """, params)
+
+
+def parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+async def print_report(since: date = None, until: date = None, top: int = 10):
+    summary = TagSummary()
+    try:
+        print("📊 RESUMO DAS CLASSIFICAÇÕES")
+        print("=" * 60)
+        for label, value in (await summary.overview(since, until)).items():
+            print(f"  {label}: {value}")
+
+        print("\n🏷️ Tags principais:")
+        for row in await summary.tag_counts(since, until):
+            print(f"  {row['classificacao']}: {row['quantidade']} ({row['percentual']}%)")
+
+        print(f"\n🔖 Top {top} tags específicas:")
+        for row in await summary.specific_counts(since, until, limit=top):
+            print(f"  {row['classificacao_especifica']}: {row['quantidade']} ({row['percentual']}%)")
+
+        print(f"\n🔗 Top {top} combinações:")
+        for row in await summary.combinations(since, until, limit=top):
+            print(f"  {row['tag_principal']} → {row['tag_especifica']}: {row['quantidade']}")
+
+        print("\n🎯 Confiança:")
+        for row in await summary.confidence_distribution(since, until):
+            print(f"  {row['nivel_confianca']}: {row['quantidade']}")
+    finally:
+        await summary.db.close()
+
+
+async def rebuild():
+    db = DatabaseManager()
+    try:
+        await db.ensure_schema()
+        rows = await db.rebuild_daily_summary()
+        print(f"✅ Resumo diário recalculado: {rows} linhas")
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribuição de tags a partir do resumo diário")
+    parser.add_argument("--desde", type=parse_date, help="Data inicial (AAAA-MM-DD, inclusiva)")
+    parser.add_argument("--ate", type=parse_date, help="Data final (AAAA-MM-DD, exclusiva)")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--recalcular", action="store_true", help="Reconstrói o resumo a partir da classificacoes")
+    args = parser.parse_args()
+
+    if args.recalcular:
+        asyncio.run(rebuild())
+    else:
+        asyncio.run(print_report(args.desde, args.ate, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Resumo acumulado por usuário para o prompt incremental: a IA recebe o resumo, a tag anterior e só as
+mensagens novas; volta para a janela completa quando o delta é grande ou o resumo está velho
+
+Uso:
+    python main.py --incremental                 # classifica pedindo o resumo (base das próximas execuções)
+    python main.py --ativos                      # reclassifica quem tem mensagens novas, com prompt incremental
+    python resumos_conversa.py --concordancia    # concordância e tokens de entrada por modo de prompt
+"""
+
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from taxonomia import TAXONOMY_VERSION
+from conversa import Conversa
+from config import (
+    INCREMENTAL_MAX_NEW_MESSAGES, INCREMENTAL_SUMMARY_MAX_AGE_DAYS, INCREMENTAL_MAX_CHAIN,
+    INCREMENTAL_SUMMARY_MAX_CHARS
+)
+
+FULL = "completo"
+INCREMENTAL = "incremental"
+
+# Acrescentado ao CLASSIFICATION_PROMPT quando o resumo é pedido
+SUMMARY_INSTRUCTION = """
+RESUMO PARA AS PRÓXIMAS ANÁLISES:
+Acrescente uma QUARTA parte, separada por pipe (|), com um resumo de até 3 frases de TODA a conversa
+(incluindo o resumo anterior, se houver): o que o cliente quer, problemas citados e situação atual.
+"""
+
+# Ocupa o lugar da conversa no CLASSIFICATION_PROMPT no modo incremental
+INCREMENTAL_CONTEXT = """RESUMO DA CONVERSA ATÉ {ultima} (mensagens anteriores, já analisadas):
+{resumo}
+
+Classificação anterior: {tag}
+
+MENSAGENS NOVAS DESDE ENTÃO:
+{novas}"""
+
+
+def _timestamp(value) -> Optional[datetime]:
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value
+
+
+def plan_prompt_window(summary: Optional[Dict[str, Any]], messages: List[Dict[str, Any]],
+                       now: datetime = None) -> Tuple[str, List[Dict[str, Any]], str]:
+    """(modo, mensagens a enviar, motivo): incremental só com resumo válido e poucas mensagens novas"""
+    if not summary:
+        return FULL, messages, "sem_resumo"
+    if summary.get("versao_taxonomia") != TAXONOMY_VERSION:
+        return FULL, messages, "taxonomia_alterada"
+    now = now or datetime.now()
+    if now - summary["data_atualizacao"] > timedelta(days=INCREMENTAL_SUMMARY_MAX_AGE_DAYS):
+        return FULL, messages, "resumo_antigo"
+    if summary["atualizacoes"] >= INCREMENTAL_MAX_CHAIN:
+        return FULL, messages, "cadeia_longa"
+
+    watermark = summary["ultima_mensagem"]
+    new_messages = [msg for msg in messages
+                    if _timestamp(msg.get("timestamp")) is not None and _timestamp(msg["timestamp"]) > watermark]
+    if not new_messages:
+        return FULL, messages, "sem_mensagens_novas"
+    if len(new_messages) > INCREMENTAL_MAX_NEW_MESSAGES:
+        return FULL, messages, "delta_grande"
+    return INCREMENTAL, Conversa(new_messages), "delta"
+
+
+def incremental_context(summary: Dict[str, Any], formatted_new_messages: str) -> str:
+    return INCREMENTAL_CONTEXT.format(ultima=f"{summary['ultima_mensagem']:%Y-%m-%d %H:%M:%S}",
+                                      resumo=summary["resumo"], tag=summary["ultima_tag"],
+                                      novas=formatted_new_messages)
+
+
+def extract_summary(content: str) -> Optional[str]:
+    """Quarta parte da resposta da IA (tag|justificativa|específica|resumo)"""
+    parts = content.split("|")
+    if len(parts) < 4:
+        return None
+    text = " ".join(part.strip() for part in parts[3:]).strip()
+    return text[:INCREMENTAL_SUMMARY_MAX_CHARS] or None
+
+
+def summary_record(result: Dict[str, Any], messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Linha de resumos_conversa a gravar junto da classificação (None se a IA não devolveu resumo)"""
+    if not result.get("resumo") or not messages:
+        return None
+    stamps = [_timestamp(msg.get("timestamp")) for msg in messages]
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    if not stamps:
+        return None
+    return {
+        "resumo": result["resumo"],
+        "ultima_tag": result["classification"],
+        "ultima_mensagem": max(stamps),
+        "versao_taxonomia": TAXONOMY_VERSION,
+        "atualizacoes": result.get("atualizacoes_resumo", 0),
+    }
+
+
+# ----------------------------------------------------------------------------
+# Relatório: concordância com a janela completa e tokens de entrada por modo
+# ----------------------------------------------------------------------------
+
+AGREEMENT_QUERY = """
+    SELECT modo_prompt,
+           COUNT(*) AS quantidade,
+           COUNT(tag_janela_completa) AS comparadas,
+           COUNT(*) FILTER (WHERE tag_janela_completa = classificacao) AS iguais
+    FROM classificacoes
+    WHERE modo_prompt IS NOT NULL
+    GROUP BY 1
+"""
+
+# Só as chamadas da classificação atual (reclassificações mantêm o ledger das anteriores)
+TOKENS_BY_MODE_QUERY = """
+    SELECT c.modo_prompt, COUNT(*) AS chamadas, AVG(t.tokens_prompt) AS media_prompt
+    FROM consumo_tokens t
+    JOIN classificacoes c ON c.id = t.classificacao_id
+    WHERE t.tipo_chamada = 'classificacao'
+      AND t.data_registro >= c.data_classificacao
+      AND c.modo_prompt IS NOT NULL
+    GROUP BY 1
+"""
+
+
+async def print_agreement():
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        conn = await db.get_connection()
+        try:
+            agreement = {row["modo_prompt"]: dict(row) for row in await conn.fetch(AGREEMENT_QUERY)}
+            tokens = {row["modo_prompt"]: dict(row) for row in await conn.fetch(TOKENS_BY_MODE_QUERY)}
+        finally:
+            await conn.close()
+
+        if not agreement:
+            print("❌ Nenhuma classificação com modo de prompt registrado")
+            return
+        print(f"{'Modo':<14} {'Conversas':>10} {'Tokens entrada (média)':>24} {'Comparadas':>11} {'Concordância':>13}")
+        print("-" * 76)
+        for mode, row in agreement.items():
+            average = tokens.get(mode, {}).get("media_prompt")
+            rate = f"{row['iguais'] / row['comparadas']:.1%}" if row["comparadas"] else "-"
+            print(f"{mode:<14} {row['quantidade']:>10,} {float(average or 0):>24,.0f} {row['comparadas']:>11,} {rate:>13}")
+
+        full = tokens.get(FULL, {}).get("media_prompt")
+        delta = tokens.get(INCREMENTAL, {}).get("media_prompt")
+        if full and delta:
+            print(f"\n📉 Prompt incremental usa {1 - float(delta) / float(full):.1%} menos tokens de entrada por conversa")
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumos acumulados e prompt incremental")
+    parser.add_argument("--concordancia", action="store_true",
+                        help="Concordância com a janela completa e tokens de entrada por modo de prompt")
+    args = parser.parse_args()
+    if args.concordancia:
+        asyncio.run(print_agreement())
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
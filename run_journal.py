@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Journal de execução append-only para retomar o classificador após falhas
+"""
+
+import json
+import os
+import time
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from config import JOURNAL_FILE, JOURNAL_FSYNC_EVERY, JOURNAL_COMPACT_EVERY
+
+# Etapas que encerram o processamento de um usuário
+ETAPAS_FINAIS = {"salvo", "sem_mensagens", "ja_classificado"}
+
+
+class RunJournal:
+    """
+    Registra em JSONL as transições de etapa de cada usuário e os resultados
+    já obtidos da IA. Se o processo morrer no meio da execução, o próximo
+    start retoma do último checkpoint e grava direto no banco os resultados
+    classificados que ainda não tinham sido salvos, sem chamar a API de novo.
+    """
+
+    def __init__(self, path: str = JOURNAL_FILE, fsync_every: int = JOURNAL_FSYNC_EVERY,
+                 compact_every: int = JOURNAL_COMPACT_EVERY):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.compact_every = compact_every
+        self.logger = logging.getLogger(__name__)
+
+        self.pending: List[str] = []
+        self.done = set()
+        self.unsaved: Dict[str, Dict[str, Any]] = {}
+        self.has_checkpoint = False
+
+        self._file = None
+        self._since_fsync = 0
+        self._since_compact = 0
+
+    def load(self) -> bool:
+        """Reconstrói o estado a partir do journal existente (se houver)"""
+        if not os.path.exists(self.path):
+            return False
+
+        entries = 0
+        truncated = False
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última linha truncada por queda do processo
+                    self.logger.warning("Linha incompleta ignorada no journal")
+                    truncated = True
+                    continue
+                self._apply(entry)
+                entries += 1
+
+        self._since_compact = entries
+        if truncated and self.has_checkpoint:
+            # Reescreve o arquivo para não anexar entradas após a linha quebrada
+            self.compact()
+
+        self.logger.info(
+            f"Journal carregado: {len(self.remaining_users())} pendentes, "
+            f"{len(self.unsaved)} resultados não salvos"
+        )
+        return self.has_checkpoint
+
+    def _apply(self, entry: Dict[str, Any]):
+        """Aplica uma entrada do journal ao estado em memória"""
+        if entry.get("ev") == "checkpoint":
+            self.pending = [str(u) for u in entry.get("pendentes", [])]
+            self.done = set()
+            self.unsaved = {}
+            self.has_checkpoint = True
+            return
+
+        user_id = str(entry.get("user"))
+        etapa = entry.get("etapa")
+        if etapa == "classificado":
+            self.unsaved[user_id] = entry.get("resultado", {})
+        elif etapa in ETAPAS_FINAIS:
+            self.unsaved.pop(user_id, None)
+            self.done.add(user_id)
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def _write(self, entry: Dict[str, Any]):
+        self._open()
+        self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+        self._since_fsync += 1
+        self._since_compact += 1
+
+        if self._since_fsync >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        """Força a gravação em disco das entradas pendentes"""
+        if self._file is not None and self._since_fsync:
+            os.fsync(self._file.fileno())
+            self._since_fsync = 0
+
+    def start(self, pendentes: List[str]):
+        """Inicia um novo journal com a lista de usuários descoberta"""
+        self.close()
+        self.pending = [str(u) for u in pendentes]
+        self.done = set()
+        self.unsaved = {}
+        self.has_checkpoint = True
+        self.compact()
+
+    def record(self, user_id: str, etapa: str, resultado: Optional[Dict[str, Any]] = None):
+        """Registra a transição de etapa de um usuário"""
+        entry = {"ev": "etapa", "ts": round(time.time(), 3), "user": str(user_id), "etapa": etapa}
+        if resultado is not None:
+            entry["resultado"] = resultado
+        self._apply(entry)
+        self._write(entry)
+
+        if self._since_compact >= self.compact_every:
+            self.compact()
+
+    def remaining_users(self) -> List[str]:
+        """Usuários do checkpoint que ainda não chegaram a uma etapa final"""
+        return [u for u in self.pending if u not in self.done and u not in self.unsaved]
+
+    def unsaved_results(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Resultados já classificados pela IA e ainda não gravados no banco"""
+        return list(self.unsaved.items())
+
+    def compact(self):
+        """Reescreve o journal apenas com o checkpoint atual e os resultados não salvos"""
+        self.close()
+        tmp_path = self.path + ".tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            checkpoint = {"ev": "checkpoint", "ts": round(time.time(), 3), "pendentes": self.remaining_users()}
+            f.write(json.dumps(checkpoint, ensure_ascii=False) + "\n")
+            for user_id, resultado in self.unsaved.items():
+                entry = {"ev": "etapa", "user": user_id, "etapa": "classificado", "resultado": resultado}
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, self.path)
+
+        # O checkpoint compactado passa a ser a nova lista de pendentes
+        self.pending = self.remaining_users() + list(self.unsaved)
+        self.done = set()
+        self._since_compact = 0
+
+    def close(self):
+        """Sincroniza e fecha o arquivo do journal"""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def finish(self):
+        """Remove o journal ao fim de uma execução completa"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.pending = []
+        self.done = set()
+        self.unsaved = {}
+        self.has_checkpoint = False
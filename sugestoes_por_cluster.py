@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Sugestões de melhoria por cluster: as conversas classificadas são agrupadas por tag e por conteúdo
+(TF-IDF + k-means esférico em NumPy) e a IA gera uma sugestão por cluster a partir das conversas
+mais representativas; a sugestão fica ligada a todos os usuários do cluster
+
+Uso:
+    python sugestoes_por_cluster.py                          # todas as conversas com snapshot
+    python sugestoes_por_cluster.py --tag "Outros" --desde 2026-10-01
+    python sugestoes_por_cluster.py --simular                # só agrupa e mostra, sem chamar a IA
+    python sugestoes_por_cluster.py --usuario 12345          # sugestão mais recente do cluster do usuário
+"""
+
+import re
+import json
+import math
+import time
+import uuid
+import asyncio
+import argparse
+import numpy as np
+from collections import Counter, defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
+from triage import normalize_text
+from config import (
+    CLUSTER_MAX_PER_TAG, CLUSTER_MIN_SIZE, CLUSTER_REPRESENTATIVES, CLUSTER_MAX_FEATURES, CLUSTER_ITERATIONS
+)
+
+STOPWORDS = set("""
+    que nao com para por uma uns umas dos das nos nas num numa pro pra pelo pela pelos pelas
+    mas mais como quando onde qual quais quem porque pois entao tambem ainda sim aqui ali isso isto
+    esse essa esses essas este esta estes estas aquele aquela voce voces vcs ele ela eles elas
+    meu minha meus minhas seu sua seus suas nosso nossa ter tem tenho tinha estou esta estao
+    ser sou era foi vai vou fazer faz fiz pode posso ola bom boa dia tarde noite obrigado obrigada
+    tudo bem certo entendi sobre ate mesmo muito pouco bem agora hoje
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]{3,}")
+SPECIFIC_PREFIX = "esp:"
+
+
+def conversation_tokens(messages: List[Dict[str, Any]], especifica: str = "") -> List[str]:
+    """Tokens das mensagens do cliente mais um token da classificação específica (já canonicalizada)"""
+    text = " ".join(msg["message"] for msg in messages if msg.get("role") == "USR" and msg.get("message"))
+    tokens = [token for token in _TOKEN.findall(normalize_text(text)) if token not in STOPWORDS]
+    if especifica:
+        tokens.append(SPECIFIC_PREFIX + normalize_text(especifica).replace(" ", "_"))
+    return tokens
+
+
+class SparseRows:
+    """Matriz esparsa em CSR (só NumPy) com conversão para blocos densos"""
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, n_features: int):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.n_features = n_features
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def dense(self, start: int, stop: int) -> np.ndarray:
+        block = np.zeros((stop - start, self.n_features), dtype=np.float32)
+        begin, end = self.indptr[start], self.indptr[stop]
+        rows = np.repeat(np.arange(stop - start), np.diff(self.indptr[start:stop + 1]))
+        block[rows, self.indices[begin:end]] = self.data[begin:end]
+        return block
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        return np.vstack([self.dense(row, row + 1) for row in rows]) if len(rows) \
+            else np.zeros((0, self.n_features), dtype=np.float32)
+
+
+class ConversationVectorizer:
+    """TF-IDF (tf sublinear, idf suavizado) normalizado em L2, com vocabulário limitado aos termos mais frequentes"""
+
+    def __init__(self, max_features: int = CLUSTER_MAX_FEATURES, min_df: int = 2):
+        self.max_features = max_features
+        self.min_df = min_df
+        self.vocabulary: List[str] = []
+
+    def fit_transform(self, documents: List[List[str]]) -> SparseRows:
+        document_frequency = Counter()
+        for tokens in documents:
+            document_frequency.update(set(tokens))
+        min_df = self.min_df if len(documents) >= 2 * self.min_df else 1
+        terms = [term for term, df in document_frequency.most_common() if df >= min_df][:self.max_features]
+        self.vocabulary = sorted(terms)
+        index = {term: position for position, term in enumerate(self.vocabulary)}
+        idf = np.array([math.log((1 + len(documents)) / (1 + document_frequency[term])) + 1
+                        for term in self.vocabulary], dtype=np.float32)
+
+        indptr, indices, data = [0], [], []
+        for tokens in documents:
+            counts = Counter(index[token] for token in tokens if token in index)
+            columns = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+            values = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * idf[columns]
+            norm = np.linalg.norm(values)
+            indices.append(columns)
+            data.append(values / norm if norm else values)
+            indptr.append(indptr[-1] + len(counts))
+
+        return SparseRows(np.array(indptr, dtype=np.int64),
+                          np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+                          np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+                          len(self.vocabulary))
+
+
+def cluster_count(size: int) -> int:
+    """Clusters por tag: cresce com a raiz do tamanho, limitado por CLUSTER_MAX_PER_TAG e CLUSTER_MIN_SIZE"""
+    return max(1, min(CLUSTER_MAX_PER_TAG, int(math.sqrt(size / 2)), size // max(1, CLUSTER_MIN_SIZE)))
+
+
+def _assign(rows: SparseRows, centers: np.ndarray, chunk_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    labels = np.empty(len(rows), dtype=np.int32)
+    similarity = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), chunk_size):
+        stop = min(start + chunk_size, len(rows))
+        scores = rows.dense(start, stop) @ centers.T
+        labels[start:stop] = scores.argmax(axis=1)
+        similarity[start:stop] = scores.max(axis=1)
+    return labels, similarity
+
+
+def _normalize(centers: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(centers, axis=1, keepdims=True)
+    return centers / np.where(norms == 0, 1, norms)
+
+
+def spherical_kmeans(rows: SparseRows, k: int, iterations: int = CLUSTER_ITERATIONS, seed: int = 0,
+                     chunk_size: int = 4096, sample_size: int = 2000) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """k-means com similaridade de cosseno (vetores L2); devolve (rótulos, similaridade ao centro, centros)"""
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(rows), size=min(sample_size, len(rows)), replace=False)
+    points = rows.take(np.sort(sample))
+
+    # k-means++ sobre a amostra
+    centers = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        distance = np.clip(1 - (points @ np.array(centers).T).max(axis=1), 0, None)
+        total = distance.sum()
+        if total <= 0:
+            break
+        centers.append(points[rng.choice(len(points), p=distance / total)])
+    centers = np.array(centers, dtype=np.float32)
+
+    labels = None
+    for _ in range(iterations):
+        new_labels, similarity = _assign(rows, centers, chunk_size)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = np.zeros_like(centers)
+        for start in range(0, len(rows), chunk_size):
+            stop = min(start + chunk_size, len(rows))
+            membership = np.zeros((stop - start, len(centers)), dtype=np.float32)
+            membership[np.arange(stop - start), labels[start:stop]] = 1
+            sums += membership.T @ rows.dense(start, stop)
+        # Cluster vazio mantém o centro anterior
+        empty = ~sums.any(axis=1)
+        sums[empty] = centers[empty]
+        centers = _normalize(sums)
+
+    labels, similarity = _assign(rows, centers, chunk_size)
+    return labels, similarity, centers
+
+
+def absorb_small_clusters(rows: SparseRows, labels: np.ndarray, centers: np.ndarray, min_size: int,
+                          chunk_size: int = 4096) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Membros de clusters com menos de min_size conversas vão para o cluster grande mais próximo"""
+    sizes = np.bincount(labels, minlength=len(centers))
+    keep = np.flatnonzero(sizes >= min_size)
+    if len(keep) == 0 or len(keep) == len(centers):
+        keep = np.flatnonzero(sizes > 0)
+    centers = centers[keep]
+    labels, similarity = _assign(rows, centers, chunk_size)
+    return labels, similarity, centers
+
+
+def top_terms(center: np.ndarray, vocabulary: List[str], count: int = 8) -> List[str]:
+    order = np.argsort(-center)[:count]
+    return [vocabulary[index].replace(SPECIFIC_PREFIX, "") for index in order if center[index] > 0]
+
+
+def cluster_group(documents: List[List[str]], representatives: int = CLUSTER_REPRESENTATIVES,
+                  seed: int = 0) -> List[Dict[str, Any]]:
+    """Clusters de uma tag: membros (posições em documents), similaridade, representantes e termos"""
+    vectorizer = ConversationVectorizer()
+    rows = vectorizer.fit_transform(documents)
+    if rows.n_features == 0:
+        members = np.arange(len(documents))
+        return [{"membros": members, "similaridade": np.ones(len(documents), dtype=np.float32),
+                 "representantes": members[:representatives], "termos": []}]
+
+    labels, similarity, centers = spherical_kmeans(rows, cluster_count(len(documents)), seed=seed)
+    labels, similarity, centers = absorb_small_clusters(rows, labels, centers, CLUSTER_MIN_SIZE)
+
+    clusters = []
+    for cluster, center in enumerate(centers):
+        members = np.flatnonzero(labels == cluster)
+        if not len(members):
+            continue
+        closest = members[np.argsort(-similarity[members], kind="stable")[:representatives]]
+        clusters.append({"membros": members, "similaridade": similarity[members],
+                         "representantes": closest, "termos": top_terms(center, vectorizer.vocabulary)})
+    clusters.sort(key=lambda item: -len(item["membros"]))
+    return clusters
+
+
+# ----------------------------------------------------------------------------
+# Banco: leitura das conversas classificadas e gravação das sugestões
+# ----------------------------------------------------------------------------
+
+CLUSTER_INPUT_QUERY = """
+    SELECT c.id, c.user_id, c.classificacao, COALESCE(c.classificacao_especifica, '') AS especifica, s.mensagens
+    FROM classificacoes c
+    JOIN conversas_snapshot s ON s.classificacao_id = c.id
+    WHERE c.id > $1
+      AND ($3::text IS NULL OR c.classificacao = $3)
+      AND ($4::timestamp IS NULL OR c.data_classificacao >= $4)
+    ORDER BY c.id
+    LIMIT $2
+"""
+
+REPRESENTATIVES_QUERY = "SELECT classificacao_id, mensagens FROM conversas_snapshot WHERE classificacao_id = ANY($1::int[])"
+
+INSERT_CLUSTER_SUGGESTION = """
+    INSERT INTO sugestoes_cluster (
+        execucao_id, classificacao, cluster, quantidade, termos, representantes, sugestao,
+        modelo, tokens_prompt, tokens_completion, custo_usd
+    ) VALUES ($1, $2, $3, $4, $5::jsonb, $6::jsonb, $7, $8, $9, $10, $11)
+    RETURNING id
+"""
+
+INSERT_CLUSTER_MEMBERS = """
+    INSERT INTO sugestoes_cluster_membros (sugestao_id, classificacao_id, user_id, similaridade)
+    SELECT $1, * FROM unnest($2::int[], $3::text[], $4::real[])
+"""
+
+USER_SUGGESTION_QUERY = """
+    SELECT s.classificacao, s.cluster, s.quantidade, s.termos, s.sugestao, s.data_registro, m.similaridade
+    FROM sugestoes_cluster_membros m
+    JOIN sugestoes_cluster s ON s.id = m.sugestao_id
+    WHERE m.user_id = $1
+    ORDER BY m.sugestao_id DESC
+    LIMIT 1
+"""
+
+
+async def load_groups(db, tag: Optional[str] = None, since: Optional[datetime] = None,
+                      batch_size: int = 5000) -> Dict[str, Dict[str, list]]:
+    """Conversas por tag; guarda só ids e tokens (as mensagens dos representantes são lidas depois)"""
+    from database import decode_snapshot
+    groups = defaultdict(lambda: {"ids": [], "users": [], "tokens": []})
+    last_id = 0
+    conn = await db.get_connection()
+    try:
+        while True:
+            rows = await conn.fetch(CLUSTER_INPUT_QUERY, last_id, batch_size, tag, since)
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            for row in rows:
+                group = groups[row["classificacao"]]
+                group["ids"].append(row["id"])
+                group["users"].append(row["user_id"])
+                group["tokens"].append(conversation_tokens(decode_snapshot(row["mensagens"]), row["especifica"]))
+    finally:
+        await conn.close()
+    return groups
+
+
+async def load_representatives(db, classification_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    from database import decode_snapshot
+    conn = await db.get_connection()
+    try:
+        rows = await conn.fetch(REPRESENTATIVES_QUERY, classification_ids)
+    finally:
+        await conn.close()
+    return {row["classificacao_id"]: decode_snapshot(row["mensagens"]) for row in rows}
+
+
+async def save_cluster(db, run_id: str, tag: str, number: int, group: Dict[str, list], cluster: Dict[str, Any],
+                       suggestion: str, calls: List[Dict[str, Any]]) -> int:
+    ids = [group["ids"][position] for position in cluster["membros"]]
+    users = [group["users"][position] for position in cluster["membros"]]
+    representatives = [group["users"][position] for position in cluster["representantes"]]
+    conn = await db.get_connection()
+    try:
+        async with conn.transaction():
+            suggestion_id = await conn.fetchval(
+                INSERT_CLUSTER_SUGGESTION, run_id, tag, number, len(ids),
+                json.dumps(cluster["termos"], ensure_ascii=False), json.dumps(representatives), suggestion,
+                calls[0]["modelo"] if calls else None,
+                sum(call["tokens_prompt"] for call in calls), sum(call["tokens_completion"] for call in calls),
+                Decimal(str(sum(call["custo_usd"] for call in calls)))
+            )
+            await conn.execute(INSERT_CLUSTER_MEMBERS, suggestion_id, ids, users,
+                               [float(value) for value in cluster["similaridade"]])
+    finally:
+        await conn.close()
+    return suggestion_id
+
+
+async def run(tag: Optional[str] = None, since: Optional[datetime] = None, simulate: bool = False,
+              concurrency: int = 4):
+    from database import DatabaseManager
+    from tag_based_classifier import TagBasedClassifier
+    db = DatabaseManager()
+    try:
+        await db.ensure_schema()
+
+        started = time.perf_counter()
+        groups = await load_groups(db, tag, since)
+        total = sum(len(group["ids"]) for group in groups.values())
+        if not total:
+            print("❌ Nenhuma conversa classificada com snapshot para agrupar")
+            return
+
+        plan = []
+        for name, group in sorted(groups.items(), key=lambda item: -len(item[1]["ids"])):
+            for number, cluster in enumerate(cluster_group(group["tokens"])):
+                plan.append((name, number, group, cluster))
+        print(f"🧩 {total:,} conversas em {len(groups)} tags → {len(plan)} clusters "
+              f"({time.perf_counter() - started:.1f}s); {len(plan)} chamadas à IA em vez de {total:,}")
+
+        if simulate:
+            for name, number, group, cluster in plan:
+                representatives = ", ".join(group["users"][position] for position in cluster["representantes"])
+                print(f"  [{name} #{number}] {len(cluster['membros']):,} conversas | termos: {', '.join(cluster['termos'])} "
+                      f"| representantes: {representatives}")
+            return
+
+        ai = TagBasedClassifier(use_ai=True)
+        if not ai.ai_available:
+            print("❌ IA não disponível (OPENAI_API_KEY); use --simular para só ver os clusters")
+            return
+
+        representative_ids = [group["ids"][position] for _, _, group, cluster in plan for position in cluster["representantes"]]
+        conversations = await load_representatives(db, representative_ids)
+        run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        semaphore = asyncio.Semaphore(concurrency)
+        totals = Counter()
+
+        async def suggest(name: str, number: int, group: Dict[str, list], cluster: Dict[str, Any]):
+            examples = [conversations[group["ids"][position]] for position in cluster["representantes"]
+                        if group["ids"][position] in conversations]
+            async with semaphore:
+                try:
+                    suggestion, calls = await ai.generate_cluster_suggestions(examples, name, len(cluster["membros"]),
+                                                                              cluster["termos"])
+                except Exception as e:
+                    print(f"❌ [{name} #{number}] erro ao gerar sugestão: {e}")
+                    return
+            await save_cluster(db, run_id, name, number, group, cluster, suggestion, calls)
+            totals["clusters"] += 1
+            totals["tokens"] += sum(call["tokens_total"] for call in calls)
+            totals["custo_usd"] += sum(call["custo_usd"] for call in calls)
+            print(f"✅ [{name} #{number}] {len(cluster['membros']):,} conversas")
+
+        await asyncio.gather(*(suggest(*item) for item in plan))
+        print(f"\n🎉 Execução {run_id}: {totals['clusters']} sugestões para {total:,} conversas, "
+              f"{totals['tokens']:,} tokens, US$ {totals['custo_usd']:.4f}")
+    finally:
+        await db.close()
+
+
+async def print_user_suggestion(user_id: str):
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        conn = await db.get_connection()
+        try:
+            row = await conn.fetchrow(USER_SUGGESTION_QUERY, user_id)
+        finally:
+            await conn.close()
+        if row is None:
+            print(f"❌ Usuário {user_id} não está em nenhum cluster com sugestão")
+            return
+        terms = json.loads(row["termos"]) if isinstance(row["termos"], str) else row["termos"]
+        print(f"🧩 {row['classificacao']} #{row['cluster']} ({row['quantidade']:,} conversas, "
+              f"similaridade {row['similaridade']:.2f}) — {row['data_registro']:%Y-%m-%d %H:%M}")
+        print(f"   Termos: {', '.join(terms or [])}")
+        print(f"\n{row['sugestao']}")
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sugestões de melhoria por cluster de conversas parecidas")
+    parser.add_argument("--tag", help="Só conversas com esta classificação")
+    parser.add_argument("--desde", type=datetime.fromisoformat, help="Só classificações a partir desta data")
+    parser.add_argument("--simular", action="store_true", help="Agrupa e mostra os clusters sem chamar a IA")
+    parser.add_argument("--concorrencia", type=int, default=4, help="Chamadas à IA em paralelo")
+    parser.add_argument("--usuario", help="Mostra a sugestão do cluster mais recente do usuário")
+    args = parser.parse_args()
+
+    if args.usuario:
+        asyncio.run(print_user_suggestion(args.usuario))
+    else:
+        asyncio.run(run(args.tag, args.desde, args.simular, args.concorrencia))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,71 +3,23 @@
 Classificador baseado em tags específicas
 """
 
-import re
 import time
 import logging
 from typing import Dict, Any, List, Tuple
-from config import CLASSIFICATION_TAGS, TAG_KEYWORDS, CLASSIFICATION_PROMPT, OPENAI_API_KEY, OPENAI_MODEL
+from config import (
+    CLASSIFICATION_TAGS, OPENAI_MODEL, PER_CONVERSATION_SUGGESTIONS
+)
+from artefatos import get_artifacts
+from instrumentacao import span
+from llm_gateway import LLMGateway, OpenAIBackend, current_llm_calls, get_gateway
+from conversa import format_messages, lowercase_text, role_counts
+from pontuacoes_tags import keyword_scores, merge_tag
+from resumos_conversa import FULL, INCREMENTAL, SUMMARY_INSTRUCTION, incremental_context, extract_summary
 
-class TagBasedClassifier:
-    def __init__(self, use_ai=True):
-        self.use_ai = use_ai
-        self.logger = logging.getLogger(__name__)
-        
-        if use_ai and OPENAI_API_KEY and OPENAI_API_KEY != 'sua_chave_api_aqui':
-            try:
-                import openai
-                self.client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
-                self.ai_available = True
-            except Exception as e:
-                self.logger.warning(f"IA não disponível: {e}")
-                self.ai_available = False
-        else:
-            self.ai_available = False
-    
-    def format_messages_for_analysis(self, messages: List[Dict[str, Any]]) -> str:
-        """Formata mensagens para análise"""
-        if not messages:
-            return "Nenhuma mensagem encontrada."
-        
-        formatted = []
-        for msg in messages:
-            # Tratar timestamp que pode ser string ou datetime
-            timestamp = msg["timestamp"]
-            if hasattr(timestamp, 'strftime'):
-                timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                timestamp_str = str(timestamp)
-            
-            role = msg.get("role", "user")
-            message = msg["message"]
-            formatted.append(f"[{timestamp_str}] {role}: {message}")
-        
-        return "\n".join(formatted)
-    
-    async def generate_improvement_suggestions(self, messages: List[Dict[str, Any]], classification: str) -> str:
-        """Gera sugestões livres e específicas usando IA para melhorar o prompt"""
-        if not messages:
-            return "Nenhuma mensagem para análise"
-        
-        try:
-            # Formatar mensagens para análise
-            formatted_messages = self.format_messages_for_analysis(messages)
-            
-            # Prompt específico para gerar sugestões de melhoria
-            improvement_prompt = f"""
-Você é um especialista em atendimento ao cliente e marketing digital para lançamento de cursos. Analise a conversa abaixo e forneça até 5 sugestões específicas e acionáveis para melhorar o prompt de uma IA que é tanto ATENDENTE quanto MOTIVADORA para continuidade no minicurso.
-
-CONTEXTO:
-- Classificação da conversa: {classification}
-- Total de mensagens: {len(messages)}
-- Mensagens do cliente: {len([m for m in messages if m.get('role') == 'USR'])}
-- Mensagens da IA: {len([m for m in messages if m.get('role') == 'AIR'])}
+# Instruções comuns das sugestões de melhoria (por conversa e por cluster de conversas)
+IMPROVEMENT_SYSTEM_PROMPT = "Você é um especialista em atendimento ao cliente e marketing digital para lançamento de cursos. Você entende como equilibrar atendimento eficiente com estratégias de motivação e engajamento, criando uma experiência que resolve problemas E motiva a continuidade no minicurso."
 
-CONVERSA:
-{formatted_messages}
-
-INSTRUÇÕES DUAL (ATENDIMENTO + MOTIVAÇÃO):
+IMPROVEMENT_INSTRUCTIONS = """INSTRUÇÕES DUAL (ATENDIMENTO + MOTIVAÇÃO):
 1. Analise como a IA poderia ter melhorado tanto o ATENDIMENTO quanto a MOTIVAÇÃO
 2. A IA deve resolver dúvidas/objeções E simultaneamente motivar a continuidade no minicurso
 3. Considere: clareza, completude, proatividade, personalização, resolução + urgência, benefícios emocionais, gatilhos de curiosidade
@@ -103,12 +55,130 @@ FORMATO DE RESPOSTA:
 
 Se a conversa estiver bem conduzida em ambos os aspectos, responda apenas: "Conversa bem conduzida - atendimento eficiente e motivação adequada"
 """
+
+def parse_classification_response(content: str) -> Tuple[str, str, str]:
+    """Extrai (tag, contexto, classificação específica) da resposta da IA e resolve a tag"""
+    if "|" in content:
+        parts = content.split("|")
+        if len(parts) >= 3:
+            classification = parts[0].strip().lstrip("- ").strip()  # Remove hífen e espaços
+            context = parts[1].strip()
+            classificacao_especifica = parts[2].strip()
+        elif len(parts) == 2:
+            classification = parts[0].strip().lstrip("- ").strip()
+            context = parts[1].strip()
+            classificacao_especifica = context  # Usar contexto como específica
+        else:
+            classification = parts[0].strip().lstrip("- ").strip()
+            context = "Classificação automática"
+            classificacao_especifica = "Detalhes não fornecidos"
+    else:
+        # Se não tem pipe, tentar extrair a classificação da resposta
+        classification = content.lstrip("- ").strip()
+        context = "Classificação automática"
+        classificacao_especifica = "Detalhes não fornecidos"
+        
+        # Tentar encontrar uma tag válida na resposta
+        for tag in CLASSIFICATION_TAGS:
+            if tag.lower() in content.lower():
+                classification = tag
+                context = f"Tag encontrada na resposta: {content}"
+                classificacao_especifica = "Classificação extraída da resposta"
+                break
+    
+    # Verificar se a classificação é uma tag válida (comparação mais flexível)
+    classification_clean = classification.strip()
+    tag_found = False
+    
+    for tag in CLASSIFICATION_TAGS:
+        if tag.lower() == classification_clean.lower():
+            classification = tag  # Usar a tag exata do sistema
+            tag_found = True
+            break
+    
+    if not tag_found:
+        # Tentar encontrar correspondência parcial
+        for tag in CLASSIFICATION_TAGS:
+            if classification_clean.lower() in tag.lower() or tag.lower() in classification_clean.lower():
+                classification = tag
+                context = f"Tag '{classification_clean}' mapeada para '{tag}'"
+                tag_found = True
+                break
+    
+    if not tag_found:
+        classification = "Outros"
+        context = f"Tag '{classification_clean}' não reconhecida, classificada como 'Outros'"
+        classificacao_especifica = "Tag não reconhecida pelo sistema"
+    
+    return classification, context, classificacao_especifica
+
+
+class TagBasedClassifier:
+    def __init__(self, use_ai=True, api_key: str = None, base_url: str = None, gateway: LLMGateway = None):
+        self.use_ai = use_ai
+        self.logger = logging.getLogger(__name__)
+        self.llm_observers = []
+        self.per_conversation_suggestions = PER_CONVERSATION_SUGGESTIONS
+        # Buscador de palavras-chave e template do prompt pré-compilados (cache invalidado pelo hash do config)
+        self.artifacts = get_artifacts()
+        
+        # Chave/URL explícitas (ex.: teste de carga) usam um gateway próprio; o padrão é o gateway do processo
+        if gateway is None and (api_key or base_url):
+            gateway = LLMGateway(OpenAIBackend(api_key=api_key, base_url=base_url))
+        self.gateway = gateway or get_gateway()
+        self.ai_available = use_ai and self.gateway.available
+    
+    @property
+    def calls_per_conversation(self) -> int:
+        """Chamadas à IA feitas por classify_conversation (classificação + sugestões, se forem por conversa)"""
+        if not (self.use_ai and self.ai_available):
+            return 0
+        return 2 if self.per_conversation_suggestions else 1
+    
+    def add_llm_observer(self, observer):
+        """Registra um callback(latency_ms, error) chamado após cada chamada à IA"""
+        self.llm_observers.append(observer)
+    
+    async def _create_completion(self, etapa: str = "llm", **kwargs):
+        """Chama a IA pelo gateway (cache, retentativas e ledger) notificando os observadores deste classificador"""
+        return await self.gateway.complete(etapa=etapa, observers=self.llm_observers, **kwargs)
+    
+    def format_messages_for_analysis(self, messages: List[Dict[str, Any]]) -> str:
+        """Formata mensagens para análise"""
+        return format_messages(messages)
+    
+    async def generate_improvement_suggestions(self, messages: List[Dict[str, Any]], classification: str) -> str:
+        """Gera sugestões livres e específicas usando IA para melhorar o prompt"""
+        if not messages:
+            return "Nenhuma mensagem para análise"
+        
+        try:
+            with span("montagem_prompt_sugestoes"):
+                # Formatar mensagens para análise
+                formatted_messages = self.format_messages_for_analysis(messages)
+                roles = role_counts(messages)
+                
+                # Prompt específico para gerar sugestões de melhoria
+                improvement_prompt = f"""
+Você é um especialista em atendimento ao cliente e marketing digital para lançamento de cursos. Analise a conversa abaixo e forneça até 5 sugestões específicas e acionáveis para melhorar o prompt de uma IA que é tanto ATENDENTE quanto MOTIVADORA para continuidade no minicurso.
+
+CONTEXTO:
+- Classificação da conversa: {classification}
+- Total de mensagens: {len(messages)}
+- Mensagens do cliente: {roles['USR']}
+- Mensagens da IA: {roles['AIR']}
+
+CONVERSA:
+{formatted_messages}
+
+{IMPROVEMENT_INSTRUCTIONS}"""
             
             # Fazer chamada para OpenAI
-            response = await self.client.chat.completions.create(
+            response = await self._create_completion(
+                etapa="llm_sugestoes",
                 model=OPENAI_MODEL,
                 messages=[
-                    {"role": "system", "content": "Você é um especialista em atendimento ao cliente e marketing digital para lançamento de cursos. Você entende como equilibrar atendimento eficiente com estratégias de motivação e engajamento, criando uma experiência que resolve problemas E motiva a continuidade no minicurso."},
+                    {"role": "system", "content": IMPROVEMENT_SYSTEM_PROMPT},
                     {"role": "user", "content": improvement_prompt}
                 ],
                 max_tokens=300,
@@ -116,7 +186,7 @@ Se a conversa estiver bem conduzida em ambos os aspectos, responda apenas: "Conv
             )
             
             # Processar resposta
-            content = response.choices[0].message.content.strip()
+            content = response.content.strip()
             
             # Log para debug
             self.logger.info(f"Sugestões de melhoria geradas: {content}")
@@ -127,26 +197,57 @@ Se a conversa estiver bem conduzida em ambos os aspectos, responda apenas: "Conv
             self.logger.error(f"Erro ao gerar sugestões de melhoria: {e}")
             return "Erro ao gerar sugestões de melhoria"
     
+    async def generate_cluster_suggestions(self, conversations: List[List[Dict[str, Any]]], classification: str,
+                                           cluster_size: int, terms: List[str]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Uma sugestão para um cluster inteiro a partir das conversas representativas; devolve (sugestão, uso da API)"""
+        calls: List[Dict[str, Any]] = []
+        calls_token = current_llm_calls.set(calls)
+        try:
+            with span("montagem_prompt_sugestoes"):
+                examples = "\n\n".join(
+                    f"CONVERSA {index}:\n{self.format_messages_for_analysis(messages)}"
+                    for index, messages in enumerate(conversations, 1)
+                )
+                cluster_prompt = f"""
+Você é um especialista em atendimento ao cliente e marketing digital para lançamento de cursos. Analise as conversas abaixo, que representam um grupo de conversas parecidas, e forneça até 5 sugestões específicas e acionáveis para melhorar o prompt de uma IA que é tanto ATENDENTE quanto MOTIVADORA para continuidade no minicurso. As sugestões valem para TODO o grupo, não só para os exemplos.
+
+CONTEXTO DO GRUPO:
+- Classificação: {classification}
+- Conversas no grupo: {cluster_size}
+- Termos mais característicos: {", ".join(terms) if terms else "-"}
+
+CONVERSAS REPRESENTATIVAS:
+{examples}
+
+{IMPROVEMENT_INSTRUCTIONS}"""
+            
+            response = await self._create_completion(
+                etapa="llm_sugestoes_cluster",
+                model=OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": IMPROVEMENT_SYSTEM_PROMPT},
+                    {"role": "user", "content": cluster_prompt}
+                ],
+                max_tokens=400,
+                temperature=0.3
+            )
+            content = response.content.strip()
+            self.logger.info(f"Sugestões do cluster '{classification}' ({cluster_size} conversas): {content}")
+            return content, calls
+        finally:
+            current_llm_calls.reset(calls_token)
+    
+    def keyword_tag_hits(self, messages: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Quantidade de palavras-chave encontradas por tag (só tags com pelo menos uma)"""
+        # Juntar todas as mensagens em um texto e buscar cada palavra-chave distinta uma vez
+        return self.artifacts.keyword_hits(lowercase_text(messages))
+    
     def classify_by_keywords(self, messages: List[Dict[str, Any]]) -> Tuple[str, float, str]:
         """Classifica usando palavras-chave"""
         if not messages:
             return "Outros", 0.0, "Nenhuma mensagem encontrada"
         
-        # Juntar todas as mensagens em um texto
-        all_text = " ".join([msg["message"].lower() for msg in messages])
-        
-        # Contar ocorrências de cada tag
-        tag_scores = {}
-        
-        for tag, keywords in TAG_KEYWORDS.items():
-            score = 0
-            for keyword in keywords:
-                # Buscar palavra-chave no texto
-                if keyword.lower() in all_text:
-                    score += 1
-            
-            if score > 0:
-                tag_scores[tag] = score
+        tag_scores = self.keyword_tag_hits(messages)
         
         # Se encontrou alguma tag, retornar a com maior score
         if tag_scores:
@@ -158,135 +259,138 @@ Se a conversa estiver bem conduzida em ambos os aspectos, responda apenas: "Conv
         # Se não encontrou nenhuma tag específica
         return "Outros", 0.5, "Nenhuma palavra-chave específica encontrada"
     
-    async def classify_with_ai(self, messages: List[Dict[str, Any]]) -> Tuple[str, float, str]:
-        """Classifica usando IA"""
+    def score_vector(self, messages: List[Dict[str, Any]], classification: str, confidence: float) -> List[float]:
+        """Pontuação de todas as tags: palavras-chave de cada tag mais a tag escolhida com a sua confiança"""
+        scores = keyword_scores(self.keyword_tag_hits(messages)) if messages else keyword_scores({})
+        return merge_tag(scores, classification, confidence).tolist()
+    
+    def build_classification_prompt(self, formatted_messages: str) -> str:
+        """Monta o prompt de classificação com a lista de tags e a conversa formatada"""
+        return self.artifacts.classification_prompt(formatted_messages)
+    
+    def parse_classification_response(self, content: str) -> Tuple[str, str, str]:
+        """Extrai (tag, contexto, classificação específica) da resposta da IA e resolve a tag"""
+        return parse_classification_response(content)
+    
+    async def classify_with_ai(self, messages: List[Dict[str, Any]], previous_summary: Dict[str, Any] = None,
+                               want_summary: bool = False, etapa: str = "llm_classificacao") -> Tuple:
+        """Classifica usando IA; com previous_summary as mensagens são só as novas e com want_summary o resumo vem no fim da tupla"""
         try:
-            # Formatar mensagens
-            formatted_messages = self.format_messages_for_analysis(messages)
-            
-            if not formatted_messages.strip():
-                return "Outros", 0.0, "Nenhuma mensagem encontrada para análise"
-            
-            # Preparar prompt
-            tags_text = "\n".join([f"- {tag}" for tag in CLASSIFICATION_TAGS])
-            prompt = CLASSIFICATION_PROMPT.format(tags_text, formatted_messages)
+            with span("montagem_prompt"):
+                # Formatar mensagens
+                formatted_messages = self.format_messages_for_analysis(messages)
+                
+                if not formatted_messages.strip():
+                    return "Outros", 0.0, "Nenhuma mensagem encontrada para análise"
+                
+                if previous_summary is not None:
+                    formatted_messages = incremental_context(previous_summary, formatted_messages)
+                
+                # Preparar prompt
+                prompt = self.build_classification_prompt(formatted_messages)
+                if want_summary:
+                    prompt += SUMMARY_INSTRUCTION
             
             # Fazer chamada para OpenAI
-            response = await self.client.chat.completions.create(
+            response = await self._create_completion(
+                etapa=etapa,
                 model=OPENAI_MODEL,
                 messages=[
                     {"role": "system", "content": "Você é um classificador especializado em conversas de atendimento ao cliente."},
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=200,
+                max_tokens=320 if want_summary else 200,
                 temperature=0.3
             )
             
             # Processar resposta
-            content = response.choices[0].message.content.strip()
+            content = response.content.strip()
             
             # Log para debug
             self.logger.info(f"Resposta da IA: {content}")
             
             # Separar classificação, contexto e classificação específica
-            if "|" in content:
-                parts = content.split("|")
-                if len(parts) >= 3:
-                    classification = parts[0].strip().lstrip("- ").strip()  # Remove hífen e espaços
-                    context = parts[1].strip()
-                    classificacao_especifica = parts[2].strip()
-                elif len(parts) == 2:
-                    classification = parts[0].strip().lstrip("- ").strip()
-                    context = parts[1].strip()
-                    classificacao_especifica = context  # Usar contexto como específica
-                else:
-                    classification = parts[0].strip().lstrip("- ").strip()
-                    context = "Classificação automática"
-                    classificacao_especifica = "Detalhes não fornecidos"
-            else:
-                # Se não tem pipe, tentar extrair a classificação da resposta
-                classification = content.lstrip("- ").strip()
-                context = "Classificação automática"
-                classificacao_especifica = "Detalhes não fornecidos"
-                
-                # Tentar encontrar uma tag válida na resposta
-                for tag in CLASSIFICATION_TAGS:
-                    if tag.lower() in content.lower():
-                        classification = tag
-                        context = f"Tag encontrada na resposta: {content}"
-                        classificacao_especifica = "Classificação extraída da resposta"
-                        break
-            
-            # Verificar se a classificação é uma tag válida (comparação mais flexível)
-            classification_clean = classification.strip()
-            tag_found = False
-            
-            for tag in CLASSIFICATION_TAGS:
-                if tag.lower() == classification_clean.lower():
-                    classification = tag  # Usar a tag exata do sistema
-                    tag_found = True
-                    break
-            
-            if not tag_found:
-                # Tentar encontrar correspondência parcial
-                for tag in CLASSIFICATION_TAGS:
-                    if classification_clean.lower() in tag.lower() or tag.lower() in classification_clean.lower():
-                        classification = tag
-                        context = f"Tag '{classification_clean}' mapeada para '{tag}'"
-                        tag_found = True
-                        break
-            
-            if not tag_found:
-                classification = "Outros"
-                context = f"Tag '{classification_clean}' não reconhecida, classificada como 'Outros'"
-                classificacao_especifica = "Tag não reconhecida pelo sistema"
+            with span("parse"):
+                classification, context, classificacao_especifica = self.parse_classification_response(content)
             
+            if want_summary:
+                return classification, 0.9, context, classificacao_especifica, extract_summary(content)
             return classification, 0.9, context, classificacao_especifica
             
         except Exception as e:
             self.logger.error(f"Erro na classificação com IA: {e}")
             return "Outros", 0.0, f"Erro na classificação: {str(e)}"
     
-    async def classify_conversation(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Classifica uma conversa usando tags"""
+    async def classify_conversation(self, messages: List[Dict[str, Any]], summary: Dict[str, Any] = None,
+                                    new_messages: List[Dict[str, Any]] = None, want_summary: bool = False,
+                                    compare_full: bool = False) -> Dict[str, Any]:
+        """Classifica uma conversa usando tags
+        
+        Com summary e new_messages (modo incremental) a IA recebe o resumo anterior e só as mensagens novas;
+        compare_full também classifica a janela completa para medir a concordância entre os modos.
+        """
+        calls: List[Dict[str, Any]] = []
+        calls_token = current_llm_calls.set(calls)
         try:
             start_time = time.time()
+            incremental = summary is not None and new_messages is not None and self.use_ai and self.ai_available
+            analysed = new_messages if incremental else messages
+            resumo, tag_janela_completa = None, None
             
             # Tentar classificação com IA primeiro (se disponível)
             if self.use_ai and self.ai_available:
                 try:
-                    result = await self.classify_with_ai(messages)
-                    if len(result) == 4:
-                        classification, confidence, context, classificacao_especifica = result
+                    result = await self.classify_with_ai(analysed, previous_summary=summary if incremental else None,
+                                                         want_summary=want_summary or incremental)
+                    if len(result) >= 4:
+                        classification, confidence, context, classificacao_especifica = result[:4]
+                        resumo = result[4] if len(result) > 4 else None
                     else:
                         classification, confidence, context = result
                         classificacao_especifica = context
-                    tokens_used = 200  # Estimativa
                 except Exception as e:
                     self.logger.warning(f"Falha na IA, usando palavras-chave: {e}")
-                    classification, confidence, context = self.classify_by_keywords(messages)
+                    with span("palavras_chave"):
+                        classification, confidence, context = self.classify_by_keywords(messages)
                     classificacao_especifica = context
-                    tokens_used = 0
             else:
                 # Usar classificação por palavras-chave
-                classification, confidence, context = self.classify_by_keywords(messages)
+                with span("palavras_chave"):
+                    classification, confidence, context = self.classify_by_keywords(messages)
                 classificacao_especifica = context
-                tokens_used = 0
+            
+            if incremental and compare_full:
+                # Controle: mesma conversa com a janela completa (chamada registrada à parte no ledger)
+                control = await self.classify_with_ai(messages, etapa="llm_classificacao_controle")
+                tag_janela_completa = control[0]
+            
+            # Intenções secundárias: vetor com a pontuação de cada tag, não só a vencedora
+            with span("pontuacoes_tags"):
+                pontuacoes_tags = self.score_vector(messages, classification, confidence)
             
             # Calcular tempo de processamento
             processing_time = int((time.time() - start_time) * 1000)
             
-            # Gerar sugestões de melhoria
-            sugestao_melhoria = await self.generate_improvement_suggestions(messages, classification)
+            # Gerar sugestões de melhoria (por padrão geradas por cluster no sugestoes_por_cluster.py)
+            sugestao_melhoria = await self.generate_improvement_suggestions(analysed, classification) \
+                if self.per_conversation_suggestions else ""
+            
+            # Tokens reais das duas chamadas (classificação e sugestões)
+            tokens_used = sum(call["tokens_total"] for call in calls)
             
             return {
                 "classification": classification,
                 "confidence": confidence,
                 "context": context,
                 "classificacao_especifica": classificacao_especifica,
+                "pontuacoes_tags": pontuacoes_tags,
+                "modo_prompt": (INCREMENTAL if incremental else FULL) if self.use_ai and self.ai_available else None,
+                "resumo": resumo,
+                "tag_janela_completa": tag_janela_completa,
                 "sugestao_melhoria": sugestao_melhoria,
                 "tokens_used": tokens_used,
-                "processing_time": processing_time
+                "processing_time": processing_time,
+                "llm_calls": calls
             }
             
         except Exception as e:
@@ -295,6 +399,9 @@ Se a conversa estiver bem conduzida em ambos os aspectos, responda apenas: "Conv
                 "classification": "Outros",
                 "confidence": 0.0,
                 "context": f"Erro: {str(e)}",
-                "tokens_used": 0,
-                "processing_time": 0
-            } 
\ No newline at end of file
+                "tokens_used": sum(call["tokens_total"] for call in calls),
+                "processing_time": 0,
+                "llm_calls": calls
+            }
+        finally:
+            current_llm_calls.reset(calls_token) 
\ No newline at end of file
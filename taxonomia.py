@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Versão da taxonomia (hash de CLASSIFICATION_TAGS + CLASSIFICATION_PROMPT) e planejamento da
+reclassificação seletiva: só voltam para a fila os usuários cuja tag foi dividida ou removida
+
+Uso:
+    python taxonomia.py --versao                     # hash da taxonomia atual
+    python taxonomia.py --planejar                   # mostra o plano sem alterar nada
+    python taxonomia.py --aplicar --amostra 0.01     # renomeia, enfileira e carimba a versão
+    python taxonomia.py --diferenca 1a2b3c4d5e6f7a8b # compara uma versão registrada com a atual
+    python taxonomia.py --deriva                     # concordância da amostra já reclassificada
+    python main.py --reclassificar                   # processa a fila_reclassificacao
+"""
+
+import json
+import asyncio
+import hashlib
+import argparse
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+from config import (
+    CLASSIFICATION_TAGS, CLASSIFICATION_PROMPT, TAXONOMY_RENAMES, TAXONOMY_SPLITS,
+    RECLASSIFICATION_SAMPLE_RATE
+)
+
+
+def prompt_hash(prompt: str = CLASSIFICATION_PROMPT) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def taxonomy_version(tags: List[str] = CLASSIFICATION_TAGS, prompt: str = CLASSIFICATION_PROMPT) -> str:
+    """Hash curto da lista de tags (em ordem) e do prompt; muda com qualquer alteração nos dois"""
+    payload = json.dumps({"tags": list(tags), "prompt": prompt_hash(prompt)}, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+TAXONOMY_VERSION = taxonomy_version()
+
+REGISTER_TAXONOMY = """
+    INSERT INTO taxonomias (versao, tags, prompt_hash, prompt)
+    VALUES ($1, $2::jsonb, $3, $4)
+    ON CONFLICT (versao) DO NOTHING
+"""
+
+
+async def register_taxonomy(conn):
+    """Guarda a lista de tags e o prompt da versão atual (base para comparar versões depois)"""
+    await conn.execute(REGISTER_TAXONOMY, TAXONOMY_VERSION, json.dumps(CLASSIFICATION_TAGS, ensure_ascii=False),
+                       prompt_hash(), CLASSIFICATION_PROMPT)
+
+
+def diff_taxonomies(old_tags: List[str], new_tags: List[str], renames: Dict[str, str] = None,
+                    splits: Dict[str, List[str]] = None) -> Dict[str, Any]:
+    """Destino de cada tag antiga: mantida, renomeada, dividida ou removida"""
+    renames = TAXONOMY_RENAMES if renames is None else renames
+    splits = TAXONOMY_SPLITS if splits is None else splits
+    current = set(new_tags)
+    diff = {"mantidas": [], "renomeadas": {}, "divididas": {}, "removidas": []}
+    for tag in old_tags:
+        if tag in renames:
+            diff["renomeadas"][tag] = renames[tag]
+        elif tag in splits:
+            diff["divididas"][tag] = list(splits[tag])
+        elif tag in current:
+            diff["mantidas"].append(tag)
+        else:
+            diff["removidas"].append(tag)
+
+    targets = set(diff["renomeadas"].values()) | {tag for parts in diff["divididas"].values() for tag in parts}
+    diff["adicionadas"] = [tag for tag in new_tags if tag not in set(old_tags) and tag not in targets]
+    diff["destinos_invalidos"] = sorted(targets - current)
+    return diff
+
+
+def tag_action(tag: str, renames: Dict[str, str], splits: Dict[str, List[str]]) -> str:
+    if tag in renames:
+        return "renomeada"
+    if tag in splits:
+        return "dividida"
+    return "mantida" if tag in CLASSIFICATION_TAGS else "removida"
+
+
+# ----------------------------------------------------------------------------
+# Planejamento e aplicação
+# ----------------------------------------------------------------------------
+
+# Classificações gravadas com outra versão (ou antes do versionamento, versão NULL)
+STALE_COUNTS_QUERY = """
+    SELECT versao_taxonomia, classificacao, COUNT(*) AS quantidade
+    FROM classificacoes
+    WHERE versao_taxonomia IS DISTINCT FROM $1
+    GROUP BY 1, 2
+"""
+
+APPLY_RENAMES = """
+    UPDATE classificacoes c
+    SET classificacao = r.nova, versao_taxonomia = $3
+    FROM unnest($1::text[], $2::text[]) AS r(antiga, nova)
+    WHERE c.classificacao = r.antiga
+      AND c.versao_taxonomia IS DISTINCT FROM $3
+"""
+
+# Tags divididas ($2) ou fora da taxonomia atual ($3) voltam para a fila
+ENQUEUE_CHANGED = """
+    INSERT INTO fila_reclassificacao (user_id, motivo, tag_anterior, versao_origem, versao_destino)
+    SELECT c.user_id,
+           CASE WHEN c.classificacao = ANY($2::text[]) THEN 'dividida' ELSE 'removida' END,
+           c.classificacao, c.versao_taxonomia, $1
+    FROM classificacoes c
+    WHERE c.versao_taxonomia IS DISTINCT FROM $1
+      AND (c.classificacao = ANY($2::text[]) OR NOT c.classificacao = ANY($3::text[]))
+    ON CONFLICT (user_id) DO UPDATE
+    SET motivo = EXCLUDED.motivo, tag_anterior = EXCLUDED.tag_anterior, versao_origem = EXCLUDED.versao_origem,
+        versao_destino = EXCLUDED.versao_destino, data_registro = CURRENT_TIMESTAMP, processado_em = NULL,
+        status = NULL, tentativas = 0
+"""
+
+# Amostra das tags mantidas, reclassificada para medir a deriva causada pelo prompt novo
+ENQUEUE_SAMPLE = """
+    INSERT INTO fila_reclassificacao (user_id, motivo, tag_anterior, versao_origem, versao_destino)
+    SELECT c.user_id, 'amostra', c.classificacao, c.versao_taxonomia, $1
+    FROM classificacoes c
+    WHERE c.versao_taxonomia IS DISTINCT FROM $1
+      AND c.classificacao = ANY($2::text[])
+      AND random() < $3
+    ON CONFLICT (user_id) DO NOTHING
+"""
+
+# O resto continua válido na versão nova: só recebe o carimbo, sem chamar a IA
+STAMP_UNCHANGED = """
+    UPDATE classificacoes c
+    SET versao_taxonomia = $1
+    WHERE c.versao_taxonomia IS DISTINCT FROM $1
+      AND c.classificacao = ANY($2::text[])
+      AND NOT EXISTS (
+          SELECT 1 FROM fila_reclassificacao f WHERE f.user_id = c.user_id AND f.processado_em IS NULL
+      )
+"""
+
+DRIFT_QUERY = """
+    SELECT f.tag_anterior, c.classificacao, COUNT(*) AS quantidade
+    FROM fila_reclassificacao f
+    JOIN classificacoes c ON c.user_id = f.user_id
+    WHERE f.motivo = 'amostra'
+      AND f.processado_em IS NOT NULL
+      AND COALESCE(f.status, 'reclassificado') = 'reclassificado'
+      AND f.versao_destino = $1
+    GROUP BY 1, 2
+    ORDER BY 3 DESC
+"""
+
+
+def build_plan(stale_counts: List[Dict[str, Any]], renames: Dict[str, str],
+               splits: Dict[str, List[str]], sample_rate: float) -> Dict[str, Any]:
+    """Agrupa as classificações desatualizadas pela ação que cada tag exige"""
+    by_action = defaultdict(lambda: defaultdict(int))
+    for row in stale_counts:
+        by_action[tag_action(row["classificacao"], renames, splits)][row["classificacao"]] += row["quantidade"]
+
+    totals = {action: sum(tags.values()) for action, tags in by_action.items()}
+    queued = totals.get("dividida", 0) + totals.get("removida", 0)
+    sample = round(totals.get("mantida", 0) * sample_rate)
+    return {
+        "versao": TAXONOMY_VERSION,
+        "acoes": {action: dict(tags) for action, tags in by_action.items()},
+        "totais": totals,
+        "desatualizadas": sum(totals.values()),
+        "fila_estimada": queued + sample,
+        "amostra_estimada": sample,
+    }
+
+
+async def plan_reclassification(db, renames: Dict[str, str] = None, splits: Dict[str, List[str]] = None,
+                                sample_rate: float = RECLASSIFICATION_SAMPLE_RATE) -> Dict[str, Any]:
+    renames = TAXONOMY_RENAMES if renames is None else renames
+    splits = TAXONOMY_SPLITS if splits is None else splits
+    conn = await db.get_connection()
+    try:
+        rows = await conn.fetch(STALE_COUNTS_QUERY, TAXONOMY_VERSION)
+        total = await conn.fetchval("SELECT COUNT(*) FROM classificacoes")
+    finally:
+        await conn.close()
+    plan = build_plan([dict(row) for row in rows], renames, splits, sample_rate)
+    plan["total"] = total
+    return plan
+
+
+async def apply_plan(db, renames: Dict[str, str] = None, splits: Dict[str, List[str]] = None,
+                     sample_rate: float = RECLASSIFICATION_SAMPLE_RATE) -> Dict[str, int]:
+    """Renomeia no lugar, enfileira divididas/removidas e a amostra, e carimba as demais com a versão atual"""
+    renames = TAXONOMY_RENAMES if renames is None else renames
+    splits = TAXONOMY_SPLITS if splits is None else splits
+    invalid = sorted(set(renames.values()) - set(CLASSIFICATION_TAGS))
+    if invalid:
+        raise ValueError(f"TAXONOMY_RENAMES aponta para tags fora de CLASSIFICATION_TAGS: {invalid}")
+
+    await db.ensure_schema()
+    kept = [tag for tag in CLASSIFICATION_TAGS if tag not in splits and tag not in renames]
+    conn = await db.get_connection()
+    try:
+        async with conn.transaction():
+            renamed = await conn.execute(APPLY_RENAMES, list(renames), list(renames.values()), TAXONOMY_VERSION)
+            for old, new in renames.items():
+                await conn.execute("UPDATE tags_indice SET tag = $2 WHERE tag = $1", old, new)
+            queued = await conn.execute(ENQUEUE_CHANGED, TAXONOMY_VERSION, list(splits), kept)
+            sampled = await conn.execute(ENQUEUE_SAMPLE, TAXONOMY_VERSION, kept, sample_rate)
+            stamped = await conn.execute(STAMP_UNCHANGED, TAXONOMY_VERSION, kept)
+    finally:
+        await conn.close()
+
+    result = {
+        "renomeadas": int(renamed.split()[-1]),
+        "enfileiradas": int(queued.split()[-1]),
+        "amostra": int(sampled.split()[-1]),
+        "carimbadas": int(stamped.split()[-1]),
+    }
+    if result["renomeadas"]:
+        await db.rebuild_daily_summary()
+    return result
+
+
+async def load_taxonomy(conn, version: str) -> Optional[Dict[str, Any]]:
+    row = await conn.fetchrow("SELECT versao, tags, prompt_hash FROM taxonomias WHERE versao = $1", version)
+    if row is None:
+        return None
+    tags = row["tags"]
+    return {"versao": row["versao"], "tags": json.loads(tags) if isinstance(tags, str) else tags,
+            "prompt_hash": row["prompt_hash"]}
+
+
+# ----------------------------------------------------------------------------
+# Relatórios
+# ----------------------------------------------------------------------------
+
+def print_plan(plan: Dict[str, Any]):
+    print(f"🧭 Taxonomia atual: {plan['versao']}")
+    print(f"   {plan['desatualizadas']:,} de {plan['total']:,} classificações gravadas com outra versão")
+    labels = {"mantida": "✅ Mantidas (só carimbo)", "renomeada": "✏️ Renomeadas (sem IA)",
+              "dividida": "🔀 Divididas (fila)", "removida": "🗑️ Removidas (fila)"}
+    for action, label in labels.items():
+        tags = plan["acoes"].get(action)
+        if not tags:
+            continue
+        print(f"\n{label}: {plan['totais'][action]:,}")
+        for tag, count in sorted(tags.items(), key=lambda item: -item[1]):
+            print(f"   {tag}: {count:,}")
+
+    share = plan["fila_estimada"] / plan["total"] if plan["total"] else 0
+    print(f"\n📋 Fila estimada: {plan['fila_estimada']:,} usuários (amostra de deriva ≈ {plan['amostra_estimada']:,}), "
+          f"{share:.1%} de uma reclassificação completa")
+
+
+def print_diff(old: Dict[str, Any], diff: Dict[str, Any], same_prompt: bool):
+    print(f"🔍 {old['versao']} → {TAXONOMY_VERSION} (prompt {'igual' if same_prompt else 'alterado'})")
+    for tag, new in diff["renomeadas"].items():
+        print(f"   ✏️ {tag} → {new}")
+    for tag, parts in diff["divididas"].items():
+        print(f"   🔀 {tag} → {', '.join(parts)}")
+    for tag in diff["removidas"]:
+        print(f"   🗑️ {tag}")
+    for tag in diff["adicionadas"]:
+        print(f"   ➕ {tag}")
+    if diff["destinos_invalidos"]:
+        print(f"   ❌ Destinos fora de CLASSIFICATION_TAGS: {', '.join(diff['destinos_invalidos'])}")
+    print(f"   {len(diff['mantidas'])} tags mantidas")
+
+
+async def show_diff(db, version: str):
+    conn = await db.get_connection()
+    try:
+        old = await load_taxonomy(conn, version)
+    finally:
+        await conn.close()
+    if old is None:
+        print(f"❌ Versão {version} não registrada em taxonomias")
+        return
+    print_diff(old, diff_taxonomies(old["tags"], CLASSIFICATION_TAGS), old["prompt_hash"] == prompt_hash())
+
+
+async def show_drift(db):
+    conn = await db.get_connection()
+    try:
+        rows = await conn.fetch(DRIFT_QUERY, TAXONOMY_VERSION)
+    finally:
+        await conn.close()
+    total = sum(row["quantidade"] for row in rows)
+    if not total:
+        print("❌ Nenhuma conversa da amostra reclassificada ainda (rode python main.py --reclassificar)")
+        return
+    same = sum(row["quantidade"] for row in rows if row["tag_anterior"] == row["classificacao"])
+    print(f"🎯 Amostra de deriva: {same:,}/{total:,} mantiveram a tag ({same / total:.1%})")
+    for row in rows:
+        if row["tag_anterior"] != row["classificacao"]:
+            print(f"   {row['tag_anterior']} → {row['classificacao']}: {row['quantidade']:,}")
+
+
+async def main_async(args):
+    from database import DatabaseManager
+    db = DatabaseManager()
+    try:
+        if args.planejar:
+            await db.ensure_schema()
+            print_plan(await plan_reclassification(db, sample_rate=args.amostra))
+        elif args.aplicar:
+            result = await apply_plan(db, sample_rate=args.amostra)
+            print(f"✅ Taxonomia {TAXONOMY_VERSION}: {result['renomeadas']:,} renomeadas, "
+                  f"{result['enfileiradas']:,} enfileiradas, {result['amostra']:,} na amostra, "
+                  f"{result['carimbadas']:,} carimbadas sem reclassificar")
+        elif args.diferenca:
+            await show_diff(db, args.diferenca)
+        elif args.deriva:
+            await show_drift(db)
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Versionamento da taxonomia e reclassificação seletiva")
+    parser.add_argument("--versao", action="store_true", help="Mostra o hash da taxonomia atual")
+    parser.add_argument("--planejar", action="store_true", help="Conta o que cada tag desatualizada exige")
+    parser.add_argument("--aplicar", action="store_true", help="Aplica o plano e preenche a fila_reclassificacao")
+    parser.add_argument("--diferenca", metavar="VERSAO", help="Compara uma versão registrada com a atual")
+    parser.add_argument("--deriva", action="store_true", help="Concordância da amostra reclassificada")
+    parser.add_argument("--amostra", type=float, default=RECLASSIFICATION_SAMPLE_RATE,
+                        help="Fração das tags mantidas enviada para reclassificação")
+    args = parser.parse_args()
+
+    if args.versao:
+        print(TAXONOMY_VERSION)
+    elif args.planejar or args.aplicar or args.diferenca or args.deriva:
+        asyncio.run(main_async(args))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Testes dos artefatos pré-compilados: mesma contagem de palavras-chave do laço original sobre o TAG_KEYWORDS
+"""
+
+import json
+import random
+from datetime import datetime
+from artefatos import ARTIFACT_FORMAT, ClassifierArtifacts, compile_artifacts, load_artifacts, source_hash
+from carga_pipeline import synthetic_conversation
+from config import CLASSIFICATION_PROMPT, CLASSIFICATION_TAGS, TAG_KEYWORDS
+from tag_based_classifier import TagBasedClassifier
+
+
+def reference_tag_scores(messages):
+    """Laço original do classify_by_keywords"""
+    all_text = " ".join([msg["message"].lower() for msg in messages])
+    tag_scores = {}
+    for tag, keywords in TAG_KEYWORDS.items():
+        score = sum(1 for keyword in keywords if keyword.lower() in all_text)
+        if score > 0:
+            tag_scores[tag] = score
+    return tag_scores
+
+
+def corpus(size=300, seed=7):
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1)
+    return [synthetic_conversation(rng, TAG_KEYWORDS, now) for _ in range(size)]
+
+
+def test_keyword_hits_match_original_loop():
+    artifacts = ClassifierArtifacts(compile_artifacts())
+    for messages in corpus():
+        text = " ".join([msg["message"].lower() for msg in messages])
+        expected = reference_tag_scores(messages)
+        hits = artifacts.keyword_hits(text)
+        assert hits == expected
+        # Mesma ordem de tags: o desempate do max() escolhe a mesma
+        assert list(hits) == list(expected)
+
+
+def test_classify_by_keywords_matches_original_loop():
+    classifier = TagBasedClassifier(use_ai=False)
+    for messages in corpus(seed=11):
+        scores = reference_tag_scores(messages)
+        tag, confidence, _ = classifier.classify_by_keywords(messages)
+        if scores:
+            best = max(scores, key=scores.get)
+            assert (tag, confidence) == (best, min(scores[best] / 3.0, 0.9))
+        else:
+            assert (tag, confidence) == ("Outros", 0.5)
+
+
+def test_repeated_keyword_in_a_tag_counts_twice():
+    artifacts = ClassifierArtifacts(compile_artifacts())
+    text = " ".join(keyword.lower() for keywords in TAG_KEYWORDS.values() for keyword in keywords)
+    assert artifacts.keyword_hits(text) == {tag: len(keywords) for tag, keywords in TAG_KEYWORDS.items() if keywords}
+
+
+def test_classification_prompt_matches_template():
+    artifacts = ClassifierArtifacts(compile_artifacts())
+    tags_text = "\n".join([f"- {tag}" for tag in CLASSIFICATION_TAGS])
+    conversation = "[2025-01-01 10:00:00] USR: oi"
+    assert artifacts.classification_prompt(conversation) == CLASSIFICATION_PROMPT.format(tags_text, conversation)
+
+
+def test_load_uses_cache_until_hash_changes(tmp_path):
+    path = str(tmp_path / "artefatos.json")
+    _, compiled = load_artifacts(path)
+    assert compiled is True
+    artifacts, compiled = load_artifacts(path)
+    assert compiled is False
+    assert artifacts.hash == source_hash()
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    data["hash"] = "desatualizado"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    artifacts, compiled = load_artifacts(path)
+    assert compiled is True
+    assert artifacts.hash == source_hash()
+
+
+def test_load_recompiles_other_format(tmp_path):
+    path = str(tmp_path / "artefatos.json")
+    load_artifacts(path)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    data["formato"] = ARTIFACT_FORMAT + 1
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    assert load_artifacts(path)[1] is True
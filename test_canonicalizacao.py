@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Testes da canonicalização da classificacao_especifica
+"""
+
+from canonicalizacao import TagCanonicalizer
+
+CONFIG = {
+    "versao": 3,
+    "limiar_fuzzy": 0.85,
+    "tamanho_minimo_fuzzy": 8,
+    "mapeamentos": {
+        "Sem dinheiro": ["sem grana", "falta de dinheiro", "desempregado"],
+        "Boleto não chegou": ["não recebi o boleto"],
+    },
+}
+
+
+def test_exact_lookup_ignores_case_accents_and_punctuation():
+    canonicalizer = TagCanonicalizer(config=CONFIG)
+    assert canonicalizer.version == 3
+    assert canonicalizer.canonicalize("SEM GRANA!!") == "Sem dinheiro"
+    assert canonicalizer.canonicalize("  Nao recebi o boleto ") == "Boleto não chegou"
+    assert canonicalizer.canonicalize("sem dinheiro") == "Sem dinheiro"
+    assert canonicalizer.stats["exato"] == 3
+
+
+def test_fuzzy_match_is_cached():
+    canonicalizer = TagCanonicalizer(config=CONFIG)
+    assert canonicalizer.canonicalize("falta de dinheir") == "Sem dinheiro"
+    assert canonicalizer.canonicalize("Falta de dinheir.") == "Sem dinheiro"
+    assert canonicalizer.stats["fuzzy"] == 1
+    assert canonicalizer.stats["cache"] == 1
+
+
+def test_unmapped_text_is_kept_stripped():
+    canonicalizer = TagCanonicalizer(config=CONFIG)
+    assert canonicalizer.canonicalize("  Dúvida sobre certificado ") == "Dúvida sobre certificado"
+    assert canonicalizer.stats["sem_mapeamento"] == 1
+
+
+def test_short_text_skips_fuzzy():
+    canonicalizer = TagCanonicalizer(config=CONFIG)
+    assert canonicalizer.canonicalize("sem gra") == "sem gra"
+    assert canonicalizer.canonicalize("grana") == "grana"
+    assert canonicalizer.stats["fuzzy"] == 0
+
+
+def test_empty_values_pass_through():
+    canonicalizer = TagCanonicalizer(config=CONFIG)
+    assert canonicalizer.canonicalize(None) is None
+    assert canonicalizer.canonicalize("") == ""
+    assert canonicalizer.canonicalize("   ") == "   "
+
+
+def test_first_mapping_wins_on_conflict():
+    config = {"mapeamentos": {"A canônica": ["variação comum"], "B canônica": ["Variacao comum"]}}
+    canonicalizer = TagCanonicalizer(config=config)
+    assert canonicalizer.canonicalize("variação comum") == "A canônica"
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Testes da chave normalizada das requisições gravadas no cassete
+"""
+
+import asyncio
+import pytest
+from cassete import REPLAY, CassetteBackend, CassetteMiss, normalize_text, request_key
+from llm_gateway import RuleBasedBackend
+
+MODEL = "gpt-4o-mini"
+
+
+def conversation(text):
+    return [{"role": "system", "content": "Classifique a conversa"}, {"role": "user", "content": text}]
+
+
+def test_whitespace_does_not_change_key():
+    compact = request_key(conversation("[2025-01-10 10:00:00] USR: quero o boleto"), MODEL, 150, 0.3)
+    spaced = request_key(conversation("  [2025-01-10 10:00:00]   USR:\tquero o boleto  \n"), MODEL, 150, 0.3)
+    assert compact == spaced
+
+
+def test_timestamps_do_not_change_key():
+    first = request_key(conversation("[2025-01-10 10:00:00] USR: quero o boleto"), MODEL, 150, 0.3)
+    second = request_key(conversation("[2025-02-03T18:45:12.123456] USR: quero o boleto"), MODEL, 150, 0.3)
+    assert first == second
+
+
+def test_content_and_parameters_change_key():
+    base = request_key(conversation("quero o boleto"), MODEL, 150, 0.3)
+    assert base != request_key(conversation("quero cancelar"), MODEL, 150, 0.3)
+    assert base != request_key(conversation("quero o boleto"), "gpt-4o", 150, 0.3)
+    assert base != request_key(conversation("quero o boleto"), MODEL, 200, 0.3)
+    assert base != request_key(conversation("quero o boleto"), MODEL, 150, 0.7)
+    assert base == request_key(conversation("quero o boleto"), MODEL, 150, 0.3000001)
+
+
+def test_line_breaks_are_kept():
+    assert normalize_text("a\nb") != normalize_text("a b")
+    assert normalize_text(" a  \n\tb ") == "a\nb"
+
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "cassete.sqlite")
+    messages = conversation("[2025-01-10 10:00:00] USR: não recebi o boleto")
+
+    async def record():
+        backend = CassetteBackend(path, mode="gravar", inner=RuleBasedBackend())
+        try:
+            return await backend.complete(messages, MODEL, 150, 0.3)
+        finally:
+            await backend.aclose()
+
+    async def replay(request):
+        backend = CassetteBackend(path, mode=REPLAY)
+        try:
+            return await backend.complete(request, MODEL, 150, 0.3), backend.stats()
+        finally:
+            await backend.aclose()
+
+    recorded = asyncio.run(record())
+    # Outra data na mensagem: mesma gravação
+    replayed, stats = asyncio.run(replay(conversation("[2025-06-01 08:30:00] USR: não recebi o boleto")))
+    assert replayed.content == recorded.content
+    assert stats["reproduzidas"] == 1
+
+    with pytest.raises(CassetteMiss):
+        asyncio.run(replay(conversation("outra conversa")))
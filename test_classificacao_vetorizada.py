@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Testes da pontuação vetorizada: mesmas tags e confianças do classify_by_keywords conversa a conversa
+"""
+
+import random
+from datetime import datetime
+import pandas as pd
+import pytest
+from carga_pipeline import synthetic_conversation
+from classificacao_vetorizada import VectorizedKeywordTagger, conversation_texts
+from config import TAG_KEYWORDS
+from tag_based_classifier import TagBasedClassifier
+
+
+def corpus(size=400, seed=5):
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1)
+    return [synthetic_conversation(rng, TAG_KEYWORDS, now) for _ in range(size)] + [[]]
+
+
+def test_matches_classify_by_keywords():
+    conversations = corpus()
+    classifier = TagBasedClassifier(use_ai=False)
+    result = VectorizedKeywordTagger(chunk_size=64).classify(conversation_texts(conversations))
+
+    assert len(result) == len(conversations)
+    for messages, row in zip(conversations, result.itertuples()):
+        tag, confidence, _ = classifier.classify_by_keywords(messages)
+        assert row.classificacao == tag
+        assert row.confianca == pytest.approx(confidence)
+
+
+def test_hit_matrix_matches_artifacts_keyword_hits():
+    conversations = corpus(size=200, seed=9)
+    texts = conversation_texts(conversations)
+    tagger = VectorizedKeywordTagger()
+    matrix = tagger.hit_matrix(texts)
+    classifier = TagBasedClassifier(use_ai=False)
+    for messages, scores in zip(conversations, matrix):
+        expected = classifier.keyword_tag_hits(messages) if messages else {}
+        assert {tag: int(score) for tag, score in zip(tagger.tags, scores) if score} == expected
+
+
+def test_phrases_and_substrings():
+    tagger = VectorizedKeywordTagger({"Pagamento": ["boleto", "segunda via"], "Acesso": ["senha", "não consigo"]})
+    texts = pd.Series(["Preciso da SEGUNDA VIA do boleto", "esqueci minha senha e não consigo entrar",
+                       "segunda, via correio", "boletos atrasados", None])
+    scores = tagger.hit_matrix(texts)
+    assert scores.tolist() == [[2, 0], [0, 2], [0, 0], [1, 0], [0, 0]]
+
+    result = tagger.classify(texts)
+    assert result["classificacao"].tolist() == ["Pagamento", "Acesso", "Outros", "Pagamento", "Outros"]
+    # Sem texto (conversa vazia) tem confiança 0; texto sem palavra-chave, 0.5
+    assert result["confianca"].tolist()[2:] == [0.5, 1 / 3, 0.0]
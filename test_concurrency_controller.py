@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Testes das decisões do controlador de concorrência AIMD
+"""
+
+import asyncio
+from concurrency_controller import AIMDConcurrencyController, classify_llm_error, percentile
+
+
+def controller(**kwargs):
+    options = dict(initial=4, minimum=1, maximum=8, increase=1, decrease_factor=0.5,
+                   target_p95_ms=1000, max_error_rate=0.1, window=20, decrease_cooldown=0)
+    options.update(kwargs)
+    return AIMDConcurrencyController(**options)
+
+
+def test_increases_after_healthy_round():
+    aimd = controller(initial=2)
+    aimd.record(100)
+    assert aimd.current_limit == 2  # rodada ainda incompleta
+    aimd.record(100)
+    assert aimd.current_limit == 3
+    assert aimd.increases == 1
+    assert aimd.decisions[-1]["decisao"] == "aumento"
+
+
+def test_does_not_exceed_maximum():
+    aimd = controller(initial=8, maximum=8)
+    for _ in range(20):
+        aimd.record(100)
+    assert aimd.current_limit == 8
+    assert aimd.increases == 0
+
+
+def test_overload_error_halves_immediately():
+    aimd = controller(initial=8)
+    aimd.record(100, "rate_limit")
+    assert aimd.current_limit == 4
+    aimd.record(100, "timeout")
+    assert aimd.current_limit == 2
+    assert aimd.decreases == 2
+
+
+def test_does_not_go_below_minimum():
+    aimd = controller(initial=2, minimum=2)
+    aimd.record(100, "rate_limit")
+    assert aimd.current_limit == 2
+    assert aimd.decreases == 0
+
+
+def test_high_p95_decreases():
+    aimd = controller(initial=2)
+    aimd.record(5000)
+    aimd.record(5000)
+    assert aimd.current_limit == 1
+    assert "p95" in aimd.decisions[-1]["motivo"]
+
+
+def test_error_rate_decreases():
+    aimd = controller(initial=2, max_error_rate=0.1)
+    aimd.record(100, "server")
+    aimd.record(100)
+    assert aimd.current_limit == 1
+    assert "taxa de erro" in aimd.decisions[-1]["motivo"]
+
+
+def test_cooldown_avoids_cascading_decreases():
+    aimd = controller(initial=8, decrease_cooldown=60)
+    aimd.record(100, "rate_limit")
+    aimd.record(100, "rate_limit")
+    assert aimd.current_limit == 4
+    assert aimd.decreases == 1
+
+
+def test_acquire_waits_for_release():
+    async def scenario():
+        aimd = controller(initial=1)
+        await aimd.acquire()
+        waiting = asyncio.create_task(aimd.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        aimd.release()
+        await asyncio.wait_for(waiting, 1)
+        assert aimd.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_classify_llm_error():
+    class RateLimitError(Exception):
+        pass
+
+    class ServerError(Exception):
+        status_code = 503
+
+    assert classify_llm_error(RateLimitError()) == "rate_limit"
+    assert classify_llm_error(asyncio.TimeoutError()) == "timeout"
+    assert classify_llm_error(ServerError()) == "server"
+    assert classify_llm_error(ValueError()) == "other"
+
+
+def test_percentile_nearest_rank():
+    assert percentile([], 0.95) == 0.0
+    assert percentile(list(range(1, 101)), 0.95) == 95
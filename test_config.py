@@ -4,11 +4,12 @@ Teste das configurações do sistema
 """
 
 try:
-    from config import DATABASE_URL, OPENAI_API_KEY, CLASSIFICATION_CATEGORIES
+    from config import DATABASE_URL, OPENAI_API_KEY, CLASSIFICATION_TAGS, LLM_BACKEND
     print("✅ Configurações carregadas com sucesso!")
     print(f"📊 DATABASE_URL: {DATABASE_URL[:50]}...")
     print(f"🔑 OPENAI_API_KEY: {OPENAI_API_KEY[:10] if OPENAI_API_KEY else 'Não configurado'}...")
-    print(f"📋 Categorias: {len(CLASSIFICATION_CATEGORIES)} categorias definidas")
+    print(f"📋 Tags: {len(CLASSIFICATION_TAGS)} tags definidas")
+    print(f"🤖 Backend de IA: {LLM_BACKEND}")
     
     # Testar importação dos módulos principais
     from database import DatabaseManager
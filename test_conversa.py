@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Testes da representação compacta da conversa (Conversa / Mensagem)
+"""
+
+from collections import Counter
+from datetime import datetime
+import pytest
+from conversa import Conversa, Mensagem, format_messages, lowercase_text, role_counts
+
+RECORDS = [
+    {"mensagem": "Não recebi o BOLETO", "data_envio": datetime(2025, 1, 10, 10, 5), "message_type": "USR"},
+    {"mensagem": "Vou reenviar agora", "data_envio": datetime(2025, 1, 10, 10, 4), "message_type": "AIR"},
+    {"mensagem": "Oi", "data_envio": "2025-01-10 10:03:00", "message_type": "USR"},
+]
+
+
+def conversa():
+    return Conversa.from_records(RECORDS, message_column="mensagem", timestamp_column="data_envio",
+                                 role_column="message_type")
+
+
+def as_dicts():
+    return [{"message": r["mensagem"], "timestamp": r["data_envio"], "role": r["message_type"]} for r in RECORDS]
+
+
+def test_mensagem_dict_style_access():
+    msg = Mensagem("oi", datetime(2025, 1, 10), "USR")
+    assert msg["message"] == "oi"
+    assert msg.get("role") == "USR"
+    assert msg.get("inexistente", "padrão") == "padrão"
+    with pytest.raises(KeyError):
+        msg["inexistente"]
+    assert msg == {"message": "oi", "timestamp": datetime(2025, 1, 10), "role": "USR"}
+    assert msg != Mensagem("oi", datetime(2025, 1, 10), "AIR")
+    assert not hasattr(msg, "__dict__")
+
+
+def test_roles_are_interned():
+    first = Mensagem("a", None, "".join(["U", "SR"]))
+    second = Mensagem("b", None, "".join(["US", "R"]))
+    assert first.role is second.role
+
+
+def test_from_records_keeps_order():
+    conv = conversa()
+    assert len(conv) == 3
+    assert conv == as_dicts()
+    assert [msg["role"] for msg in conv] == ["USR", "AIR", "USR"]
+    assert conv[-1]["timestamp"] == "2025-01-10 10:03:00"
+    sliced = conv[:2]
+    assert isinstance(sliced, Conversa) and sliced == as_dicts()[:2]
+
+
+def test_derived_values_match_list_of_dicts():
+    conv = conversa()
+    assert format_messages(conv) == format_messages(as_dicts())
+    assert conv.prompt_text.splitlines()[0] == "[2025-01-10 10:05:00] USR: Não recebi o BOLETO"
+    assert conv.prompt_text.splitlines()[2] == "[2025-01-10 10:03:00] USR: Oi"
+    assert lowercase_text(conv) == lowercase_text(as_dicts()) == "não recebi o boleto vou reenviar agora oi"
+    assert role_counts(conv) == role_counts(as_dicts()) == Counter({"USR": 2, "AIR": 1})
+
+
+def test_derived_values_are_cached():
+    conv = conversa()
+    prompt, lower, roles = conv.prompt_text, conv.lower_text, conv.role_counts
+    conv.mensagens.append(Mensagem("Nova mensagem", None, "USR"))
+    # Calculados uma vez: a mesma instância volta nas leituras seguintes
+    assert conv.prompt_text is prompt
+    assert conv.lower_text is lower
+    assert conv.role_counts is roles
+    assert "nova mensagem" not in conv.lower_text
+
+
+def test_empty_conversation():
+    conv = Conversa()
+    assert len(conv) == 0 and not conv
+    assert format_messages(conv) == "Nenhuma mensagem encontrada."
+    assert conv.lower_text == ""
+    assert conv.role_counts == Counter()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Testes do custo por chamada à IA com preços fixos
+"""
+
+from types import SimpleNamespace
+import pytest
+import custos
+from custos import CostTracker, estimate_cost, model_prices, usage_record
+
+PRICES = {
+    "gpt-4o-mini": {"entrada": 0.15, "entrada_cache": 0.075, "saida": 0.60},
+    "gpt-4o": {"entrada": 2.50, "entrada_cache": 1.25, "saida": 10.00},
+    "sem-cache": {"entrada": 1.00, "saida": 2.00},
+}
+
+
+@pytest.fixture(autouse=True)
+def fixed_prices(monkeypatch):
+    monkeypatch.setattr(custos, "MODEL_PRICES", PRICES)
+
+
+def response(model, prompt_tokens, completion_tokens, cached_tokens=None):
+    details = SimpleNamespace(cached_tokens=cached_tokens) if cached_tokens is not None else None
+    usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                            prompt_tokens_details=details)
+    return SimpleNamespace(model=model, usage=usage)
+
+
+def test_model_prices_accepts_version_suffix():
+    assert model_prices("gpt-4o") is PRICES["gpt-4o"]
+    # O prefixo mais longo vence: gpt-4o-mini e não gpt-4o
+    assert model_prices("gpt-4o-mini-2024-07-18") is PRICES["gpt-4o-mini"]
+    assert model_prices("gpt-4o-2024-08-06") is PRICES["gpt-4o"]
+    assert model_prices("modelo-desconhecido") is None
+    assert model_prices(None) is None
+
+
+def test_estimate_cost():
+    assert estimate_cost("gpt-4o-mini", 1_000_000, 0) == pytest.approx(0.15)
+    assert estimate_cost("gpt-4o-mini", 1000, 200) == pytest.approx((1000 * 0.15 + 200 * 0.60) / 1e6)
+
+
+def test_cached_tokens_use_discounted_price():
+    full = estimate_cost("gpt-4o", 2000, 100)
+    cached = estimate_cost("gpt-4o", 2000, 100, cached_tokens=1500)
+    assert cached == pytest.approx((500 * 2.50 + 1500 * 1.25 + 100 * 10.00) / 1e6)
+    assert cached < full
+    # Sem preço de cache, os tokens em cache pagam o preço normal
+    assert estimate_cost("sem-cache", 2000, 100, cached_tokens=1500) == estimate_cost("sem-cache", 2000, 100)
+
+
+def test_unknown_model_costs_nothing():
+    assert estimate_cost("modelo-desconhecido", 5000, 500) == 0.0
+    record = usage_record("classificacao", "modelo-desconhecido", response(None, 5000, 500), 12.7)
+    assert record["custo_usd"] == 0.0
+    assert record["modelo"] == "modelo-desconhecido"
+    assert record["tokens_total"] == 5500
+
+
+def test_usage_record_from_response():
+    record = usage_record("classificacao", "gpt-4o-mini", response("gpt-4o-mini-2024-07-18", 1200, 80, 1024), 345.9)
+    assert record == {
+        "tipo_chamada": "classificacao",
+        "modelo": "gpt-4o-mini-2024-07-18",
+        "tokens_prompt": 1200,
+        "tokens_completion": 80,
+        "tokens_cache": 1024,
+        "tokens_total": 1280,
+        "custo_usd": round((176 * 0.15 + 1024 * 0.075 + 80 * 0.60) / 1e6, 8),
+        "latencia_ms": 345,
+    }
+
+
+def test_usage_record_without_usage():
+    record = usage_record("sugestao", "gpt-4o-mini", SimpleNamespace(), 10)
+    assert (record["tokens_prompt"], record["tokens_completion"], record["tokens_cache"]) == (0, 0, 0)
+    assert record["custo_usd"] == 0.0
+
+
+def test_cost_tracker_totals():
+    tracker = CostTracker()
+    first = usage_record("classificacao", "gpt-4o-mini", response("gpt-4o-mini", 1000, 100), 10)
+    second = usage_record("sugestao", "gpt-4o-mini", response("gpt-4o-mini", 500, 50), 10)
+    tracker.add("Pagamento", [first, second])
+    tracker.add("Outros", [])
+    assert tracker.conversations == 1
+    assert tracker.total_cost == pytest.approx(first["custo_usd"] + second["custo_usd"])
+    assert tracker.totals[("Pagamento", "sugestao")]["tokens_prompt"] == 500
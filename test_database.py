@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Testes da serialização das conversas gravadas na conversas_snapshot
+"""
+
+import json
+from datetime import datetime
+from conversa import Conversa, Mensagem
+from database import decode_snapshot, encode_snapshot, snapshot_items
+
+
+def messages():
+    return [
+        {"message": "Não recebi o boleto, você pode reenviar? 🙏", "timestamp": datetime(2025, 1, 10, 10, 5, 30), "role": "USR"},
+        {"message": "Olá! Já reenviei a segunda via.", "timestamp": datetime(2025, 1, 10, 10, 4, 1, 250000), "role": "AIR"},
+        {"message": "ação pendente", "timestamp": None, "role": "USR"},
+    ]
+
+
+def test_snapshot_items_are_compact_arrays():
+    assert snapshot_items(messages()) == [
+        ["USR", "2025-01-10T10:05:30", "Não recebi o boleto, você pode reenviar? 🙏"],
+        ["AIR", "2025-01-10T10:04:01.250000", "Olá! Já reenviei a segunda via."],
+        ["USR", None, "ação pendente"],
+    ]
+
+
+def test_encode_keeps_non_ascii_text():
+    raw = encode_snapshot(messages())
+    assert "Não recebi" in raw and "🙏" in raw
+    # Separadores compactos, sem espaços
+    assert raw.startswith('[["USR","2025-01-10T10:05:30","Não')
+    assert json.loads(raw) == snapshot_items(messages())
+
+
+def test_round_trip():
+    original = messages()
+    decoded = decode_snapshot(encode_snapshot(original))
+    assert isinstance(decoded, Conversa)
+    assert decoded == original
+    assert decoded[2]["timestamp"] is None
+    # O asyncpg pode devolver o JSONB já decodificado
+    assert decode_snapshot(json.loads(encode_snapshot(original))) == original
+
+
+def test_round_trip_from_conversa():
+    conversa = Conversa(Mensagem(msg["message"], msg["timestamp"], msg["role"]) for msg in messages())
+    assert encode_snapshot(conversa) == encode_snapshot(messages())
+    assert decode_snapshot(encode_snapshot(conversa)) == conversa
+    assert encode_snapshot([]) == "[]" and len(decode_snapshot("[]")) == 0
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Testes do limite de requisições por minuto do gateway de IA
+"""
+
+import asyncio
+import pytest
+from llm_gateway import TokenBucket, backend_names, create_backend
+
+
+def test_capacity_is_one_second_of_rate():
+    assert TokenBucket(600).capacity == 10
+    assert TokenBucket(6000).capacity == 100
+    # Limites baixos ainda permitem uma requisição imediata
+    assert TokenBucket(30).capacity == 1
+
+
+def test_burst_then_wait():
+    async def scenario():
+        bucket = TokenBucket(6000)  # 100 por segundo
+        burst = [await bucket.acquire() for _ in range(100)]
+        waited = await bucket.acquire()
+        return burst, waited
+
+    burst, waited = asyncio.run(scenario())
+    assert burst == [0.0] * 100
+    assert waited == pytest.approx(0.01, abs=0.005)
+
+
+def test_waits_accumulate_for_queued_requests():
+    async def scenario():
+        bucket = TokenBucket(6000)
+        bucket.tokens = 0
+        return await asyncio.gather(*(bucket.acquire() for _ in range(3)))
+
+    waits = sorted(asyncio.run(scenario()))
+    # Cada requisição reserva o crédito antes de esperar: a fila sai espaçada pela taxa
+    assert waits[0] == pytest.approx(0.01, abs=0.005)
+    assert waits[1] == pytest.approx(0.02, abs=0.005)
+    assert waits[2] == pytest.approx(0.03, abs=0.005)
+
+
+def test_refills_over_time():
+    async def scenario():
+        bucket = TokenBucket(6000)
+        bucket.tokens = 0
+        await asyncio.sleep(0.05)
+        return await bucket.acquire()
+
+    assert asyncio.run(scenario()) == 0.0
+
+
+def test_external_backend_is_imported_by_name(tmp_path):
+    assert "cassete" in backend_names()
+    backend = create_backend("cassete", path=str(tmp_path / "cassete.sqlite"), mode="reproduzir")
+    try:
+        assert type(backend).__name__ == "CassetteBackend"
+    finally:
+        asyncio.run(backend.aclose())
+    with pytest.raises(ValueError, match="cassete"):
+        create_backend("inexistente")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Testes da exposição das métricas no formato texto do Prometheus
+"""
+
+import pytest
+from instrumentacao import StageInstrumentation
+from metricas import MetricsRegistry, parse_exposition
+
+
+def test_render_and_parse_back():
+    registry = MetricsRegistry()
+    processed = registry.counter("usuarios_total", "Usuários processados", ("status",))
+    processed.inc("concluido")
+    processed.inc("concluido")
+    processed.inc("erro", amount=3)
+    registry.counter("reinicios_total", "Contador sem labels")
+    pending = registry.gauge("pendentes", "Usuários na fila")
+    pending.set(12.5)
+    registry.gauge("eta_segundos", "Sem estimativa ainda", lambda: None)
+    registry.callback_counter("triagem_total", "Acertos da triagem", lambda: 7)
+
+    instrumentation = StageInstrumentation()
+    for milliseconds in (3, 40, 40, 2000):
+        instrumentation.observe("ia", milliseconds)
+    instrumentation.observe("banco", 1)
+    registry.stage_histograms("etapa_segundos", "Duração por etapa", instrumentation, lambda stage: stage == "ia")
+
+    text = registry.render()
+    assert text.endswith("\n")
+    assert "# TYPE classificador_usuarios_total counter" in text
+    assert "# TYPE classificador_triagem_total counter" in text
+    assert "# TYPE classificador_etapa_segundos histogram" in text
+    # Gauge cujo callback devolve None só tem o cabeçalho
+    assert "# HELP classificador_eta_segundos Sem estimativa ainda" in text
+    assert 'etapa="banco"' not in text
+
+    values = parse_exposition(text)
+    assert values['classificador_usuarios_total{status="concluido"}'] == 2
+    assert values['classificador_usuarios_total{status="erro"}'] == 3
+    assert values["classificador_reinicios_total"] == 0
+    assert values["classificador_pendentes"] == 12.5
+    assert values["classificador_triagem_total"] == 7
+    assert "classificador_eta_segundos" not in values
+
+    assert values['classificador_etapa_segundos_bucket{etapa="ia",le="0.0025"}'] == 0
+    assert values['classificador_etapa_segundos_bucket{etapa="ia",le="0.005"}'] == 1
+    assert values['classificador_etapa_segundos_bucket{etapa="ia",le="0.05"}'] == 3
+    assert values['classificador_etapa_segundos_bucket{etapa="ia",le="2.5"}'] == 4
+    assert values['classificador_etapa_segundos_bucket{etapa="ia",le="+Inf"}'] == 4
+    assert values['classificador_etapa_segundos_count{etapa="ia"}'] == 4
+    assert values['classificador_etapa_segundos_sum{etapa="ia"}'] == pytest.approx(2.083)
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry(prefix="")
+    registry.counter("erros_total", "Erros", ("motivo",)).inc('aspas " e \\ barra')
+    assert 'erros_total{motivo="aspas \\" e \\\\ barra"} 1' in registry.render()
+
+
+def test_failing_metric_is_skipped():
+    registry = MetricsRegistry()
+    registry.gauge("quebrada", "Callback com erro", lambda: 1 / 0)
+    registry.gauge("ok", "Callback válido", lambda: 1)
+    assert parse_exposition(registry.render()) == {"classificador_ok": 1}
+
+
+def test_parse_ignores_comments_and_blank_lines():
+    text = "# HELP x ajuda\n# TYPE x gauge\n\nx 1.5\ny{a=\"b\"} +Inf\n"
+    assert parse_exposition(text) == {"x": 1.5, 'y{a="b"}': float("inf")}
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Testes do vetor de pontuação por tag (float32) e das entradas esparsas da classificacoes_tags
+"""
+
+import numpy as np
+import pytest
+from config import CLASSIFICATION_TAGS
+from pontuacoes_tags import (
+    SCORE_DTYPE, empty_scores, keyword_scores, pack_scores, scores_for_result, sparse_entries, top_k, unpack_scores
+)
+
+
+def test_pack_unpack_round_trip():
+    values = np.random.default_rng(3).random(len(CLASSIFICATION_TAGS))
+    values[::3] = 0
+    raw = pack_scores(values)
+    assert len(raw) == 4 * len(CLASSIFICATION_TAGS)
+
+    unpacked = unpack_scores(raw)
+    assert unpacked.dtype == SCORE_DTYPE
+    np.testing.assert_allclose(unpacked, values, rtol=np.finfo(np.float32).eps)
+    assert pack_scores(unpacked) == raw
+
+
+def test_sparse_entries_keep_only_positive_scores():
+    scores = empty_scores()
+    scores[1] = 0.5
+    scores[4] = 1e-6
+    indexes, values = sparse_entries(scores)
+    assert indexes == [1, 4]
+    assert values == pytest.approx([0.5, 1e-6])
+    assert all(isinstance(value, float) for value in values)
+    assert sparse_entries(empty_scores()) == ([], [])
+
+
+def test_top_k_orders_by_score_and_skips_zeros():
+    scores = empty_scores()
+    scores[5], scores[2], scores[7] = 0.3, 0.9, 0.3
+    assert top_k(scores, 2) == [(CLASSIFICATION_TAGS[2], pytest.approx(0.9)), (CLASSIFICATION_TAGS[5], pytest.approx(0.3))]
+    # Empate mantém a ordem das tags; pontuações zeradas não entram
+    assert [tag for tag, _ in top_k(scores, 10)] == [CLASSIFICATION_TAGS[2], CLASSIFICATION_TAGS[5], CLASSIFICATION_TAGS[7]]
+
+
+def test_keyword_scores_are_capped():
+    first, second = CLASSIFICATION_TAGS[0], CLASSIFICATION_TAGS[1]
+    scores = keyword_scores({first: 1, second: 10, "Tag inexistente": 2})
+    assert scores[0] == pytest.approx(1 / 3)
+    assert scores[1] == pytest.approx(0.9)
+    assert np.count_nonzero(scores) == 2
+
+
+def test_scores_for_result():
+    stored = [0.25] * len(CLASSIFICATION_TAGS)
+    assert scores_for_result({"pontuacoes_tags": stored}).tolist() == stored
+
+    tag = CLASSIFICATION_TAGS[3]
+    scores = scores_for_result({"classification": tag, "confidence": 0.8})
+    assert sparse_entries(scores) == ([3], [pytest.approx(0.8)])
+    assert scores_for_result({"classification": "Tag inexistente", "confidence": 0.8}) is None
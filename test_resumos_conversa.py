@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Testes da escolha da janela do prompt (completa ou incremental a partir do resumo)
+"""
+
+from datetime import datetime, timedelta
+from config import INCREMENTAL_MAX_CHAIN, INCREMENTAL_MAX_NEW_MESSAGES, INCREMENTAL_SUMMARY_MAX_AGE_DAYS
+from resumos_conversa import FULL, INCREMENTAL, extract_summary, plan_prompt_window
+from taxonomia import TAXONOMY_VERSION
+
+NOW = datetime(2025, 3, 10, 12, 0, 0)
+WATERMARK = NOW - timedelta(days=1)
+
+
+def make_summary(**changes):
+    summary = {
+        "resumo": "Cliente perguntou sobre o boleto",
+        "ultima_tag": "Outros",
+        "ultima_mensagem": WATERMARK,
+        "versao_taxonomia": TAXONOMY_VERSION,
+        "atualizacoes": 1,
+        "data_atualizacao": NOW - timedelta(days=1),
+    }
+    summary.update(changes)
+    return summary
+
+
+def make_messages(new: int, old: int = 3):
+    """Mais recente primeiro, como o get_last_25_messages"""
+    newer = [{"message": f"nova {i}", "timestamp": WATERMARK + timedelta(minutes=new - i), "role": "USR"}
+             for i in range(new)]
+    older = [{"message": f"antiga {i}", "timestamp": WATERMARK - timedelta(minutes=i), "role": "USR"}
+             for i in range(old)]
+    return newer + older
+
+
+def test_without_summary_uses_full_window():
+    messages = make_messages(2)
+    assert plan_prompt_window(None, messages, NOW) == (FULL, messages, "sem_resumo")
+
+
+def test_taxonomy_change_uses_full_window():
+    mode, _, reason = plan_prompt_window(make_summary(versao_taxonomia="outra"), make_messages(2), NOW)
+    assert (mode, reason) == (FULL, "taxonomia_alterada")
+
+
+def test_old_summary_uses_full_window():
+    stale = make_summary(data_atualizacao=NOW - timedelta(days=INCREMENTAL_SUMMARY_MAX_AGE_DAYS + 1))
+    mode, _, reason = plan_prompt_window(stale, make_messages(2), NOW)
+    assert (mode, reason) == (FULL, "resumo_antigo")
+
+
+def test_long_chain_uses_full_window():
+    mode, _, reason = plan_prompt_window(make_summary(atualizacoes=INCREMENTAL_MAX_CHAIN), make_messages(2), NOW)
+    assert (mode, reason) == (FULL, "cadeia_longa")
+
+
+def test_no_new_messages_uses_full_window():
+    mode, _, reason = plan_prompt_window(make_summary(), make_messages(0), NOW)
+    assert (mode, reason) == (FULL, "sem_mensagens_novas")
+
+
+def test_large_delta_uses_full_window():
+    messages = make_messages(INCREMENTAL_MAX_NEW_MESSAGES + 1)
+    mode, window, reason = plan_prompt_window(make_summary(), messages, NOW)
+    assert (mode, reason) == (FULL, "delta_grande")
+    assert window is messages
+
+
+def test_small_delta_sends_only_new_messages():
+    mode, window, reason = plan_prompt_window(make_summary(), make_messages(2), NOW)
+    assert (mode, reason) == (INCREMENTAL, "delta")
+    assert [msg["message"] for msg in window] == ["nova 0", "nova 1"]
+
+
+def test_string_timestamps_are_compared_as_dates():
+    messages = [
+        {"message": "nova", "timestamp": (WATERMARK + timedelta(hours=1)).isoformat(), "role": "USR"},
+        {"message": "sem data", "timestamp": "ontem", "role": "USR"},
+        {"message": "antiga", "timestamp": (WATERMARK - timedelta(hours=1)).isoformat(), "role": "USR"},
+    ]
+    mode, window, _ = plan_prompt_window(make_summary(), messages, NOW)
+    assert mode == INCREMENTAL
+    assert [msg["message"] for msg in window] == ["nova"]
+
+
+def test_extract_summary():
+    assert extract_summary("Outros|justificativa|específica|Resumo da conversa") == "Resumo da conversa"
+    assert extract_summary("Outros|justificativa|específica") is None
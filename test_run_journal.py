@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Testes do journal de execução (carga, compactação e linha truncada)
+"""
+
+import json
+from run_journal import RunJournal
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [line for line in f.read().splitlines() if line]
+
+
+def test_load_restores_pending_and_unsaved(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path, fsync_every=1, compact_every=1000)
+    journal.start(["1", "2", "3", "4"])
+    journal.record("1", "salvo")
+    journal.record("2", "classificado", {"classificacao": "Outros"})
+    journal.record("3", "sem_mensagens")
+    journal.close()
+
+    loaded = RunJournal(path)
+    assert loaded.load() is True
+    assert loaded.remaining_users() == ["4"]
+    assert loaded.unsaved_results() == [("2", {"classificacao": "Outros"})]
+
+
+def test_load_without_file(tmp_path):
+    journal = RunJournal(str(tmp_path / "inexistente.jsonl"))
+    assert journal.load() is False
+    assert journal.remaining_users() == []
+
+
+def test_compaction_keeps_only_checkpoint_and_unsaved(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path, fsync_every=1, compact_every=3)
+    journal.start([str(user) for user in range(10)])
+    journal.record("0", "salvo")
+    journal.record("1", "classificado", {"classificacao": "Outros"})
+    journal.record("2", "ja_classificado")  # terceira entrada: compacta
+    journal.close()
+
+    lines = [json.loads(line) for line in read_lines(path)]
+    assert len(lines) == 2
+    assert lines[0]["ev"] == "checkpoint"
+    assert lines[0]["pendentes"] == [str(user) for user in range(3, 10)]
+    assert lines[1]["user"] == "1" and lines[1]["etapa"] == "classificado"
+
+    loaded = RunJournal(path)
+    loaded.load()
+    assert loaded.remaining_users() == [str(user) for user in range(3, 10)]
+    assert [user for user, _ in loaded.unsaved_results()] == ["1"]
+
+
+def test_saved_result_leaves_compacted_journal(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path, fsync_every=1, compact_every=1000)
+    journal.start(["1", "2"])
+    journal.record("1", "classificado", {"classificacao": "Outros"})
+    journal.compact()
+    journal.record("1", "salvo")
+    journal.close()
+
+    loaded = RunJournal(path)
+    loaded.load()
+    assert loaded.unsaved_results() == []
+    assert loaded.remaining_users() == ["2"]
+
+
+def test_truncated_last_line_is_ignored_and_rewritten(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path, fsync_every=1, compact_every=1000)
+    journal.start(["1", "2", "3"])
+    journal.record("1", "salvo")
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"ev": "etapa", "user": "2", "eta')  # queda no meio da escrita
+
+    loaded = RunJournal(path, fsync_every=1)
+    assert loaded.load() is True
+    assert loaded.remaining_users() == ["2", "3"]
+    # O arquivo foi reescrito: novas entradas não ficam grudadas na linha quebrada
+    for line in read_lines(path):
+        json.loads(line)
+
+    loaded.record("2", "salvo")
+    loaded.close()
+    reloaded = RunJournal(path)
+    reloaded.load()
+    assert reloaded.remaining_users() == ["3"]
+
+
+def test_finish_removes_file(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = RunJournal(str(path))
+    journal.start(["1"])
+    journal.record("1", "salvo")
+    journal.finish()
+    assert not path.exists()
+    assert journal.has_checkpoint is False
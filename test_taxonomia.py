@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Testes do diff entre taxonomias e do plano de reclassificação
+"""
+
+from config import CLASSIFICATION_TAGS
+from taxonomia import TAXONOMY_VERSION, build_plan, diff_taxonomies, taxonomy_version
+
+
+def test_diff_taxonomies():
+    old = ["Boleto", "Pix", "Cartão", "Site", "Antiga"]
+    new = ["Boleto", "Pagamento instantâneo", "Cartão de crédito", "Cartão de débito", "Site", "Nova"]
+    diff = diff_taxonomies(old, new, renames={"Pix": "Pagamento instantâneo"},
+                           splits={"Cartão": ["Cartão de crédito", "Cartão de débito"]})
+
+    assert diff["mantidas"] == ["Boleto", "Site"]
+    assert diff["renomeadas"] == {"Pix": "Pagamento instantâneo"}
+    assert diff["divididas"] == {"Cartão": ["Cartão de crédito", "Cartão de débito"]}
+    assert diff["removidas"] == ["Antiga"]
+    assert diff["adicionadas"] == ["Nova"]
+    assert diff["destinos_invalidos"] == []
+
+
+def test_diff_reports_invalid_targets():
+    diff = diff_taxonomies(["Pix"], ["Boleto"], renames={"Pix": "Inexistente"}, splits={})
+    assert diff["destinos_invalidos"] == ["Inexistente"]
+
+
+def test_build_plan_groups_by_action():
+    kept, renamed, split = CLASSIFICATION_TAGS[:3]
+    stale = [
+        {"versao_taxonomia": None, "classificacao": kept, "quantidade": 100},
+        {"versao_taxonomia": "antiga", "classificacao": kept, "quantidade": 50},
+        {"versao_taxonomia": "antiga", "classificacao": renamed, "quantidade": 7},
+        {"versao_taxonomia": "antiga", "classificacao": split, "quantidade": 5},
+        {"versao_taxonomia": "antiga", "classificacao": "Tag removida", "quantidade": 3},
+    ]
+    plan = build_plan(stale, renames={renamed: kept}, splits={split: [kept]}, sample_rate=0.1)
+
+    assert plan["versao"] == TAXONOMY_VERSION
+    assert plan["acoes"]["mantida"] == {kept: 150}
+    assert plan["totais"] == {"mantida": 150, "renomeada": 7, "dividida": 5, "removida": 3}
+    assert plan["desatualizadas"] == 165
+    # Renomeadas são atualizadas no lugar; divididas, removidas e a amostra das mantidas vão para a fila
+    assert plan["amostra_estimada"] == 15
+    assert plan["fila_estimada"] == 5 + 3 + 15
+
+
+def test_build_plan_without_stale_rows():
+    plan = build_plan([], renames={}, splits={}, sample_rate=0.5)
+    assert plan["desatualizadas"] == 0
+    assert plan["fila_estimada"] == 0
+
+
+def test_taxonomy_version_depends_on_tags_and_prompt():
+    base = taxonomy_version(["A", "B"], "prompt")
+    assert base == taxonomy_version(["A", "B"], "prompt")
+    assert base != taxonomy_version(["B", "A"], "prompt")
+    assert base != taxonomy_version(["A", "B"], "outro prompt")
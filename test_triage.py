@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Testes da triagem por regras antes da IA
+"""
+
+import pytest
+from triage import ConversationTriage, GreetingOnlyRule, NoCustomerMessageRule, OptOutRule, normalize_text
+
+
+def msg(text, role="USR"):
+    return {"message": text, "timestamp": "2025-01-10 10:00:00", "role": role}
+
+
+def test_normalize_text():
+    assert normalize_text("  Olá,   BOM DIA!! 👋 ") == "ola bom dia"
+    assert normalize_text(None) == ""
+
+
+def test_no_customer_message_rule():
+    rule = NoCustomerMessageRule("sem_cliente")
+    assert rule.matches([])
+    # Apenas mensagens automáticas do bot
+    assert rule.matches([msg("Seu boleto vence amanhã", role="BOT"), msg("Lembrete de pagamento", role="BOT")])
+    assert not rule.matches([msg("Seu boleto vence amanhã", role="BOT"), msg("ok")])
+
+
+def test_greeting_only_rule():
+    rule = GreetingOnlyRule("saudacao", frases=["oi", "bom dia", "olá boa tarde"], max_mensagens=2)
+    assert rule.matches([msg("Oi!"), msg("BOM DIA")])
+    assert rule.matches([msg("Ola, boa tarde"), msg("Mensagem automática", role="BOT")])
+    assert not rule.matches([msg("oi"), msg("quero a segunda via do boleto")])
+    # Acima do limite de mensagens do cliente
+    assert not rule.matches([msg("oi"), msg("oi"), msg("oi")])
+    assert not rule.matches([msg("Bom dia", role="BOT")])
+
+
+def test_opt_out_rule():
+    rule = OptOutRule("opt_out", frases_exatas=["sair", "stop"], frases=["não quero mais receber"], max_mensagens=3)
+    assert rule.matches([msg("SAIR")])
+    assert rule.matches([msg("Por favor, nao quero mais receber essas mensagens"), msg("oi")])
+    # Só a mensagem mais recente (primeira da lista) conta
+    assert not rule.matches([msg("tudo certo"), msg("sair")])
+    # Frase exata não vale como trecho
+    assert not rule.matches([msg("quero sair do plano e pagar a multa")])
+    assert not rule.matches([msg("stop"), msg("a"), msg("b"), msg("c")])
+
+
+def test_triage_returns_first_matching_rule():
+    triage = ConversationTriage()
+    result = triage.evaluate([msg("Olá, bom dia!")])
+    assert result == {
+        "classification": "Outros",
+        "confidence": 1.0,
+        "context": "triagem_apenas_saudacao",
+        "classificacao_especifica": "Cumprimento",
+        "sugestao_melhoria": "",
+        "tokens_used": 0,
+        "processing_time": 0
+    }
+    assert triage.evaluate([msg("Mensagem automática", role="BOT")])["context"] == "triagem_sem_mensagem_cliente"
+    assert triage.evaluate([msg("Parem de mandar mensagem")])["context"] == "triagem_opt_out"
+
+
+def test_no_match_returns_none():
+    triage = ConversationTriage()
+    assert triage.evaluate([msg("não recebi o boleto deste mês"), msg("oi")]) is None
+    assert triage.evaluated == 1
+    assert not triage.hits
+    assert triage.summary() == "nenhuma conversa resolvida na triagem"
+
+
+def test_calls_avoided_counter():
+    config = [{"id": "sem_cliente", "tipo": "sem_mensagem_cliente"}]
+    triage = ConversationTriage(config, calls_per_hit=2)
+    triage.evaluate([])
+    triage.evaluate([msg("Lembrete", role="BOT")])
+    triage.evaluate([msg("quero negociar")])
+    assert triage.evaluated == 3
+    assert triage.hits == {"sem_cliente": 2}
+    assert triage.calls_avoided == 4
+    assert triage.summary() == "2 conversas (sem_cliente: 2); 4 chamadas à IA evitadas"
+
+
+def test_unknown_rule_type():
+    with pytest.raises(ValueError):
+        ConversationTriage([{"id": "x", "tipo": "inexistente"}])
@@ -16,8 +16,8 @@ async def test_database_connection():
     """Testa conexão com banco de dados"""
     print("🔍 Testando conexão com banco de dados...")
     
+    db = DatabaseManager()
     try:
-        db = DatabaseManager()
         conn = await db.get_connection()
         print("✅ Conexão com banco estabelecida!")
         
@@ -44,6 +44,8 @@ async def test_database_connection():
     except Exception as e:
         print(f"❌ Erro na conexão com banco: {e}")
         return False
+    finally:
+        await db.close()
 
 async def test_ai_classifier():
     """Testa o classificador de IA"""
@@ -82,8 +84,8 @@ async def test_full_system():
     """Testa o sistema completo com um usuário real"""
     print("\n🚀 Testando sistema completo...")
     
+    db = DatabaseManager()
     try:
-        db = DatabaseManager()
         ai = TagBasedClassifier(use_ai=True)
         
         # Obter um usuário não classificado
@@ -125,6 +127,8 @@ async def test_full_system():
     except Exception as e:
         print(f"❌ Erro no sistema completo: {e}")
         return False
+    finally:
+        await db.close()
 
 async def main():
     """Função principal de teste"""
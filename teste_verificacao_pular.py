@@ -94,6 +94,9 @@ async def test_skip_logic():
         
     except Exception as e:
         logger.error(f"❌ Erro durante o teste: {e}")
+    finally:
+        await classifier.db.close()
+        await db.close()
 
 async def test_database_consistency():
     """Testa a consistência do banco de dados"""
@@ -136,6 +139,8 @@ async def test_database_consistency():
         
     except Exception as e:
         logger.error(f"❌ Erro ao verificar banco: {e}")
+    finally:
+        await db.close()
 
 async def main():
     """Função principal do teste"""
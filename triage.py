@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Triagem por regras antes da IA: rotula conversas triviais sem chamar a OpenAI
+"""
+
+import re
+import logging
+import unicodedata
+from collections import Counter
+from typing import Dict, Any, List, Optional
+from config import TRIAGE_RULES
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos, sem pontuação/emojis e com espaços simples"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD.sub(" ", text.lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+def customer_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [msg for msg in messages if msg.get("role") == "USR"]
+
+
+# Registro dos tipos de regra disponíveis para o TRIAGE_RULES
+RULE_TYPES = {}
+
+
+def register_rule_type(cls):
+    """Decorator que torna um tipo de regra utilizável pela configuração"""
+    RULE_TYPES[cls.tipo] = cls
+    return cls
+
+
+class TriageRule:
+    """Regra base: subclasses definem `tipo` e implementam matches()"""
+    tipo = ""
+
+    def __init__(self, id: str, classificacao: str = "Outros", classificacao_especifica: str = "",
+                 confianca: float = 1.0, **params):
+        self.id = id
+        self.classificacao = classificacao
+        self.classificacao_especifica = classificacao_especifica
+        self.confianca = confianca
+        self.params = params
+
+    def matches(self, messages: List[Dict[str, Any]]) -> bool:
+        raise NotImplementedError
+
+
+@register_rule_type
+class NoCustomerMessageRule(TriageRule):
+    """Conversa sem nenhuma mensagem do cliente (apenas mensagens do bot)"""
+    tipo = "sem_mensagem_cliente"
+
+    def matches(self, messages):
+        return not customer_messages(messages)
+
+
+@register_rule_type
+class GreetingOnlyRule(TriageRule):
+    """Cliente só enviou cumprimentos curtos"""
+    tipo = "apenas_saudacao"
+
+    def __init__(self, id, frases: List[str] = (), max_mensagens: int = 2, **kwargs):
+        super().__init__(id, **kwargs)
+        self.frases = {normalize_text(frase) for frase in frases}
+        self.max_mensagens = max_mensagens
+
+    def matches(self, messages):
+        usr = customer_messages(messages)
+        if not usr or len(usr) > self.max_mensagens:
+            return False
+        return all(normalize_text(msg["message"]) in self.frases for msg in usr)
+
+
+@register_rule_type
+class OptOutRule(TriageRule):
+    """Última mensagem do cliente é um pedido de descadastro em conversa curta"""
+    tipo = "opt_out"
+
+    def __init__(self, id, frases_exatas: List[str] = (), frases: List[str] = (),
+                 max_mensagens: int = 3, **kwargs):
+        super().__init__(id, **kwargs)
+        self.frases_exatas = {normalize_text(frase) for frase in frases_exatas}
+        self.frases = [normalize_text(frase) for frase in frases]
+        self.max_mensagens = max_mensagens
+
+    def matches(self, messages):
+        usr = customer_messages(messages)
+        if not usr or len(usr) > self.max_mensagens:
+            return False
+
+        # Mensagens chegam da mais recente para a mais antiga
+        last = normalize_text(usr[0]["message"])
+        return last in self.frases_exatas or any(frase in last for frase in self.frases)
+
+
+class ConversationTriage:
+    def __init__(self, rules_config: List[Dict[str, Any]] = None, calls_per_hit: int = 0):
+        self.logger = logging.getLogger(__name__)
+        self.calls_per_hit = calls_per_hit
+        self.rules = [self.build_rule(config) for config in (rules_config if rules_config is not None else TRIAGE_RULES)]
+        self.hits = Counter()
+        self.evaluated = 0
+        self.calls_avoided = 0
+
+    @staticmethod
+    def build_rule(config: Dict[str, Any]) -> TriageRule:
+        """Instancia uma regra a partir do dicionário de configuração"""
+        params = dict(config)
+        tipo = params.pop("tipo")
+        if tipo not in RULE_TYPES:
+            raise ValueError(f"Tipo de regra de triagem desconhecido: {tipo}")
+        return RULE_TYPES[tipo](**params)
+
+    def evaluate(self, messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Retorna um resultado de classificação se alguma regra se aplica, senão None"""
+        self.evaluated += 1
+        for rule in self.rules:
+            if rule.matches(messages):
+                self.hits[rule.id] += 1
+                self.calls_avoided += self.calls_per_hit
+                return {
+                    "classification": rule.classificacao,
+                    "confidence": rule.confianca,
+                    "context": rule.id,
+                    "classificacao_especifica": rule.classificacao_especifica,
+                    "sugestao_melhoria": "",
+                    "tokens_used": 0,
+                    "processing_time": 0
+                }
+        return None
+
+    def summary(self) -> str:
+        """Resumo das regras acionadas para o log final da execução"""
+        if not self.hits:
+            return "nenhuma conversa resolvida na triagem"
+        rules = ", ".join(f"{rule_id}: {count}" for rule_id, count in self.hits.most_common())
+        return f"{sum(self.hits.values())} conversas ({rules}); {self.calls_avoided} chamadas à IA evitadas"